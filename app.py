@@ -3,13 +3,26 @@ import pandas as pd
 from fpdf import FPDF
 from datetime import datetime, date, time
 import pytz
-from io import BytesIO
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-import json
-from supabase import create_client, Client
-from pyzbar.pyzbar import decode
-from PIL import Image, ImageEnhance, ImageFilter
+import os
+import threading
+from collections import OrderedDict
+import hashlib
+import time as _time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeout
+from armazenamento import Armazenamento, criar_armazenamento
+from relatorios import AgregadosPresenca, datas_locais, montar_relatorio_geral
+from diario import DiarioPresencas, mesclar_presencas
+from presencas import COLUNAS_PRESENCA, AcompanhamentoReunioes, PresencasReuniao, classificar_leituras
+from cache import CacheConsultas
+from cadastro import (Cadastro, convocacoes_periodo, convocados_reuniao, migrar_convocacoes_manuais,
+                      normalizar_codigo, valores_filtro)
+from crachas import gerar_codigo, validar
+from importacao import importar_participantes, ler_linhas
+from exportacao import CacheQR, PlanilhaStream, TabelaPDF, pdf_crachas, texto_pdf
+from pyzbar.pyzbar import decode, ZBarSymbol
+from PIL import Image
+from functools import cached_property
 import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
@@ -270,313 +283,587 @@ def sec(icone, texto):
 def metric_card(valor, label, cor):
     return f'<div class="metric-card mc-{cor}"><p class="metric-value">{valor}</p><p class="metric-label">{label}</p></div>'
 
+def config(chave, padrao=None):
+    """Parâmetro opcional lido de st.secrets ou de variável de ambiente."""
+    try:
+        if chave in st.secrets: return st.secrets[chave]
+    except Exception: pass
+    return os.environ.get(chave, padrao)
+
 def botao_voltar(destino="home", label="⬅  Voltar"):
     if st.button(label, key=f"voltar_{destino}_{id(destino)}", use_container_width=False):
         st.session_state.pagina = destino
         st.session_state.feedback_status = None
         st.rerun()
 
+SYNC_SEGUNDOS = float(config("SYNC_SEGUNDOS", 5))
+
+@st.fragment(run_every=SYNC_SEGUNDOS or None)   # 0 desliga a sincronização
+def painel_presencas(convocados):
+    """Métricas do check-in. Roda sozinho a cada SYNC_SEGUNDOS juntando os check-ins das
+    outras estações que a thread de acompanhamento já trouxe, sem recarregar a página.
+    `convocados`: códigos normalizados (convocados_reuniao); faltantes é uma diferença de conjuntos."""
+    lista = st.session_state.lista_presenca
+    sincronizar_presencas(lista)
+    total_conv = len(convocados)
+    total_pres = len(lista)
+    faltantes  = total_conv - len(convocados & lista.ids)   # percorre o menor dos dois
+    porc       = int((total_conv - faltantes) / total_conv * 100) if total_conv > 0 else 0
+    st.markdown(
+        f'<div class="metric-row">'
+        f'{metric_card(total_conv,  "Convocados",  "blue")}'
+        f'{metric_card(total_pres,  "Presentes",   "green")}'
+        f'{metric_card(faltantes,   "Faltantes",   "red")}'
+        f'<div class="metric-card mc-purple"><p class="metric-value" style="color:#a78bfa">{porc}%</p><p class="metric-label">Presença</p></div>'
+        f'</div>',
+        unsafe_allow_html=True
+    )
+    st.markdown(
+        f'<div class="prog-wrap"><div class="prog-fill" style="width:{porc}%"></div></div>',
+        unsafe_allow_html=True
+    )
+    diario, erro = diario_presencas(), diario_presencas().ultimo_erro or acompanhamento_reunioes().ultimo_erro
+    # o check-in foi confirmado localmente; quem o banco já tinha aparece aqui depois
+    vistos = st.session_state.get("conflitos_vistos")
+    st.session_state.conflitos_vistos, conflitos = diario.conflitos(lista.meeting_id, vistos)
+    for c in conflitos: st.toast(f"{c['nome']} já tinha sido registrado em outra estação.", icon="⚠️")
+    st.caption(f"💾 Sincronização: {diario.pendentes} pendente(s) • {diario.sincronizados} enviada(s)"
+               + (f" • ⚠️ sem conexão, tentando de novo: {erro}" if erro else ""))
+
+
+# ════════════════════ ARMAZENAMENTO ════════════════════
+@st.cache_resource
+def get_armazenamento() -> Armazenamento:
+    # ARMAZENAMENTO = "sqlite" roda tudo localmente (sem internet / testes de carga)
+    if config("ARMAZENAMENTO", "supabase") == "sqlite":
+        return criar_armazenamento("sqlite", caminho=config("SQLITE_PATH", "presenca.db"),
+                                   csv_participantes="participantes.csv")
+    return criar_armazenamento("supabase", url=st.secrets["SUPABASE_URL"], key=st.secrets["SUPABASE_KEY"],
+                               timeout=float(config("SUPABASE_TIMEOUT", 10)))
+
+armazenamento = get_armazenamento()
 
-# ════════════════════ SUPABASE ════════════════════
 @st.cache_resource
-def get_supabase() -> Client:
-    return create_client(st.secrets["SUPABASE_URL"], st.secrets["SUPABASE_KEY"])
+def consultas():
+    return CacheConsultas(float(config("CONSULTAS_TTL", 300)))
 
-supabase_client = get_supabase()
+FUSO = "America/Cuiaba"
 
 def obter_hora_atual():
-    return datetime.now(pytz.timezone("America/Cuiaba"))
+    return datetime.now(pytz.timezone(FUSO))
 
 def _parse_date(s): return datetime.strptime(s, "%Y-%m-%d").date()
 def _parse_time(s): return datetime.strptime(s, "%H:%M").time()
 
 
 # ════════════════════ QR ROBUSTO ════════════════════
-def decodificar_qr_robusto(img: Image.Image):
-    def tentar(im):
-        r = decode(im)
-        return r[0].data.decode("utf-8").strip() if r else None
-    for fn in [
-        lambda i: i,
-        lambda i: i.convert("L"),
-        lambda i: ImageEnhance.Contrast(i.convert("L")).enhance(2.5),
-        lambda i: ImageEnhance.Sharpness(i.convert("L")).enhance(3.0),
-        lambda i: i.resize((i.width*2, i.height*2), Image.LANCZOS).convert("L"),
-        lambda i: Image.fromarray((np.array(ImageEnhance.Contrast(i.convert("L")).enhance(2.5)) > 128).astype(np.uint8)*255),
-        lambda i: Image.fromarray(255 - np.array(i.convert("L"))),
-    ]:
+QR_LADO_MAX     = 1280   # fotos maiores são reduzidas antes de qualquer tentativa
+QR_ORCAMENTO_MS = 300    # tempo máximo gasto por quadro antes de desistir
+QR_WORKERS      = min(int(config("QR_WORKERS", 0)), os.cpu_count() or 1)   # >1 liga a decodificação paralela
+
+def _regiao_qr(cinza):
+    """Caixa (x0,y0,x1,y1) da região de maior densidade de bordas, onde o QR provavelmente está."""
+    fator = max(1, max(cinza.size) // 160)
+    a = np.asarray(cinza.reduce(fator) if fator > 1 else cinza, dtype=np.int16)
+    if min(a.shape) < 8: return None
+    limiar = max(12, (int(a.max()) - int(a.min())) // 5)
+    bordas = (np.abs(np.diff(a, axis=1))[:-1, :] + np.abs(np.diff(a, axis=0))[:, :-1]) > limiar
+    lin, col = bordas.sum(axis=1), bordas.sum(axis=0)
+    if not lin.any(): return None
+    ys, xs = np.flatnonzero(lin > 0.3*lin.max()), np.flatnonzero(col > 0.3*col.max())
+    y0, y1, x0, x1 = ys[0], ys[-1] + 2, xs[0], xs[-1] + 2
+    my, mx = (y1 - y0) // 5 + 1, (x1 - x0) // 5 + 1
+    y0, y1, x0, x1 = max(0, y0-my), min(a.shape[0], y1+my), max(0, x0-mx), min(a.shape[1], x1+mx)
+    if (y1-y0)*(x1-x0) > 0.8*a.size or min(y1-y0, x1-x0) < 6: return None
+    return int(x0*fator), int(y0*fator), int(x1*fator), int(y1*fator)
+
+def _limiar_otsu(hist):
+    """Limiar de Otsu a partir do histograma de 256 níveis."""
+    p = hist / max(hist.sum(), 1)
+    w = np.cumsum(p); mu = np.cumsum(p * np.arange(256))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        var = (mu[-1]*w - mu)**2 / (w * (1 - w))
+    return int(np.nanargmax(var))
+
+def _limiar_adaptativo(lum, c=7):
+    """Binarização por média local (imagem integral), robusta a luz desigual no salão."""
+    h, w = lum.shape
+    b = max(8, min(h, w) // 8) | 1
+    integ = np.zeros((h+1, w+1), np.int32)
+    np.cumsum(np.cumsum(lum, axis=0, dtype=np.int32), axis=1, out=integ[1:, 1:])
+    ys, xs = np.arange(h), np.arange(w)
+    y0, y1 = np.clip(ys - b//2, 0, h), np.clip(ys + b//2 + 1, 0, h)
+    x0, x1 = np.clip(xs - b//2, 0, w), np.clip(xs + b//2 + 1, 0, w)
+    soma = integ[y1][:, x1] - integ[y0][:, x1] - integ[y1][:, x0] + integ[y0][:, x0]
+    area = (y1 - y0)[:, None] * (x1 - x0)[None, :]
+    return np.where(lum.astype(np.int32) * area > soma - c * area, 255, 0).astype(np.uint8)
+
+class QuadroQR:
+    """Luminância do quadro calculada uma única vez (já reduzida) e variantes derivadas dela
+    sob demanda. Todas são arrays uint8 2D contíguos, entregues ao zbar sem conversão."""
+    def __init__(self, img):
+        img.draft("L", (QR_LADO_MAX, QR_LADO_MAX))   # JPEG: decodifica já reduzido
+        cinza = img.convert("L")
+        if max(cinza.size) > QR_LADO_MAX: cinza.thumbnail((QR_LADO_MAX, QR_LADO_MAX))
+        self.lum = np.asarray(cinza)
+        caixa = _regiao_qr(cinza)
+        self.recorte = np.ascontiguousarray(self.lum[caixa[1]:caixa[3], caixa[0]:caixa[2]]) if caixa else None
+
+    @property
+    def base(self): return self.recorte if self.recorte is not None else self.lum
+
+    @cached_property
+    def hist(self): return np.bincount(self.base.ravel(), minlength=256)
+
+    def _lut(self, tabela): return tabela.astype(np.uint8)[self.base]
+
+    def contraste(self):
+        cdf = np.cumsum(self.hist); n = cdf[-1]
+        lo, hi = np.searchsorted(cdf, 0.01*n), np.searchsorted(cdf, 0.99*n)
+        if hi - lo < 8: return None
+        return self._lut(np.clip((np.arange(256) - lo) * 255.0 / (hi - lo), 0, 255))
+
+    def otsu(self): return self._lut((np.arange(256) > _limiar_otsu(self.hist)) * 255)
+    def adaptativo(self): return _limiar_adaptativo(self.base)
+    def invertido(self): return self._lut(255 - np.arange(256))
+
+    def ampliado(self):
+        if self.recorte is None or max(self.recorte.shape) >= 500: return None
+        h, w = self.recorte.shape
+        return np.asarray(Image.fromarray(self.recorte).resize((w*2, h*2), Image.LANCZOS))
+
+ESTRATEGIAS_QR = {
+    "cinza":      lambda q: q.lum,
+    "recorte":    lambda q: q.recorte,
+    "contraste":  QuadroQR.contraste,
+    "otsu":       QuadroQR.otsu,
+    "adaptativo": QuadroQR.adaptativo,
+    "ampliado":   QuadroQR.ampliado,
+    "invertido":  QuadroQR.invertido,
+}
+
+@st.cache_resource
+def _pool_qr(workers):
+    # zbar (ctypes) e o NumPy liberam o GIL, então threads bastam para paralelizar
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="qr")
+
+class DecodificadorQR:
+    """Tenta as estratégias na ordem das que mais acertaram para cada câmera,
+    respeitando um orçamento de tempo por quadro. Guarda contadores por estratégia.
+    Com workers > 1 as variantes rodam em paralelo e vale a primeira leitura."""
+    def __init__(self, orcamento_ms=QR_ORCAMENTO_MS, workers=QR_WORKERS):
+        self.orcamento = orcamento_ms / 1000
+        self.workers = min(workers, len(ESTRATEGIAS_QR))
+        self.stats = {}        # camera -> estrategia -> [tentativas, acertos, erros, segundos]
+        self.ultimo_erro = None
+
+    def ordem(self, camera):
+        cam = self.stats.get(camera, {})
+        def chave(nome):
+            t, a, _, seg = cam.get(nome, (0, 0, 0, 0.0))
+            return (-(a + 1) / (t + 2), seg / t if t else 0.0)
+        return sorted(ESTRATEGIAS_QR, key=chave)
+
+    @staticmethod
+    def _tentar(nome, q):
+        t0 = _time.perf_counter()
+        try:
+            im = ESTRATEGIAS_QR[nome](q)
+            r = decode(im, symbols=[ZBarSymbol.QRCODE]) if im is not None else None
+            return nome, im is not None, r, None, _time.perf_counter() - t0
+        except Exception as e:
+            return nome, True, None, e, _time.perf_counter() - t0
+
+    def _contar(self, cam, nome, tentou, r, erro, seg):
+        s = cam.setdefault(nome, [0, 0, 0, 0.0])
+        s[3] += seg
+        if not tentou: return None
+        s[0] += 1   # exceção conta como tentativa sem acerto: a estratégia quebrada desce na ordem
+        if erro is not None:
+            s[2] += 1; self.ultimo_erro = f"{nome}: {erro}"; return None
+        codigos = [c for c in dict.fromkeys(sb.data.decode("utf-8").strip() for sb in r or []) if c]
+        if not codigos: return None
+        s[1] += 1
+        return codigos
+
+    def decodificar(self, img, camera=None):
+        """Lista dos códigos distintos no quadro (vários crachás numa foto), ou []."""
+        camera = camera or "%dx%d" % img.size
+        cam = self.stats.setdefault(camera, {})
+        inicio = _time.perf_counter()
+        q = QuadroQR(img)
+        ordem = self.ordem(camera)
+        if self.workers > 1: return self._decodificar_paralelo(q, ordem, cam, inicio)
+        for nome in ordem:
+            if _time.perf_counter() - inicio > self.orcamento: break
+            codigos = self._contar(cam, *self._tentar(nome, q))
+            if codigos: return codigos
+        return []
+
+    def _decodificar_paralelo(self, q, ordem, cam, inicio):
+        futuros = [_pool_qr(self.workers).submit(self._tentar, nome, q) for nome in ordem]
         try:
-            r = tentar(fn(img))
-            if r: return r
-        except: pass
-    return None
+            restante = max(0.0, self.orcamento - (_time.perf_counter() - inicio))
+            for f in as_completed(futuros, timeout=restante):
+                codigos = self._contar(cam, *f.result())
+                if codigos: return codigos
+        except FuturesTimeout: pass
+        finally:
+            for f in futuros: f.cancel()   # as que ainda não começaram nem chegam a rodar
+        return []
+
+    def resumo(self):
+        linhas = [
+            {"Câmera": cam, "Estratégia": nome, "Tentativas": t, "Acertos": a,
+             "Taxa %": round(100*a/t, 1) if t else 0.0,
+             "ms médio": round(1000*seg/t, 1) if t else 0.0, "Erros": e}
+            for cam, est in self.stats.items() for nome, (t, a, e, seg) in est.items()
+        ]
+        return pd.DataFrame(linhas)
+
+def decodificar_varios_qr(img: Image.Image, decodificador=None):
+    return (decodificador or DecodificadorQR()).decodificar(img)
 
 
 # ════════════════════ DADOS ════════════════════
-@st.cache_data(ttl=60)
+@st.cache_resource(ttl=60)
 def carregar_dados_participantes():
+    """Cadastro compartilhado (sem cópia por rerun como no cache_data); trate como somente leitura."""
     try:
-        res = supabase_client.table("participantes").select("*").execute()
-        if res.data:
-            df = pd.DataFrame(res.data); df.columns = df.columns.str.strip(); return df
-        return pd.DataFrame(columns=["id","nome","cargo","localidade"])
+        return Cadastro(armazenamento.participantes())
     except Exception as e:
-        st.error(f"Erro: {e}"); return pd.DataFrame()
-
-def filtrar_convocados(df, reuniao):
-    if df.empty or not reuniao: return df
-    tipo = reuniao.get("filtro_tipo","Todos")
-    vals = reuniao.get("filtro_valores",[])
-    if tipo=="Por Cargo":      return df[df["Cargo"].isin(vals)]
-    if tipo=="Por Localidade": return df[df["Localidade"].isin(vals)]
-    if tipo=="Manual":         return df[df["Nome"].isin(vals)]
-    return df
+        st.error(f"Erro: {e}"); return Cadastro()
+
+def recarregar_servico_checkin(mid=None):
+    """Pede ao servico_checkin.py (SERVICO_CHECKIN_URL) que releia o cadastro agora ou,
+    com `mid`, que esqueça os presentes da reunião (depois de limpá-la)."""
+    url = config("SERVICO_CHECKIN_URL")
+    if not url: return
+    alvo = "/recarregar" + (f"?m={urllib.parse.quote(str(mid))}" if mid is not None else "")
+    pedido = urllib.request.Request(str(url).rstrip("/") + alvo, data=b"", method="POST",
+                                    headers={"Authorization": f"Bearer {config('SERVICO_TOKEN', '')}"})
+    try:
+        with urllib.request.urlopen(pedido, timeout=5): pass
+    except OSError as e:
+        if mid is None: st.warning(f"O serviço de check-in não recarregou o cadastro ({e}); ele relê sozinho a cada 5 minutos.")
+        else: st.warning(f"O serviço de check-in não soube da limpeza ({e}); reinicie-o antes de novas leituras desta reunião.")
+
+def presentes_reunioes(reunioes):
+    """meeting_id → códigos normalizados presentes, só das reuniões com convocação restrita
+    (nas de "Todos" ninguém esteve sem convocação). Cada reunião fica no cache de consultas
+    pelo dia dela."""
+    saida = {}
+    for r in reunioes:
+        if Cadastro.COLUNA_FILTRO.get(r.get("filtro_tipo") or "Todos") is None: continue
+        mid = str(r.get("id"))
+        try: ini = fim = date.fromisoformat(str(r.get("data"))[:10])
+        except ValueError: ini, fim = date.min, date.max
+        saida[mid] = consultas().obter(("presencas", ini, fim, mid), lambda mid=mid: frozenset(
+            normalizar_codigo(l["id_participante"]) for l in armazenamento.presencas_reuniao(mid)))
+    return saida
+
+# texto das exportações (sem acentos, como o resto do PDF)
+CRITERIO_FREQUENCIA = {False: "total de reunioes do periodo",
+                       True: "reunioes convocadas + presencas sem convocacao"}
+
+@st.cache_resource
+def diario_presencas():
+    # inserir_presencas é idempotente, então reenvios do mesmo check-in não duplicam
+    cache, agregados = consultas(), agregados_presenca()
+    def gravar(rows):
+        novas = armazenamento.inserir_presencas(rows)   # só as que o banco ainda não tinha
+        agregados.registrar(novas)
+        cache.invalidar("presencas", [r["data_registro"] for r in rows])   # agora o banco já tem essas linhas
+        return novas
+    return DiarioPresencas(config("DIARIO_PRESENCAS", "presencas_locais.db"), gravar)
 
 def carregar_presencas_reuniao(mid):
+    """Presenças do banco unidas às pendentes do diário local que ainda não aparecem lá."""
+    pendentes = diario_presencas().da_reuniao(mid)
     try:
-        res = supabase_client.table("presencas").select("*").eq("meeting_id",str(mid)).execute()
-        if not res.data: return pd.DataFrame(columns=["ID","Nome","Cargo","Localidade","Horario"])
-        df = pd.DataFrame(res.data).rename(columns={
-            "id_participante":"ID","nome":"Nome","cargo":"Cargo",
-            "localidade":"Localidade","horario":"Horario"})
-        return df[["ID","Nome","Cargo","Localidade","Horario"]]
+        remotos = armazenamento.presencas_reuniao(mid)
     except Exception as e:
-        st.error(f"Erro: {e}"); return pd.DataFrame(columns=["ID","Nome","Cargo","Localidade","Horario"])
+        st.warning(f"Sem conexão com o banco, exibindo registros locais: {e}"); remotos = []
+    dados = mesclar_presencas(remotos, pendentes)
+    if not dados: df = pd.DataFrame(columns=COLUNAS_PRESENCA)
+    else:
+        df = pd.DataFrame(dados).rename(columns={
+            "id_participante":"ID","nome":"Nome","cargo":"Cargo",
+            "localidade":"Localidade","horario":"Horario"})[COLUNAS_PRESENCA]
+    df.attrs["cursor"] = max((p["id"] for p in remotos if p.get("id") is not None), default=0)
+    return df
 
-def salvar_presenca(mid, row):
-    try:
-        supabase_client.table("presencas").insert({
-            "meeting_id":str(mid), "id_participante":str(row["ID"]),
-            "nome":row["Nome"], "cargo":row["Cargo"],
-            "localidade":row["Localidade"], "horario":row["Horario"],
-            "data_registro":obter_hora_atual().isoformat()
-        }).execute(); return True
-    except Exception as e:
-        st.error(f"Erro: {e}"); return False
+@st.cache_resource
+def acompanhamento_reunioes():
+    return AcompanhamentoReunioes(armazenamento.presencas_desde, SYNC_SEGUNDOS or 5.0)
+
+def sincronizar_presencas(lista):
+    """Junta à lista as presenças gravadas no banco depois do cursor (outros tablets,
+    leitor.html) que a thread de acompanhamento já trouxe. Não acessa o banco."""
+    if not lista.meeting_id: return 0
+    n = 0
+    for p in acompanhamento_reunioes().novas(lista.meeting_id, lista.cursor):
+        lista.cursor = max(lista.cursor, p["id"])
+        if p["id_participante"] in lista: continue
+        lista.adicionar({"ID":p["id_participante"], "Nome":p["nome"], "Cargo":p["cargo"],
+                         "Localidade":p["localidade"], "Horario":p["horario"]})
+        n += 1
+    return n
+
+def salvar_presencas(mid, rows):
+    """Grava no diário local e confirma na hora, sem esperar a rede: a thread do diário envia
+    ao banco e acusa depois quem já tinha sido registrado em outra estação (painel_presencas).
+    Retorna False se nem o diário pôde gravar."""
+    agora = obter_hora_atual().isoformat()
+    linhas = [{
+        "meeting_id":str(mid), "id_participante":str(row["ID"]),
+        "nome":row["Nome"], "cargo":row["Cargo"],
+        "localidade":row["Localidade"], "horario":row["Horario"],
+        "data_registro":agora
+    } for row in rows]
+    try: diario_presencas().registrar(linhas)
+    except Exception as e: st.error(f"Erro: {e}"); return False
+    return True
 
 def limpar_presencas_reuniao(mid):
-    try: supabase_client.table("presencas").delete().eq("meeting_id",str(mid)).execute(); return True
+    diario = diario_presencas()
+    try:
+        removidas = mesclar_presencas(armazenamento.presencas_reuniao(mid), diario.da_reuniao(mid))
+    except Exception:
+        removidas = None
+    if not diario.descartar_reuniao(mid):
+        st.warning("Um lote desta reunião ainda estava sendo enviado; confira a lista depois de alguns segundos.")
+    try: armazenamento.apagar_presencas_reuniao(mid)
     except Exception as e: st.error(f"Erro: {e}"); return False
+    acompanhamento_reunioes().esquecer_reuniao(mid)
+    recarregar_servico_checkin(mid)
+    if removidas is None: agregados_presenca().invalidar(); consultas().invalidar("presencas")
+    else:
+        agregados_presenca().remover(removidas)
+        # o Supabase devolve em UTC e o cache é por dia local: 20h em Cuiabá já é o dia seguinte em UTC
+        dias = datas_locais([str(p["data_registro"]) for p in removidas if p.get("data_registro")])
+        consultas().invalidar("presencas", [str(d)[:10] for d in dias if not np.isnat(d)])
+    return True
+
+def _ler_reunioes():
+    reunioes = armazenamento.reunioes()
+    for r in reunioes: r["filtro_valores"] = valores_filtro(r)
+    return reunioes
 
 def carregar_reunioes():
+    """Todas as reuniões, do cache de consultas: só voltam ao banco depois de
+    atualizar_ou_criar_reuniao/excluir_reuniao ou do REUNIOES_TTL (60 s).
+    A lista é compartilhada entre sessões: não altere os dicts."""
     try:
-        res = supabase_client.table("reunioes").select("*").order("data").execute()
-        reunioes = res.data or []
-        for r in reunioes:
-            fv = r.get("filtro_valores")
-            if isinstance(fv,str):
-                try: r["filtro_valores"]=json.loads(fv)
-                except: r["filtro_valores"]=[]
-            elif fv is None: r["filtro_valores"]=[]
-        return reunioes
+        return consultas().obter(("reunioes", date.min, date.max), _ler_reunioes,
+                                 ttl=float(config("REUNIOES_TTL", 60)))
     except Exception as e: st.error(f"Erro: {e}"); return []
 
 def atualizar_ou_criar_reuniao(reunioes, reuniao):
     if not reuniao.get("id"):
         reuniao["id"]=obter_hora_atual().strftime("%Y%m%d%H%M%S%f")
         reuniao["criada_em"]=obter_hora_atual().isoformat(timespec="seconds")
-    try: supabase_client.table("reunioes").upsert(reuniao).execute()
+    if reuniao.get("filtro_tipo") == "Manual":   # convocação antiga com nomes: já grava os IDs
+        ids = carregar_dados_participantes().migrar_manual(valores_filtro(reuniao))
+        if ids is not None: reuniao["filtro_valores"] = ids
+    try: armazenamento.salvar_reuniao(reuniao)
     except Exception as e: st.error(f"Erro: {e}")
+    # a data antiga também sai do cache, caso a reunião tenha mudado de dia
+    consultas().invalidar("reunioes", [r.get("data") for r in reunioes if r.get("id") == reuniao["id"]] + [reuniao.get("data")])
     return carregar_reunioes()
 
 def excluir_reuniao(reunioes, rid):
-    try: supabase_client.table("reunioes").delete().eq("id",rid).execute()
+    try: armazenamento.excluir_reuniao(rid)
     except Exception as e: st.error(f"Erro: {e}")
+    consultas().invalidar("reunioes", [r.get("data") for r in reunioes if r.get("id") == rid])
     return carregar_reunioes()
 
 def label_reuniao(r): return f"{r.get('data','?')} • {r.get('hora','?')} — {r.get('nome','?')}"
 
-def registrar_por_codigo(codigo, df_part, meeting_id):
-    codigo = str(codigo).strip()
-    if not codigo: return None, None
-    part = df_part[df_part["ID"].astype(str).str.strip()==codigo]
-    if part.empty: return "erro", f"Código '{codigo}' não encontrado."
-    nome = part.iloc[0]["Nome"]; id_p = str(part.iloc[0]["ID"]).strip()
+def registrar_codigos(codigos, indice, meeting_id):
+    """Registra todos os crachás lidos de uma vez, com uma única gravação em lote.
+    Retorna [(codigo, status, msg)] na ordem de leitura."""
     ja = st.session_state.lista_presenca
-    if not ja.empty and id_p in ja["ID"].astype(str).values:
-        return "duplicado", f"{nome} já foi registrado."
-    hora_reg = obter_hora_atual().strftime("%H:%M:%S")
-    novo = {"ID":id_p, "Nome":nome, "Cargo":part.iloc[0]["Cargo"],
-            "Localidade":part.iloc[0]["Localidade"], "Horario":hora_reg}
-    if salvar_presenca(meeting_id, novo):
-        st.session_state.lista_presenca = pd.concat(
-            [st.session_state.lista_presenca, pd.DataFrame([novo])], ignore_index=True)
-        st.session_state.ultimo_registrado = novo
-        return "ok", nome
-    return "erro", "Falha ao salvar."
+    chave, versao_min = config("CRACHA_CHAVE", ""), config("CRACHA_VERSAO_MIN", 0)
+    exigir = str(config("CRACHA_EXIGIR_ASSINADO", "")).lower() in ("1", "true", "sim")
+    resultados, novos = classificar_leituras(codigos, indice, ja, obter_hora_atual().strftime("%H:%M:%S"),
+                                             lambda c: validar(c, chave, versao_min, exigir))
+    if novos and salvar_presencas(meeting_id, novos):
+        for novo in novos: ja.adicionar(novo)
+        st.session_state.ultimo_registrado = novos[-1]
+    elif novos:
+        for res in resultados:
+            if res[1] == "ok": res[1], res[2] = "erro", "Falha ao salvar."
+    return [tuple(res) for res in resultados]
+
+def registrar_por_codigo(codigo, indice, meeting_id):
+    res = registrar_codigos([codigo], indice, meeting_id)
+    return res[0][1:] if res else (None, None)
 
 
 # ════════════════════ EXPORT ════════════════════
+class PDFRelatorio(FPDF):
+    """Cabeçalho com título e linhas de subtítulo repetido em todas as páginas."""
+    def __init__(self, titulo, subtitulos=()):
+        super().__init__(); self.titulo, self.subtitulos = titulo, subtitulos
+    def header(self):
+        self.set_font("Helvetica","B",14)
+        self.cell(0,10,texto_pdf(self.titulo),0,1,"C")
+        self.set_font("Helvetica","",10)
+        for s in self.subtitulos: self.cell(0,6,texto_pdf(s),0,1,"C")
+        self.ln(4)
+
 def gerar_pdf(df_p, rc, rl, titulo):
-    class PDF(FPDF):
-        def header(self):
-            self.set_font("Arial","B",14)
-            self.cell(0,10,f"Relatorio: {titulo}",0,1,"C")
-            self.set_font("Arial","",10)
-            self.cell(0,6,f"Gerado em: {obter_hora_atual().strftime('%d/%m/%Y %H:%M')}",0,1,"C")
-            self.ln(4)
-    pdf=PDF(); pdf.add_page()
-    def tp(t):
-        try: return str(t).encode("latin-1","replace").decode("latin-1")
-        except: return str(t)
-    pdf.set_font("Arial","B",12); pdf.cell(0,10,"RESUMO",ln=True)
-    pdf.set_font("Arial",size=10)
-    for c,q in rc.items(): pdf.cell(0,6,tp(f"  {c}: {q}"),ln=True)
-    for l,q in rl.items(): pdf.cell(0,6,tp(f"  {l}: {q}"),ln=True)
-    pdf.ln(6); pdf.set_font("Arial","B",12); pdf.cell(0,10,"PRESENTES",ln=True)
-    pdf.set_fill_color(200,220,255); pdf.set_font("Arial","B",8)
-    cw=[60,50,50,30]
-    for h2,w2 in zip(["Nome","Cargo","Localidade","Horario"],cw): pdf.cell(w2,8,h2,1,0,"C",1)
-    pdf.ln(); pdf.set_font("Arial",size=7)
-    for _,row in df_p.iterrows():
-        pdf.cell(cw[0],8,tp(str(row["Nome"])[:35]),1)
-        pdf.cell(cw[1],8,tp(str(row["Cargo"])[:28]),1)
-        pdf.cell(cw[2],8,tp(str(row["Localidade"])[:28]),1)
-        pdf.cell(cw[3],8,str(row["Horario"]),1,1)
+    pdf=PDFRelatorio(f"Relatorio: {titulo}", [f"Gerado em: {obter_hora_atual().strftime('%d/%m/%Y %H:%M')}"])
+    pdf.add_page()
+    pdf.set_font("Helvetica","B",12); pdf.cell(0,10,"RESUMO",ln=True)
+    pdf.set_font("Helvetica",size=10)
+    for c,q in rc.items(): pdf.cell(0,6,texto_pdf(f"  {c}: {q}"),ln=True)
+    for l,q in rl.items(): pdf.cell(0,6,texto_pdf(f"  {l}: {q}"),ln=True)
+    pdf.ln(6); pdf.set_font("Helvetica","B",12); pdf.cell(0,10,"PRESENTES",ln=True)
+    TabelaPDF(pdf, ["Nome","Cargo","Localidade","Horario"], [60,50,50,30], limites=[35,28,28,None]).escrever(
+        zip(df_p["Nome"], df_p["Cargo"], df_p["Localidade"], df_p["Horario"]))
     return bytes(pdf.output())
 
-def gerar_pdf_relatorio_geral(df_rel, titulo, data_ini, data_fim, total_reunioes, total_presencas):
-    class PDF(FPDF):
-        def header(self):
-            self.set_font("Arial","B",14)
-            self.cell(0,10,tp(f"Relatorio Geral: {titulo}"),0,1,"C")
-            self.set_font("Arial","",10)
-            self.cell(0,6,f"Periodo: {data_ini.strftime('%d/%m/%Y')} a {data_fim.strftime('%d/%m/%Y')}",0,1,"C")
-            self.cell(0,6,f"Gerado em: {obter_hora_atual().strftime('%d/%m/%Y %H:%M')}",0,1,"C")
-            self.ln(4)
-    def tp(t):
-        try: return str(t).encode("latin-1","replace").decode("latin-1")
-        except: return str(t)
-    pdf=PDF(); pdf.add_page()
-    pdf.set_font("Arial","B",12); pdf.cell(0,8,"RESUMO DO PERIODO",ln=True)
-    pdf.set_font("Arial",size=10)
+def gerar_pdf_relatorio_geral(df_rel, titulo, data_ini, data_fim, total_reunioes, total_presencas,
+                              criterio=CRITERIO_FREQUENCIA[False]):
+    pdf=PDFRelatorio(f"Relatorio Geral: {titulo}", [
+        f"Periodo: {data_ini.strftime('%d/%m/%Y')} a {data_fim.strftime('%d/%m/%Y')}",
+        f"Gerado em: {obter_hora_atual().strftime('%d/%m/%Y %H:%M')}"])
+    pdf.add_page()
+    pdf.set_font("Helvetica","B",12); pdf.cell(0,8,"RESUMO DO PERIODO",ln=True)
+    pdf.set_font("Helvetica",size=10)
     pdf.cell(0,6,f"  Total de Reunioes: {total_reunioes}",ln=True)
     pdf.cell(0,6,f"  Total de Presencas: {total_presencas}",ln=True)
     pdf.cell(0,6,f"  Total de Participantes: {len(df_rel)}",ln=True)
+    pdf.cell(0,6,f"  Frequencia sobre: {criterio}",ln=True)
     pdf.ln(4)
-    pdf.set_font("Arial","B",12); pdf.cell(0,8,"RANKING DE PRESENCAS",ln=True)
-    pdf.set_fill_color(200,220,255); pdf.set_font("Arial","B",8)
-    cw2=[8,60,40,20,18]
-    for h2,w2 in zip(["#","Nome","Cargo","Presencas","Freq%"],cw2): pdf.cell(w2,8,h2,1,0,"C",1)
-    pdf.ln(); pdf.set_font("Arial",size=7)
-    for i,(_,row) in enumerate(df_rel.iterrows(),1):
-        pdf.cell(cw2[0],8,str(i),1)
-        pdf.cell(cw2[1],8,tp(str(row["Nome"])[:38]),1)
-        pdf.cell(cw2[2],8,tp(str(row["Cargo"])[:25]),1)
-        pdf.cell(cw2[3],8,str(int(row["Presencas"])),1,0,"C")
-        pdf.cell(cw2[4],8,f"{row['Frequencia_%']:.1f}%",1,1,"C")
+    pdf.set_font("Helvetica","B",12); pdf.cell(0,8,"RANKING DE PRESENCAS",ln=True)
+    tabela=TabelaPDF(pdf, ["#","Nome","Cargo","Presencas","Freq%"], [8,60,40,20,18],
+                     alinhamentos=["L","L","L","C","C"], limites=[None,38,25,None,None])
+    if df_rel.empty: tabela.escrever([]); return bytes(pdf.output())
+    freq=[f"{f:.1f}%" for f in df_rel["Frequencia_%"].tolist()]
+    tabela.escrever(zip(range(1,len(df_rel)+1), df_rel["Nome"], df_rel["Cargo"],
+                        df_rel["Presencas"].astype(int).tolist(), freq))
     return bytes(pdf.output())
 
 def gerar_excel(df_p, rc, rl, titulo):
-    wb=Workbook(); wb.remove(wb.active)
-    hf=Font(name="Calibri",size=12,bold=True,color="FFFFFF")
-    hfill=PatternFill(start_color="1F4E78",end_color="1F4E78",fill_type="solid")
-    ha=Alignment(horizontal="center",vertical="center",wrap_text=True)
-    bd=Border(left=Side(style="thin"),right=Side(style="thin"),top=Side(style="thin"),bottom=Side(style="thin"))
-    ws=wb.create_sheet("Resumo",0)
-    ws["A1"]=f"Relatorio: {titulo}"; ws["A1"].font=Font(name="Calibri",size=14,bold=True)
-    ws.merge_cells("A1:D1"); ws["A3"]="Por Cargo"; ws["A3"].font=Font(bold=True)
-    ws.append(["Cargo","Qtd"])
-    for cell in ws[4]: cell.font=hf;cell.fill=hfill;cell.alignment=ha;cell.border=bd
-    for c,q in rc.items():
-        ws.append([c,int(q)])
-        for cell in ws[ws.max_row]: cell.border=bd
-    ws.append([]); ws.append(["Por Localidade",""]); ws[ws.max_row][0].font=Font(bold=True)
-    ws.append(["Localidade","Qtd"])
-    for cell in ws[ws.max_row]: cell.font=hf;cell.fill=hfill;cell.alignment=ha;cell.border=bd
-    for l,q in rl.items():
-        ws.append([l,int(q)])
-        for cell in ws[ws.max_row]: cell.border=bd
-    ws.column_dimensions["A"].width=40; ws.column_dimensions["B"].width=12
-    wl=wb.create_sheet("Lista",1)
-    wl.append(["ID","Nome","Cargo","Localidade","Horario"])
-    for cell in wl[1]: cell.font=hf;cell.fill=hfill;cell.alignment=ha;cell.border=bd
-    for r in df_p.itertuples(index=False):
-        wl.append([r.ID,r.Nome,r.Cargo,r.Localidade,r.Horario])
-        for cell in wl[wl.max_row]: cell.border=bd
-    for col,w2 in zip(["A","B","C","D","E"],[12,35,20,25,12]):
-        wl.column_dimensions[col].width=w2
-    eb=BytesIO(); wb.save(eb); eb.seek(0); return eb.getvalue()
-
-def gerar_excel_relatorio_geral(df_rel, titulo, data_ini, data_fim, total_reunioes, total_presencas):
-    wb=Workbook(); wb.remove(wb.active)
-    hf=Font(name="Calibri",size=11,bold=True,color="FFFFFF")
-    hfill=PatternFill(start_color="1F4E78",end_color="1F4E78",fill_type="solid")
-    ha=Alignment(horizontal="center",vertical="center",wrap_text=True)
-    bd=Border(left=Side(style="thin"),right=Side(style="thin"),top=Side(style="thin"),bottom=Side(style="thin"))
-    ws=wb.create_sheet("Relatorio Geral",0)
-    ws["A1"]=f"Relatorio Geral — {titulo}"
-    ws["A1"].font=Font(name="Calibri",size=14,bold=True)
-    ws.merge_cells("A1:F1")
-    ws["A2"]=f"Periodo: {data_ini.strftime('%d/%m/%Y')} a {data_fim.strftime('%d/%m/%Y')}"
-    ws.merge_cells("A2:F2")
-    ws["A3"]=f"Gerado em: {obter_hora_atual().strftime('%d/%m/%Y %H:%M')}"
-    ws.merge_cells("A3:F3")
-    ws.append([])
-    ws.append(["Total Reunioes",total_reunioes,"Total Presencas",total_presencas,"Participantes",len(df_rel)])
-    ws.append([])
+    pl=PlanilhaStream(tam_cabecalho=12)
+    ws=pl.aba("Resumo", [40,12], mesclar=["A1:D1"])
+    pl.linha(ws,[f"Relatorio: {titulo}"],"titulo"); pl.linha(ws,[])
+    pl.linha(ws,["Por Cargo"],"negrito")
+    pl.tabela(ws,["Cargo","Qtd"],((c,int(q)) for c,q in rc.items()))
+    pl.linha(ws,[]); pl.linha(ws,["Por Localidade"],"negrito")
+    pl.tabela(ws,["Localidade","Qtd"],((l,int(q)) for l,q in rl.items()))
+    wl=pl.aba("Lista", [12,35,20,25,12])
+    pl.tabela(wl,["ID","Nome","Cargo","Localidade","Horario"],
+              zip(df_p["ID"], df_p["Nome"], df_p["Cargo"], df_p["Localidade"], df_p["Horario"]))
+    return pl.bytes()
+
+def gerar_excel_relatorio_geral(df_rel, titulo, data_ini, data_fim, total_reunioes, total_presencas,
+                                criterio=CRITERIO_FREQUENCIA[False]):
+    pl=PlanilhaStream()
+    ws=pl.aba("Relatorio Geral", [5,10,35,22,25,12,14], mesclar=["A1:F1","A2:F2","A3:F3","A4:F4"])
+    pl.linha(ws,[f"Relatorio Geral — {titulo}"],"titulo")
+    pl.linha(ws,[f"Periodo: {data_ini.strftime('%d/%m/%Y')} a {data_fim.strftime('%d/%m/%Y')}"])
+    pl.linha(ws,[f"Gerado em: {obter_hora_atual().strftime('%d/%m/%Y %H:%M')}"])
+    pl.linha(ws,[f"Frequencia sobre: {criterio}"])
+    pl.linha(ws,[])
+    pl.linha(ws,["Total Reunioes",total_reunioes,"Total Presencas",total_presencas,"Participantes",len(df_rel)])
+    pl.linha(ws,[])
     headers=["#","ID","Nome","Cargo","Localidade","Presencas","Frequencia %"]
-    ws.append(headers)
-    for cell in ws[ws.max_row]: cell.font=hf;cell.fill=hfill;cell.alignment=ha;cell.border=bd
-    for i,(_,row) in enumerate(df_rel.iterrows(),1):
-        ws.append([i,str(row["ID"]),row["Nome"],row["Cargo"],row["Localidade"],int(row["Presencas"]),float(row["Frequencia_%"])])
-        for cell in ws[ws.max_row]: cell.border=bd
-    for col,w2 in zip(["A","B","C","D","E","F","G"],[5,10,35,22,25,12,14]):
-        ws.column_dimensions[col].width=w2
-    eb=BytesIO(); wb.save(eb); eb.seek(0); return eb.getvalue()
+    if df_rel.empty: pl.tabela(ws,headers,[]); return pl.bytes()
+    pl.tabela(ws,headers,zip(range(1,len(df_rel)+1), df_rel["ID"].astype(str), df_rel["Nome"], df_rel["Cargo"],
+                             df_rel["Localidade"], df_rel["Presencas"].astype(int).tolist(),
+                             df_rel["Frequencia_%"].astype(float).tolist()))
+    return pl.bytes()
+
+class CacheLRU:
+    """LRU compartilhado entre sessões (arquivos exportados, figuras), com `maximo` itens."""
+    def __init__(self, maximo=16):
+        self.maximo, self._itens, self._lock = maximo, OrderedDict(), threading.Lock()
+        self.acertos = self.geracoes = 0
+
+    def obter(self, chave, gerar):
+        with self._lock:
+            if chave in self._itens:
+                self._itens.move_to_end(chave); self.acertos += 1
+                return self._itens[chave]
+        dados = gerar()
+        with self._lock:
+            self._itens[chave] = dados; self._itens.move_to_end(chave); self.geracoes += 1
+            while len(self._itens) > self.maximo: self._itens.popitem(last=False)
+        return dados
+
+@st.cache_resource
+def cache_exportacoes():
+    return CacheLRU(int(config("EXPORTACOES_CACHE", 16)))
+
+def versao_dados(df):
+    """Hash do conteúdo exportado: muda com qualquer linha incluída, removida ou alterada."""
+    if isinstance(df, pd.Series): df = df.reset_index()
+    if df.empty: return "0"
+    return hashlib.blake2b(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes(), digest_size=12).hexdigest()
+
+def exportacao(gerar, escopo, df, *args):
+    """Callable para `st.download_button(data=...)`: nada é gerado no rerun, só no clique,
+    e o mesmo arquivo é reaproveitado enquanto escopo e dados não mudarem."""
+    cache = cache_exportacoes()
+    simples = tuple(a for a in args if isinstance(a, (str, int, float, date)))   # título, período, totais
+    return lambda: cache.obter((gerar.__name__, escopo, versao_dados(df), simples), lambda: gerar(df, *args))
+
+@st.cache_resource
+def cache_qr():
+    workers = config("CRACHAS_PROCESSOS")
+    return CacheQR(int(config("CRACHAS_CACHE", 50_000)), int(workers) if workers else None)
+
+def gerar_pdf_crachas(df, titulo, versao):
+    """Crachás do `df` (ID, Nome, Cargo, Localidade). `versao` > 0 gera o código assinado
+    da tiragem (crachas.py); 0 usa o ID simples."""
+    ids = df["ID"].astype(str).str.strip().tolist()
+    chave = config("CRACHA_CHAVE", "")
+    payloads = [gerar_codigo(i, versao, chave) for i in ids] if versao else ids
+    pngs = cache_qr().obter(list(zip(ids, payloads)))
+    return pdf_crachas(zip(ids, df["Nome"].astype(str), df["Cargo"].astype(str), df["Localidade"].astype(str)),
+                       pngs, titulo)
 
 
 # ════════════════════ RELATÓRIO GERAL — FUNÇÕES ════════════════════
-def carregar_presencas_periodo(data_ini, data_fim):
-    try:
-        res = (
-            supabase_client.table("presencas")
-            .select("*")
-            .gte("data_registro", f"{data_ini}T00:00:00")
-            .lte("data_registro", f"{data_fim}T23:59:59")
-            .execute()
-        )
-        if not res.data:
-            return pd.DataFrame()
-        return pd.DataFrame(res.data)
-    except Exception as e:
-        st.error(f"Erro ao carregar presenças do período: {e}")
+PAGINA_PERIODO = 1000   # linhas por requisição (limite padrão de max-rows do PostgREST)
+
+COLUNAS_PERIODO = ["id_participante", "cargo", "localidade", "data_registro"]
+
+def carregar_presencas_periodo(data_ini, data_fim, progresso=None):
+    """Carrega o período página a página, só com as colunas usadas nos relatórios.
+    Textos viram códigos int32 de Categoricals e datas viram datetime64 (hora local).
+    Erros de rede sobem para quem chamou (um mês vazio por falha não pode ser guardado)."""
+    categorias = {c: {} for c in COLUNAS_PERIODO[:-1]}
+    codigos, datas = {c: [] for c in categorias}, []
+    for pagina in armazenamento.presencas_periodo(data_ini, data_fim, COLUNAS_PERIODO, pagina=PAGINA_PERIODO):
+        for c, mapa in categorias.items():
+            codigos[c].append(np.fromiter((mapa.setdefault(str(p[c] or ""), len(mapa)) for p in pagina),
+                                          np.int32, len(pagina)))
+        datas.append(datas_locais([p["data_registro"] for p in pagina]))
+        if progresso: progresso(sum(map(len, datas)))
+    if not datas:
         return pd.DataFrame()
+    df = pd.DataFrame({c: pd.Categorical.from_codes(np.concatenate(codigos[c]), list(categorias[c]))
+                       for c in categorias})
+    df["data_registro"] = np.concatenate(datas)
+    return df
 
 def carregar_reunioes_periodo(data_ini, data_fim):
     try:
-        res = (
-            supabase_client.table("reunioes")
-            .select("*")
-            .gte("data", str(data_ini))
-            .lte("data", str(data_fim))
-            .execute()
-        )
-        return pd.DataFrame(res.data) if res.data else pd.DataFrame()
+        dados = consultas().obter(("reunioes", data_ini, data_fim),
+                                  lambda: armazenamento.reunioes_periodo(data_ini, data_fim))
+        return pd.DataFrame(dados) if dados else pd.DataFrame()
     except Exception as e:
         st.error(f"Erro ao carregar reuniões do período: {e}")
         return pd.DataFrame()
 
-def montar_relatorio_geral(df_pres, df_participantes, total_reunioes):
-    if df_participantes.empty:
-        return pd.DataFrame()
-    base = df_participantes[["ID","Nome","Cargo","Localidade"]].copy()
-    if df_pres.empty:
-        base["Presencas"] = 0
-        base["Frequencia_%"] = 0.0
-        return base.sort_values(["Presencas","Nome"], ascending=[False,True]).reset_index(drop=True)
-    freq = (
-        df_pres.groupby(["id_participante","nome","cargo","localidade"])
-        .size()
-        .reset_index(name="Presencas")
-        .rename(columns={"id_participante":"ID","nome":"Nome","cargo":"Cargo","localidade":"Localidade"})
-    )
-    rel = base.merge(freq[["ID","Presencas"]], on="ID", how="left")
-    rel["Presencas"] = rel["Presencas"].fillna(0).astype(int)
-    rel["Frequencia_%"] = rel["Presencas"].apply(
-        lambda x: round((x / total_reunioes) * 100, 2) if total_reunioes > 0 else 0.0
-    )
-    return rel.sort_values(["Presencas","Nome"], ascending=[False,True]).reset_index(drop=True)
+@st.cache_resource   # uma instância só: o diário soma nela o que sincroniza em segundo plano
+def agregados_presenca():
+    return AgregadosPresenca(carregar_presencas_periodo, consultas(), float(config("AGREGADOS_VALIDADE", 600)))
 
 
 # ════════════════════ GRÁFICOS ════════════════════
@@ -592,27 +879,54 @@ LAYOUT_BASE = dict(
     margin=dict(t=60, b=40, l=20, r=20),
 )
 
+RANKING_BARRAS     = 40     # acima disso o ranking vira top-N + "Outros" e ganha a curva completa
+GRAFICO_MAX_PONTOS = 2000   # teto de pontos por traço enviados ao navegador
+PIZZA_FATIAS       = 12
+
+@st.cache_resource
+def cache_graficos():
+    return CacheLRU(int(config("GRAFICOS_CACHE", 32)))
+
+def figura(funcao, dados, *args):
+    """Figura memorizada pelo hash dos dados agregados; reruns com os mesmos dados não refazem o Plotly."""
+    return cache_graficos().obter((funcao.__name__, versao_dados(dados), args), lambda: funcao(dados, *args))
+
+def _top_outros(s, n):
+    """Series ordenada com as n-1 maiores e o resto somado em "Outros"."""
+    s = s[s > 0].sort_values(ascending=False)
+    if len(s) <= n: return s
+    return pd.concat([s.iloc[:n-1], pd.Series({f"Outros ({len(s)-n+1})": s.iloc[n-1:].sum()})])
+
 def grafico_barras_ranking(df_rel, data_ini, data_fim):
-    """Barras verticais — top membros por presenças, colorido por cargo."""
-    df_plot = df_rel[df_rel["Presencas"] > 0].copy()
+    """Barras verticais — top membros por presenças, colorido por cargo.
+    Com mais de RANKING_BARRAS membros, os demais viram uma barra "Outros" com a média."""
+    df_plot = df_rel.loc[df_rel["Presencas"] > 0, ["Nome","Cargo","Presencas"]]
     if df_plot.empty:
         return None
+    total = len(df_plot)
+    resto = df_plot.iloc[RANKING_BARRAS:]               # df_rel já vem ordenado por presenças
+    df_plot = df_plot.iloc[:RANKING_BARRAS].astype({"Cargo": str}).reset_index(drop=True)
+    df_plot["Texto"] = df_plot["Presencas"].astype(str)
+    if len(resto):
+        media = resto["Presencas"].mean()
+        df_plot.loc[len(df_plot)] = [f"Outros ({len(resto)})", "Outros", media, f"{media:.1f} (média)"]
     # Abreviar nomes longos para o eixo X
     df_plot["NomeAbrev"] = df_plot["Nome"].apply(
         lambda n: " ".join(n.split()[:2]) if len(n) > 18 else n
     )
+    top = f"top {RANKING_BARRAS} de {total} membros · " if len(resto) else ""
     fig = px.bar(
         df_plot,
         x="NomeAbrev",
         y="Presencas",
         color="Cargo",
-        text="Presencas",
+        text="Texto",
         color_discrete_sequence=CORES_GRAFICOS,
         labels={"NomeAbrev": "Membro", "Presencas": "Presenças", "Cargo": "Cargo"},
         title=(
             f"🏆 Ranking de Presenças"
             f"<br><span style='font-size:13px;font-weight:normal;color:#94a3b8'>"
-            f"{data_ini.strftime('%d/%m/%Y')} a {data_fim.strftime('%d/%m/%Y')}</span>"
+            f"{top}{data_ini.strftime('%d/%m/%Y')} a {data_fim.strftime('%d/%m/%Y')}</span>"
         ),
     )
     fig.update_traces(
@@ -649,9 +963,11 @@ def grafico_barras_ranking(df_rel, data_ini, data_fim):
 
 
 def graficos_pizza(df_rel):
-    """Dois gráficos de pizza lado a lado: por Cargo e por Localidade."""
-    rc_g = df_rel.groupby("Cargo")["Presencas"].sum().reset_index()
-    rl_g = df_rel.groupby("Localidade")["Presencas"].sum().reset_index()
+    """Dois gráficos de pizza lado a lado: por Cargo e por Localidade (até PIZZA_FATIAS fatias cada)."""
+    rc_g = _top_outros(df_rel.groupby("Cargo", observed=True)["Presencas"].sum(), PIZZA_FATIAS)
+    rc_g = rc_g.rename_axis("Cargo").reset_index(name="Presencas")
+    rl_g = _top_outros(df_rel.groupby("Localidade", observed=True)["Presencas"].sum(), PIZZA_FATIAS)
+    rl_g = rl_g.rename_axis("Localidade").reset_index(name="Presencas")
 
     fig = make_subplots(
         rows=1, cols=2,
@@ -706,15 +1022,51 @@ def graficos_pizza(df_rel):
     return fig
 
 
-def grafico_linha_mensal(df_pres_p, data_ini, data_fim):
-    """Linha de presenças totais por mês."""
-    df_mes = df_pres_p.copy()
-    df_mes["data_registro"] = pd.to_datetime(df_mes["data_registro"], errors="coerce")
-    df_mes = df_mes.dropna(subset=["data_registro"])
-    if df_mes.empty:
+def grafico_distribuicao(df_rel, data_ini, data_fim):
+    """Curva de presenças de todos os membros em ordem de ranking (WebGL). Acima de
+    GRAFICO_MAX_PONTOS membros, as posições são agrupadas em faixas pela média."""
+    pres = df_rel["Presencas"].to_numpy(dtype=float)
+    if not len(pres):
         return None
-    df_mes["Mes"] = df_mes["data_registro"].dt.to_period("M").astype(str)
-    mensal = df_mes.groupby("Mes").size().reset_index(name="Presencas")
+    pos = np.arange(1, len(pres) + 1, dtype=float)
+    if len(pres) > GRAFICO_MAX_PONTOS:
+        inicio = np.linspace(0, len(pres), GRAFICO_MAX_PONTOS, endpoint=False).astype(int)
+        tam = np.diff(np.append(inicio, len(pres)))
+        pres = np.add.reduceat(pres, inicio) / tam
+        pos = np.add.reduceat(pos, inicio) / tam
+    fig = go.Figure(go.Scattergl(
+        x=pos, y=pres, mode="lines",
+        line=dict(color="#6366f1", width=2),
+        fill="tozeroy", fillcolor="rgba(99,102,241,0.12)",
+        hovertemplate="Posição %{x:.0f}<br>Presenças: %{y:.1f}<extra></extra>",
+    ))
+    fig.update_layout(
+        **LAYOUT_BASE,
+        height=320,
+        title=(
+            f"👥 Presenças de Todos os Membros"
+            f"<br><span style='font-size:13px;font-weight:normal;color:#94a3b8'>"
+            f"{len(df_rel)} membros · {data_ini.strftime('%d/%m/%Y')} a {data_fim.strftime('%d/%m/%Y')}</span>"
+        ),
+        xaxis=dict(
+            title="Posição no ranking",
+            gridcolor="rgba(99,102,241,0.12)",
+            linecolor="rgba(99,102,241,0.3)",
+        ),
+        yaxis=dict(
+            title="Presenças",
+            gridcolor="rgba(99,102,241,0.12)",
+            linecolor="rgba(99,102,241,0.3)",
+        ),
+    )
+    return fig
+
+
+def grafico_linha_mensal(mensal, data_ini, data_fim):
+    """Linha de presenças totais por mês (`mensal`: Series "AAAA-MM" → presenças)."""
+    if mensal.empty:
+        return None
+    mensal = mensal.rename_axis("Mes").reset_index(name="Presencas")
     fig = px.line(
         mensal, x="Mes", y="Presencas",
         markers=True,
@@ -749,10 +1101,8 @@ def grafico_linha_mensal(df_pres_p, data_ini, data_fim):
 
 
 # ════════════════════ INIT SESSION STATE ════════════════════
-df_participantes = carregar_dados_participantes()
-if not df_participantes.empty:
-    df_participantes = df_participantes.rename(
-        columns={"id":"ID","nome":"Nome","cargo":"Cargo","localidade":"Localidade"})
+cadastro = carregar_dados_participantes()
+df_participantes, indice_participantes = cadastro.df, cadastro.indice
 
 reunioes = carregar_reunioes()
 hoje = date.today().strftime("%Y-%m-%d")
@@ -760,13 +1110,15 @@ hoje = date.today().strftime("%Y-%m-%d")
 defaults = {
     "pagina":            "home",
     "active_meeting_id": None,
-    "lista_presenca":    pd.DataFrame(columns=["ID","Nome","Cargo","Localidade","Horario"]),
+    "lista_presenca":    PresencasReuniao(),
     "feedback_status":   None,
     "feedback_msg":      "",
+    "feedback_lote":     [],
     "ultimo_registrado": None,
     "modo_continuo":     True,
     "ultima_foto_hash":  None,
     "reuniao_edit_id":   None,
+    "decodificador_qr":  DecodificadorQR(),
 }
 for k,v in defaults.items():
     if k not in st.session_state: st.session_state[k]=v
@@ -776,6 +1128,10 @@ for k,v in defaults.items():
 with st.sidebar:
     st.markdown('<div style="text-align:center;padding:10px 0 4px"><span style="font-size:2rem">🎵</span><br><span style="color:#a5b4fc;font-weight:800">CCB Musical</span></div>', unsafe_allow_html=True)
     st.caption("Menu auxiliar")
+    if cadastro.colisoes:
+        st.warning(f"⚠️ {len(cadastro.colisoes)} ID(s) do cadastro só diferem de outro em maiúsculas/minúsculas "
+                   "e não podem ser lidos pelo crachá: "
+                   + ", ".join(f"{b} (lido como {a})" for a, b in cadastro.colisoes[:10]))
     st.divider()
     if st.button("🏠  Início", use_container_width=True):
         st.session_state.pagina = "home"; st.rerun()
@@ -785,6 +1141,10 @@ with st.sidebar:
         st.session_state.pagina = "lista"; st.rerun()
     if st.button("📊  Relatórios Gerais", use_container_width=True):
         st.session_state.pagina = "relatorios_gerais"; st.rerun()
+    if st.button("🪪  Crachás", use_container_width=True):
+        st.session_state.pagina = "crachas"; st.rerun()
+    if st.button("📥  Importar Cadastro", use_container_width=True):
+        st.session_state.pagina = "importar"; st.rerun()
 
 
 # ═══════════════════════════════════════════════════════════
@@ -834,7 +1194,7 @@ if st.session_state.pagina == "home":
 """, unsafe_allow_html=True)
                 if st.button(f"▶  Iniciar Check-in", key=f"home_hoje_{r['id']}", type="primary", use_container_width=True):
                     st.session_state.active_meeting_id = r["id"]
-                    st.session_state.lista_presenca    = carregar_presencas_reuniao(r["id"])
+                    st.session_state.lista_presenca    = PresencasReuniao(r["id"], carregar_presencas_reuniao(r["id"]))
                     st.session_state.feedback_status   = None
                     st.session_state.ultimo_registrado = None
                     st.session_state.pagina            = "checkin"
@@ -854,7 +1214,7 @@ if st.session_state.pagina == "home":
 """, unsafe_allow_html=True)
                 if st.button(f"▶  Iniciar Check-in", key=f"home_fut_{r['id']}", type="primary", use_container_width=True):
                     st.session_state.active_meeting_id = r["id"]
-                    st.session_state.lista_presenca    = carregar_presencas_reuniao(r["id"])
+                    st.session_state.lista_presenca    = PresencasReuniao(r["id"], carregar_presencas_reuniao(r["id"]))
                     st.session_state.feedback_status   = None
                     st.session_state.ultimo_registrado = None
                     st.session_state.pagina            = "checkin"
@@ -892,12 +1252,12 @@ elif st.session_state.pagina == "nova_reuniao":
         ops = ["Todos","Por Cargo","Por Localidade","Manual"]
         ft  = st.selectbox("Convocação", ops)
         vals = []
-        if ft=="Por Cargo" and not df_participantes.empty:
-            vals = st.multiselect("Cargos", sorted(df_participantes["Cargo"].unique()))
-        elif ft=="Por Localidade" and not df_participantes.empty:
-            vals = st.multiselect("Localidades", sorted(df_participantes["Localidade"].unique()))
-        elif ft=="Manual" and not df_participantes.empty:
-            vals = st.multiselect("Participantes", sorted(df_participantes["Nome"].unique()))
+        if ft=="Por Cargo" and not cadastro.empty:
+            vals = st.multiselect("Cargos", cadastro.facetas["Cargo"], format_func=cadastro.rotulo("Cargo"))
+        elif ft=="Por Localidade" and not cadastro.empty:
+            vals = st.multiselect("Localidades", cadastro.facetas["Localidade"], format_func=cadastro.rotulo("Localidade"))
+        elif ft=="Manual" and not cadastro.empty:
+            vals = st.multiselect("Participantes", cadastro.opcoes_manual, format_func=cadastro.rotulo_id)
 
         col_s, col_c3 = st.columns(2)
         with col_s:
@@ -964,15 +1324,15 @@ elif st.session_state.pagina == "editar_reuniao":
         ops = ["Todos","Por Cargo","Por Localidade","Manual"]
         ft  = st.selectbox("Convocação", ops, index=ops.index(filtro_def) if filtro_def in ops else 0)
         vals = []
-        if ft=="Por Cargo" and not df_participantes.empty:
-            op2=sorted(df_participantes["Cargo"].unique())
-            vals=st.multiselect("Cargos",op2,default=[v for v in vals_def if v in op2])
-        elif ft=="Por Localidade" and not df_participantes.empty:
-            op2=sorted(df_participantes["Localidade"].unique())
-            vals=st.multiselect("Localidades",op2,default=[v for v in vals_def if v in op2])
-        elif ft=="Manual" and not df_participantes.empty:
-            op2=sorted(df_participantes["Nome"].unique())
-            vals=st.multiselect("Participantes",op2,default=[v for v in vals_def if v in op2])
+        if ft=="Por Cargo" and not cadastro.empty:
+            op2=cadastro.facetas["Cargo"]; ex=cadastro.contagens["Cargo"]
+            vals=st.multiselect("Cargos",op2,default=[v for v in vals_def if v in ex],format_func=cadastro.rotulo("Cargo"))
+        elif ft=="Por Localidade" and not cadastro.empty:
+            op2=cadastro.facetas["Localidade"]; ex=cadastro.contagens["Localidade"]
+            vals=st.multiselect("Localidades",op2,default=[v for v in vals_def if v in ex],format_func=cadastro.rotulo("Localidade"))
+        elif ft=="Manual" and not cadastro.empty:
+            vals=st.multiselect("Participantes",cadastro.opcoes_manual,format_func=cadastro.rotulo_id,
+                                default=cadastro.ids_manuais(vals_def) if filtro_def=="Manual" else [])
 
         col_s2, col_c4 = st.columns(2)
         with col_s2:
@@ -1027,11 +1387,7 @@ elif st.session_state.pagina == "checkin":
         if st.button("⬅  Voltar", key="volt_checkin", use_container_width=True):
             st.session_state.pagina="home"; st.rerun()
 
-    conv_df    = filtrar_convocados(df_participantes, reuniao_ativa)
-    total_conv = len(conv_df)
-    total_pres = len(st.session_state.lista_presenca)
-    porc       = int(total_pres / total_conv * 100) if total_conv > 0 else 0
-    faltantes  = max(0, total_conv - total_pres)
+    convocados = convocados_reuniao(cadastro, reuniao_ativa)
 
     st.markdown(f"""
 <div class="banner">
@@ -1043,19 +1399,8 @@ elif st.session_state.pagina == "checkin":
 </div>
 """, unsafe_allow_html=True)
 
-    st.markdown(
-        f'<div class="metric-row">'
-        f'{metric_card(total_conv,  "Convocados",  "blue")}'
-        f'{metric_card(total_pres,  "Presentes",   "green")}'
-        f'{metric_card(faltantes,   "Faltantes",   "red")}'
-        f'<div class="metric-card mc-purple"><p class="metric-value" style="color:#a78bfa">{porc}%</p><p class="metric-label">Presença</p></div>'
-        f'</div>',
-        unsafe_allow_html=True
-    )
-    st.markdown(
-        f'<div class="prog-wrap"><div class="prog-fill" style="width:{porc}%"></div></div>',
-        unsafe_allow_html=True
-    )
+    painel_presencas(convocados)
+    total_pres = len(st.session_state.lista_presenca)
 
     sec("🧭", "NAVEGAR")
     nb1, nb2, nb3, nb4 = st.columns(4)
@@ -1070,7 +1415,7 @@ elif st.session_state.pagina == "checkin":
             st.session_state.aba_checkin = "lista"
     with nb4:
         if st.button("↺  Recarregar", use_container_width=True, key="nav_reload"):
-            st.session_state.lista_presenca = carregar_presencas_reuniao(reuniao_ativa["id"])
+            st.session_state.lista_presenca.carregar(carregar_presencas_reuniao(reuniao_ativa["id"]))
             st.rerun()
 
     if "aba_checkin" not in st.session_state:
@@ -1091,6 +1436,11 @@ elif st.session_state.pagina == "checkin":
                                       help="Após cada leitura a câmera reseta automaticamente.")
             st.session_state.modo_continuo = modo_continuo
             foto = st.camera_input("", label_visibility="collapsed", key="cam_qr")
+            dec = st.session_state.decodificador_qr
+            if dec.stats:
+                with st.expander("📈 Estatísticas do leitor"):
+                    st.dataframe(dec.resumo(), hide_index=True, use_container_width=True)
+                    if dec.ultimo_erro: st.caption(f"Último erro: {dec.ultimo_erro}")
 
         with col_result:
             sec("✨", "RESULTADO")
@@ -1099,12 +1449,17 @@ elif st.session_state.pagina == "checkin":
                 if foto_hash != st.session_state.ultima_foto_hash:
                     st.session_state.ultima_foto_hash = foto_hash
                     img = Image.open(foto)
-                    codigo_qr = decodificar_qr_robusto(img)
-                    if codigo_qr:
-                        status, msg = registrar_por_codigo(codigo_qr, df_participantes, reuniao_ativa["id"])
+                    codigos_qr = decodificar_varios_qr(img, st.session_state.decodificador_qr)
+                    if codigos_qr:
+                        lote = registrar_codigos(codigos_qr, indice_participantes, reuniao_ativa["id"])
+                        if len(lote) == 1:
+                            status, msg = lote[0][1:]
+                        else:
+                            status, msg = "lote", f"{len(lote)} crachás lidos"
                         st.session_state.feedback_status = status
                         st.session_state.feedback_msg    = msg
-                        if modo_continuo and status in ("ok","duplicado"):
+                        st.session_state.feedback_lote   = lote
+                        if modo_continuo and status in ("ok","duplicado","lote"):
                             if "cam_qr" in st.session_state: del st.session_state["cam_qr"]
                         st.rerun()
                     else:
@@ -1133,13 +1488,22 @@ elif st.session_state.pagina == "checkin":
                 if modo_continuo: st.markdown('<div class="fb-idle"><p class="fb-title">📸 Pronto para o próximo!</p></div>', unsafe_allow_html=True)
             elif s=="erro":
                 st.markdown(f'<div class="fb-erro"><p class="fb-title">❌ {m}</p></div>', unsafe_allow_html=True)
+            elif s=="lote":
+                lote = st.session_state.feedback_lote
+                n_ok = sum(1 for _, sl, _ in lote if sl=="ok")
+                n_dup = sum(1 for _, sl, _ in lote if sl=="duplicado")
+                st.markdown(f'<div class="fb-ok"><p class="fb-title">📦 {m}</p><p class="fb-nome">{n_ok} registrado(s)</p><p class="fb-title">{n_dup} duplicado(s) • {len(lote)-n_ok-n_dup} erro(s)</p></div>', unsafe_allow_html=True)
+                icones = {"ok":"✅", "duplicado":"⚠️", "erro":"❌"}
+                for cod_l, sl, msg_l in lote:
+                    st.markdown(f'<div class="membro-card"><p class="m-nome">{icones[sl]} {msg_l}</p><p class="m-det">{cod_l}</p></div>', unsafe_allow_html=True)
+                if modo_continuo: st.markdown('<div class="fb-idle"><p class="fb-title">📸 Pronto para o próximo grupo!</p></div>', unsafe_allow_html=True)
             elif s=="sem_qr":
                 st.markdown(f'<div class="fb-warn"><p class="fb-title">📣 {m}</p></div>', unsafe_allow_html=True)
             else:
                 st.markdown('<div class="fb-idle"><p class="fb-title">📷 Aguardando foto do QR Code...</p></div>', unsafe_allow_html=True)
 
             if not (s=="ok" and ur) and not st.session_state.lista_presenca.empty:
-                ult = st.session_state.lista_presenca.iloc[-1]
+                ult = st.session_state.lista_presenca.ultimo()
                 st.markdown(f'<div class="membro-card" style="margin-top:16px"><p class="m-nome" style="color:#94a3b8;font-size:0.8rem">⏱ Último registrado</p><p class="m-nome">{ult["Nome"]}</p><p class="m-det">{ult["Horario"]}</p></div>', unsafe_allow_html=True)
 
     with aba_manual:
@@ -1154,7 +1518,7 @@ elif st.session_state.pagina == "checkin":
                 with c2:
                     ok = st.form_submit_button("✔ Registrar", type="primary", use_container_width=True)
             if ok and cod:
-                status, msg = registrar_por_codigo(cod, df_participantes, reuniao_ativa["id"])
+                status, msg = registrar_por_codigo(cod, indice_participantes, reuniao_ativa["id"])
                 st.session_state.feedback_status = status
                 st.session_state.feedback_msg    = msg
                 st.rerun()
@@ -1177,7 +1541,7 @@ elif st.session_state.pagina == "checkin":
                         sel = st.selectbox("Selecione:", options=filtrado["ID"].tolist(),
                                            format_func=lambda x: f"{x}  —  {filtrado[filtrado['ID']==x]['Nome'].values[0]}")
                         if st.button("✔ Registrar selecionado", type="primary"):
-                            status, msg = registrar_por_codigo(str(sel), df_participantes, reuniao_ativa["id"])
+                            status, msg = registrar_por_codigo(str(sel), indice_participantes, reuniao_ativa["id"])
                             st.session_state.feedback_status = status
                             st.session_state.feedback_msg    = msg
                             st.rerun()
@@ -1186,7 +1550,7 @@ elif st.session_state.pagina == "checkin":
 
     with aba_lista_pres:
         if not st.session_state.lista_presenca.empty:
-            df_pres = st.session_state.lista_presenca
+            df_pres = st.session_state.lista_presenca.como_df()
             rc = df_pres["Cargo"].value_counts()
             rl = df_pres["Localidade"].value_counts()
 
@@ -1213,16 +1577,23 @@ elif st.session_state.pagina == "checkin":
                 }
             )
 
+            ausentes = convocados.difference(st.session_state.lista_presenca.ids)
+            if ausentes:
+                with st.expander(f"❌ Faltantes ({len(ausentes)})"):
+                    st.dataframe(pd.DataFrame([cadastro.indice[c] for c in sorted(ausentes)],
+                                              columns=["ID","Nome","Cargo","Localidade"]).sort_values("Nome"),
+                                 hide_index=True, use_container_width=True)
+
             sec("📄", "EXPORTAR")
             arq = f"{reuniao_ativa.get('data','')}_{reuniao_ativa.get('nome','reuniao')}".replace(" ","_")
             cA, cB, cC = st.columns(3)
             with cA:
                 st.download_button("⬇️ Baixar PDF", icon="📄",
-                    data=gerar_pdf(df_pres,rc,rl,reuniao_ativa.get("nome","Reuniao")),
+                    data=exportacao(gerar_pdf, reuniao_ativa["id"], df_pres,rc,rl,reuniao_ativa.get("nome","Reuniao")),
                     file_name=f"{arq}.pdf", mime="application/pdf", use_container_width=True)
             with cB:
                 st.download_button("⬇️ Baixar Excel", icon="📊",
-                    data=gerar_excel(df_pres,rc,rl,reuniao_ativa.get("nome","Reuniao")),
+                    data=exportacao(gerar_excel, reuniao_ativa["id"], df_pres,rc,rl,reuniao_ativa.get("nome","Reuniao")),
                     file_name=f"{arq}.xlsx",
                     mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
                     use_container_width=True)
@@ -1230,7 +1601,7 @@ elif st.session_state.pagina == "checkin":
                 conf_del = st.checkbox("⚠️ Confirmar limpeza")
                 if st.button("🗑 Limpar lista", disabled=not conf_del, use_container_width=True):
                     if limpar_presencas_reuniao(reuniao_ativa["id"]):
-                        st.session_state.lista_presenca    = pd.DataFrame(columns=["ID","Nome","Cargo","Localidade","Horario"])
+                        st.session_state.lista_presenca.limpar()
                         st.session_state.ultimo_registrado = None
                         st.rerun()
         else:
@@ -1241,7 +1612,7 @@ elif st.session_state.pagina == "checkin":
 </div>
 """, unsafe_allow_html=True)
             if st.button("↺ Recarregar do banco", use_container_width=True):
-                st.session_state.lista_presenca = carregar_presencas_reuniao(reuniao_ativa["id"])
+                st.session_state.lista_presenca.carregar(carregar_presencas_reuniao(reuniao_ativa["id"]))
                 st.rerun()
 
     st.markdown("---")
@@ -1291,10 +1662,10 @@ elif st.session_state.pagina == "lista":
         arq = f"{reunioes[si].get('data','')}_{reunioes[si].get('nome','reuniao')}".replace(" ","_")
         cA2, cB2 = st.columns(2)
         with cA2:
-            st.download_button("⬇️ PDF", data=gerar_pdf(df_pres,rc,rl,reunioes[si].get("nome","")),
+            st.download_button("⬇️ PDF", data=exportacao(gerar_pdf, reunioes[si]["id"], df_pres,rc,rl,reunioes[si].get("nome","")),
                                file_name=f"{arq}.pdf", mime="application/pdf", use_container_width=True)
         with cB2:
-            st.download_button("⬇️ Excel", data=gerar_excel(df_pres,rc,rl,reunioes[si].get("nome","")),
+            st.download_button("⬇️ Excel", data=exportacao(gerar_excel, reunioes[si]["id"], df_pres,rc,rl,reunioes[si].get("nome","")),
                                file_name=f"{arq}.xlsx",
                                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
                                use_container_width=True)
@@ -1304,6 +1675,107 @@ elif st.session_state.pagina == "lista":
     st.stop()
 
 
+# ═══════════════════════════════════════════════════════════
+#  PÁGINA: CRACHÁS
+# ═══════════════════════════════════════════════════════════
+elif st.session_state.pagina == "crachas":
+
+    if st.button("⬅  Voltar ao Início", key="volt_crachas"):
+        st.session_state.pagina = "home"; st.rerun()
+
+    sec("🪪", "GERAR CRACHÁS")
+
+    if cadastro.empty:
+        st.info("Nenhum participante cadastrado."); st.stop()
+
+    ft = st.selectbox("Participantes", ["Todos","Por Cargo","Por Localidade","Manual"])
+    vals = []
+    if ft=="Por Cargo":
+        vals = st.multiselect("Cargos", cadastro.facetas["Cargo"], format_func=cadastro.rotulo("Cargo"))
+    elif ft=="Por Localidade":
+        vals = st.multiselect("Localidades", cadastro.facetas["Localidade"], format_func=cadastro.rotulo("Localidade"))
+    elif ft=="Manual":
+        vals = st.multiselect("Participantes", cadastro.opcoes_manual, format_func=cadastro.rotulo_id)
+    df_cr = cadastro.convocados(ft, vals)
+
+    c1, c2 = st.columns(2)
+    with c1: titulo_cr = st.text_input("Título no crachá", value="CCB Musical")
+    with c2:
+        versao_atual = int(config("CRACHA_VERSAO", 1))
+        assinado = st.toggle(f"Código assinado (tiragem {versao_atual})", value=bool(config("CRACHA_CHAVE", "")),
+                             help="P1:<ID>:<tiragem>:<assinatura> — o app e o serviço de check-in rejeitam códigos falsos sem consultar o cadastro.")
+
+    folhas = -(-len(df_cr) // 10)
+    st.caption(f"{len(df_cr)} crachá(s) • {folhas} folha(s) A4 • 10 por folha")
+    if not df_cr.empty:
+        st.download_button("⬇️ PDF dos crachás", type="primary", use_container_width=True,
+                           data=exportacao(gerar_pdf_crachas, "crachas", df_cr[["ID","Nome","Cargo","Localidade"]],
+                                           titulo_cr, versao_atual if assinado else 0),
+                           file_name=f"crachas_{ft.replace(' ','_').lower()}.pdf", mime="application/pdf")
+    cq = cache_qr()
+    if cq.geracoes: st.caption(f"QR em cache: {cq.geracoes} desenhados, {cq.acertos} reaproveitados")
+
+    st.stop()
+
+
+# ═══════════════════════════════════════════════════════════
+#  PÁGINA: IMPORTAR CADASTRO
+# ═══════════════════════════════════════════════════════════
+elif st.session_state.pagina == "importar":
+
+    if st.button("⬅  Voltar ao Início", key="volt_importar"):
+        st.session_state.pagina = "home"; st.rerun()
+
+    sec("📥", "IMPORTAR CADASTRO")
+    st.caption("CSV (vírgula ou ponto e vírgula) ou Excel com as colunas ID, Nome, Cargo e Localidade. "
+               "Só os membros novos, alterados ou removidos vão para o banco.")
+
+    arq = st.file_uploader("Arquivo", type=["csv","xlsx"])
+    remover = st.toggle("Remover do cadastro quem não está no arquivo", value=False)
+    if arq is not None:
+        c1, c2 = st.columns(2)
+        with c1: simular = st.button("🔍  Simular", use_container_width=True)
+        with c2: importar = st.button("💾  Importar", type="primary", use_container_width=True)
+        if simular or importar:
+            arq.seek(0)
+            try:
+                with st.spinner("Comparando com o cadastro..."):
+                    res = importar_participantes(armazenamento, ler_linhas(arq, arq.name), armazenamento.participantes(),
+                                                 simular=not importar, remover_ausentes=remover)
+            except Exception as e:
+                st.error(f"Erro: {e}"); st.stop()
+            if importar:   # tudo que guarda o cadastro antigo
+                carregar_dados_participantes.clear(); consultas().limpar(); cache_qr().limpar()
+                recarregar_servico_checkin()
+                st.success(f"✅ Cadastro atualizado: {res.inseridos + res.alterados + res.removidos} alteração(ões) gravada(s).")
+            else:
+                st.info("Simulação: nada foi gravado.")
+            st.markdown(
+                f'<div class="metric-row">'
+                f'{metric_card(res.inseridos, "Novos", "green")}'
+                f'{metric_card(res.alterados, "Alterados", "blue")}'
+                f'{metric_card(res.removidos if remover else res.ausentes, "Removidos" if remover else "Fora do arquivo", "red")}'
+                f'{metric_card(res.iguais, "Sem mudança", "purple")}'
+                f'</div>', unsafe_allow_html=True)
+            if res.invalidas or res.repetidas:
+                st.warning(f"{res.invalidas} linha(s) sem ID ou Nome e {res.repetidas} ID(s) repetido(s) foram ignorados.")
+            for tipo, titulo in (("inseridos","Novos"), ("alterados","Alterados"), ("ausentes","Fora do arquivo")):
+                if res.amostra[tipo]:
+                    with st.expander(f"{titulo} (primeiros {len(res.amostra[tipo])})"):
+                        st.dataframe(pd.DataFrame(res.amostra[tipo]), hide_index=True, use_container_width=True)
+
+    st.divider()
+    st.caption("Reuniões com convocação manual antiga guardavam nomes; converta-as para IDs uma vez, "
+               "com o cadastro já atualizado (as que citam alguém fora do cadastro ficam como estão).")
+    if st.button("🔁  Converter convocações manuais antigas", use_container_width=True):
+        try: migradas = migrar_convocacoes_manuais(armazenamento, carregar_dados_participantes())
+        except Exception as e: st.error(f"Erro: {e}"); st.stop()
+        consultas().invalidar("reunioes", [r.get("data") for r in migradas])
+        st.success(f"✅ {len(migradas)} reunião(ões) convertida(s).")
+
+    st.stop()
+
+
 # ═══════════════════════════════════════════════════════════
 #  PÁGINA: RELATÓRIOS GERAIS
 # ═══════════════════════════════════════════════════════════
@@ -1330,12 +1802,33 @@ elif st.session_state.pagina == "relatorios_gerais":
     data_ini, data_fim = periodo
 
     with st.spinner("Carregando dados do período..."):
+        progresso = st.empty()
         df_reunioes_p = carregar_reunioes_periodo(data_ini, data_fim)
-        df_pres_p     = carregar_presencas_periodo(data_ini, data_fim)
+        try:
+            resumo_p  = agregados_presenca().periodo(
+                data_ini, data_fim, lambda n: progresso.caption(f"⏳ {n:,} presenças carregadas...".replace(",",".")))
+        except Exception as e:
+            st.error(f"Erro ao carregar presenças do período: {e}"); st.stop()
+        progresso.empty()
 
     total_reunioes  = len(df_reunioes_p)
-    total_presencas = len(df_pres_p)
-    df_rel = montar_relatorio_geral(df_pres_p, df_participantes, total_reunioes)
+    total_presencas = resumo_p.total
+    sobre_convocacoes = st.toggle(
+        "Frequência sobre as convocações", value=False,
+        help="Desligado: presenças ÷ total de reuniões do período. Ligado: presenças ÷ reuniões "
+             "para as quais o membro foi convocado, mais as que frequentou sem convocação.")
+    convocacoes = None
+    if sobre_convocacoes and total_reunioes:
+        reunioes_p = df_reunioes_p.to_dict("records")
+        try:
+            with st.spinner("Conferindo as convocações..."):
+                convocacoes = convocacoes_periodo(cadastro, reunioes_p, presentes_reunioes(reunioes_p))
+        except Exception as e:
+            st.error(f"Erro ao carregar as presenças das reuniões: {e}"); st.stop()
+    criterio = CRITERIO_FREQUENCIA[convocacoes is not None]
+    st.caption("Frequência: presenças ÷ " + ("reuniões convocadas + presenças sem convocação"
+                                             if convocacoes is not None else "total de reuniões do período") + ".")
+    df_rel = montar_relatorio_geral(resumo_p.por_membro, df_participantes, total_reunioes, convocacoes)
 
     # ── Métricas ──
     m1, m2, m3, m4 = st.columns(4)
@@ -1372,9 +1865,13 @@ elif st.session_state.pagina == "relatorios_gerais":
     # ── GRÁFICO 1: Barras verticais — Ranking ──
     sec("🏆", "RANKING DE PRESENÇAS")
     if not df_rel.empty:
-        fig_rank = grafico_barras_ranking(df_rel, data_ini, data_fim)
+        dados_rank = df_rel[["ID","Nome","Cargo","Presencas"]]
+        fig_rank = figura(grafico_barras_ranking, dados_rank, data_ini, data_fim)
         if fig_rank:
             st.plotly_chart(fig_rank, use_container_width=True)
+            if len(dados_rank) > RANKING_BARRAS:
+                st.plotly_chart(figura(grafico_distribuicao, dados_rank, data_ini, data_fim),
+                                use_container_width=True)
         else:
             st.info("Nenhum membro com presença registrada no período.")
 
@@ -1382,8 +1879,8 @@ elif st.session_state.pagina == "relatorios_gerais":
 
     # ── GRÁFICO 2: Pizzas — Por Cargo e Localidade ──
     sec("🍕", "DISTRIBUIÇÃO POR CARGO E LOCALIDADE")
-    if not df_rel.empty and df_rel["Presencas"].sum() > 0:
-        fig_pizza = graficos_pizza(df_rel)
+    if not resumo_p.grupos.empty:
+        fig_pizza = figura(graficos_pizza, resumo_p.grupos)
         st.plotly_chart(fig_pizza, use_container_width=True)
     else:
         st.info("Sem presenças registradas para gerar o gráfico de distribuição.")
@@ -1392,8 +1889,8 @@ elif st.session_state.pagina == "relatorios_gerais":
 
     # ── GRÁFICO 3: Linha mensal ──
     sec("📈", "EVOLUÇÃO MENSAL")
-    if not df_pres_p.empty and "data_registro" in df_pres_p.columns:
-        fig_linha = grafico_linha_mensal(df_pres_p, data_ini, data_fim)
+    if total_presencas > 0:
+        fig_linha = figura(grafico_linha_mensal, resumo_p.mensal, data_ini, data_fim)
         if fig_linha:
             st.plotly_chart(fig_linha, use_container_width=True)
         else:
@@ -1402,10 +1899,10 @@ elif st.session_state.pagina == "relatorios_gerais":
         st.info("Sem registros de presença no período selecionado.")
 
     # ── Resumo por Cargo e Localidade ──
-    if not df_rel.empty:
+    if not resumo_p.grupos.empty:
         sec("📋", "RESUMO POR CARGO E LOCALIDADE")
-        rc_g = df_rel.groupby("Cargo")["Presencas"].sum().sort_values(ascending=False).reset_index()
-        rl_g = df_rel.groupby("Localidade")["Presencas"].sum().sort_values(ascending=False).reset_index()
+        rc_g = resumo_p.grupos.groupby("Cargo")["Presencas"].sum().sort_values(ascending=False).reset_index()
+        rl_g = resumo_p.grupos.groupby("Localidade")["Presencas"].sum().sort_values(ascending=False).reset_index()
         r1c, r2c = st.columns(2)
         with r1c:
             st.markdown("**🎸 Por Cargo**")
@@ -1418,11 +1915,12 @@ elif st.session_state.pagina == "relatorios_gerais":
     if not df_rel.empty:
         sec("📄", "EXPORTAR RELATÓRIO")
         titulo_rel = f"Relatorio_Geral_{data_ini.strftime('%Y%m%d')}_{data_fim.strftime('%d%m%d')}"
+        escopo_rel = (data_ini, data_fim)
         ex1, ex2 = st.columns(2)
         with ex1:
             st.download_button(
                 "⬇️ Baixar Excel", icon="📊",
-                data=gerar_excel_relatorio_geral(df_rel, titulo_rel, data_ini, data_fim, total_reunioes, total_presencas),
+                data=exportacao(gerar_excel_relatorio_geral, escopo_rel, df_rel, titulo_rel, data_ini, data_fim, total_reunioes, total_presencas, criterio),
                 file_name=f"{titulo_rel}.xlsx",
                 mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
                 use_container_width=True
@@ -1430,7 +1928,7 @@ elif st.session_state.pagina == "relatorios_gerais":
         with ex2:
             st.download_button(
                 "⬇️ Baixar PDF", icon="📄",
-                data=gerar_pdf_relatorio_geral(df_rel, titulo_rel, data_ini, data_fim, total_reunioes, total_presencas),
+                data=exportacao(gerar_pdf_relatorio_geral, escopo_rel, df_rel, titulo_rel, data_ini, data_fim, total_reunioes, total_presencas, criterio),
                 file_name=f"{titulo_rel}.pdf",
                 mime="application/pdf",
                 use_container_width=True
@@ -0,0 +1,339 @@
+"""Backends de armazenamento do sistema de presença.
+
+O app só conversa com a interface `Armazenamento`; `ArmazenamentoSupabase` usa o
+projeto online e `ArmazenamentoSQLite` roda tudo num arquivo local (eventos sem
+internet, testes de carga com dados sintéticos).
+
+    python armazenamento.py sintetico dados.db --participantes 10000 --presencas 1000000
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from datetime import date, datetime, timedelta
+
+CAMPOS_PARTICIPANTE = ["id", "nome", "cargo", "localidade"]
+CAMPOS_REUNIAO      = ["id", "nome", "data", "hora", "filtro_tipo", "filtro_valores", "criada_em"]
+CAMPOS_PRESENCA     = ["meeting_id", "id_participante", "nome", "cargo", "localidade", "horario", "data_registro"]
+
+log = logging.getLogger(__name__)
+
+
+class SemConexao(Exception):
+    """O banco não respondeu (rede, tempo esgotado): quem chamou pode seguir pelo diário local."""
+
+
+class FuncaoAusente(Exception):
+    """Recurso opcional que não foi criado no banco (ex.: sql/checkin_presencas.sql)."""
+
+
+def _erro_de_rede(e):
+    import httpx   # vem com o supabase
+    return isinstance(e, (httpx.TransportError, ConnectionError, TimeoutError))
+
+
+class Armazenamento(ABC):
+    """Interface comum. Linhas entram e saem como dicts com os nomes de coluna do banco."""
+    @abstractmethod
+    def participantes(self): ...
+    @abstractmethod
+    def inserir_participantes(self, rows):
+        """Insere participantes novos; um `id` que já existe é erro (nada do lote é gravado)."""
+    @abstractmethod
+    def atualizar_participantes(self, rows):
+        """Atualiza nome, cargo e localidade pelo `id`."""
+    @abstractmethod
+    def apagar_participantes(self, ids): ...
+    @abstractmethod
+    def presencas_reuniao(self, mid): ...
+    @abstractmethod
+    def presencas_desde(self, mid, cursor):
+        """Presenças da reunião com `id` (da linha no banco) maior que `cursor`, em ordem de `id`."""
+    @abstractmethod
+    def inserir_presencas(self, rows):
+        """Insere ignorando o que já existe para o par (meeting_id, id_participante).
+        Retorna as linhas que entraram de fato."""
+    @abstractmethod
+    def checkin(self, mid, codigos, horario=None, data_registro=None):
+        """Check-in atômico de um lote de códigos: resolve o participante e insere se ainda
+        não houver presença dele na reunião. Retorna, na ordem dos códigos, dicts com
+        codigo, status ("ok", "duplicado" ou "nao_encontrado"), id, nome, cargo e localidade.
+        Levanta SemConexao sem rede e FuncaoAusente se o banco não tiver o check-in atômico."""
+    @abstractmethod
+    def apagar_presencas_reuniao(self, mid): ...
+    @abstractmethod
+    def reunioes(self): ...
+    @abstractmethod
+    def salvar_reuniao(self, reuniao): ...
+    @abstractmethod
+    def excluir_reuniao(self, rid): ...
+    @abstractmethod
+    def presencas_periodo(self, data_ini, data_fim, colunas=None, pagina=1000):
+        """Gera páginas (listas de dicts) das presenças do período, em ordem de `id` (keyset).
+        Os limites são comparados como instantes: `data_registro` com fuso é convertido, e
+        horários sem fuso (inclusive os limites) valem como UTC, como no timestamptz do Supabase."""
+    @abstractmethod
+    def reunioes_periodo(self, data_ini, data_fim): ...
+
+
+class ArmazenamentoSupabase(Armazenamento):
+    FUNCAO_AUSENTE = ("PGRST202", "42883")   # PostgREST / Postgres: função não encontrada
+
+    def __init__(self, client):
+        self.client = client
+        self.checkin_ativo = True   # desligado de vez na primeira resposta de função ausente
+
+    def _t(self, nome): return self.client.table(nome)
+
+    def participantes(self):
+        return self._t("participantes").select("*").execute().data or []
+
+    def inserir_participantes(self, rows):
+        self._t("participantes").insert(list(rows)).execute()
+
+    def atualizar_participantes(self, rows):
+        # um PATCH por linha seria uma requisição por membro; o upsert de IDs existentes só atualiza
+        self._t("participantes").upsert(list(rows), on_conflict="id").execute()
+
+    def apagar_participantes(self, ids):
+        ids = [str(i) for i in ids]
+        for i in range(0, len(ids), 200):   # a lista vai na URL do filtro in.()
+            self._t("participantes").delete().in_("id", ids[i:i + 200]).execute()
+
+    def presencas_reuniao(self, mid):
+        return self._t("presencas").select("*").eq("meeting_id", str(mid)).execute().data or []
+
+    def presencas_desde(self, mid, cursor):
+        return (self._t("presencas").select("*").eq("meeting_id", str(mid))
+                .gt("id", cursor).order("id").execute().data or [])
+
+    def inserir_presencas(self, rows):
+        # idempotente: requer o índice único de sql/presencas_unico.sql
+        # com ignore_duplicates o retorno traz só as linhas inseridas
+        return self._t("presencas").upsert(
+            rows, on_conflict="meeting_id,id_participante", ignore_duplicates=True).execute().data or []
+
+    def checkin(self, mid, codigos, horario=None, data_registro=None):
+        # função de sql/checkin_presencas.sql: uma chamada por lote
+        if not self.checkin_ativo: raise FuncaoAusente("checkin_presencas")
+        try:
+            return self.client.rpc("checkin_presencas", {
+                "p_meeting_id": str(mid), "p_codigos": [str(c) for c in codigos],
+                "p_horario": horario, "p_data_registro": data_registro}).execute().data or []
+        except Exception as e:
+            if getattr(e, "code", None) in self.FUNCAO_AUSENTE:
+                self.checkin_ativo = False
+                log.warning("checkin_presencas não existe no banco (sql/checkin_presencas.sql); "
+                            "check-ins seguem pelo upsert em lote até reiniciar o processo: %s", e)
+                raise FuncaoAusente("checkin_presencas") from e
+            if _erro_de_rede(e): raise SemConexao(str(e)) from e
+            raise
+
+    def apagar_presencas_reuniao(self, mid):
+        self._t("presencas").delete().eq("meeting_id", str(mid)).execute()
+
+    def reunioes(self):
+        return self._t("reunioes").select("*").order("data").execute().data or []
+
+    def salvar_reuniao(self, reuniao):
+        self._t("reunioes").upsert(reuniao).execute()
+
+    def excluir_reuniao(self, rid):
+        self._t("reunioes").delete().eq("id", rid).execute()
+
+    def presencas_periodo(self, data_ini, data_fim, colunas=None, pagina=1000):
+        sel = ",".join(["id"] + [c for c in colunas if c != "id"]) if colunas else "*"
+        ultimo = None
+        while True:
+            q = (self._t("presencas").select(sel)
+                 .gte("data_registro", f"{data_ini}T00:00:00")
+                 .lte("data_registro", f"{data_fim}T23:59:59"))
+            if ultimo is not None: q = q.gt("id", ultimo)
+            dados = q.order("id").limit(pagina).execute().data or []
+            # para só na página vazia: o max-rows do PostgREST pode ser menor que `pagina`
+            if not dados: return
+            ultimo = dados[-1]["id"]
+            yield dados
+
+    def reunioes_periodo(self, data_ini, data_fim):
+        return (self._t("reunioes").select("*")
+                .gte("data", str(data_ini)).lte("data", str(data_fim))
+                .execute().data or [])
+
+
+class ArmazenamentoSQLite(Armazenamento):
+    """Banco completo num arquivo SQLite. Seguro para as threads do Streamlit (uma conexão + lock)."""
+    ESQUEMA = """
+    CREATE TABLE IF NOT EXISTS participantes (
+        id TEXT PRIMARY KEY, nome TEXT, cargo TEXT, localidade TEXT);
+    CREATE TABLE IF NOT EXISTS reunioes (
+        id TEXT PRIMARY KEY, nome TEXT, data TEXT, hora TEXT,
+        filtro_tipo TEXT, filtro_valores TEXT, criada_em TEXT);
+    CREATE TABLE IF NOT EXISTS presencas (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        meeting_id TEXT, id_participante TEXT, nome TEXT, cargo TEXT,
+        localidade TEXT, horario TEXT, data_registro TEXT,
+        UNIQUE (meeting_id, id_participante));
+    CREATE INDEX IF NOT EXISTS ix_presencas_utc ON presencas (datetime(data_registro));
+    CREATE INDEX IF NOT EXISTS ix_presencas_cursor ON presencas (meeting_id, id);
+    CREATE INDEX IF NOT EXISTS ix_reunioes_data ON reunioes (data);
+    """
+
+    def __init__(self, caminho, csv_participantes=None):
+        self._db = sqlite3.connect(caminho, check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        self._db.execute("PRAGMA journal_mode=WAL"); self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(self.ESQUEMA)
+        if csv_participantes and os.path.exists(csv_participantes) and not self._sql("SELECT 1 FROM participantes LIMIT 1"):
+            with open(csv_participantes, encoding="utf-8-sig", newline="") as f:
+                self._varios("INSERT OR REPLACE INTO participantes (id, nome, cargo, localidade) VALUES (?,?,?,?)",
+                             ([l["ID"].strip(), l["Nome"], l["Cargo"], l["Localidade"]] for l in csv.DictReader(f)))
+
+    def _sql(self, sql, args=()):
+        with self._lock: return [dict(l) for l in self._db.execute(sql, args).fetchall()]
+
+    def _varios(self, sql, linhas):
+        with self._lock:
+            self._db.execute("BEGIN")
+            try: self._db.executemany(sql, linhas); self._db.execute("COMMIT")
+            except BaseException: self._db.execute("ROLLBACK"); raise
+
+    def participantes(self):
+        return self._sql("SELECT id, nome, cargo, localidade FROM participantes")
+
+    def inserir_participantes(self, rows):
+        self._varios("INSERT INTO participantes (id, nome, cargo, localidade) VALUES (?,?,?,?)",
+                     ([r[c] for c in CAMPOS_PARTICIPANTE] for r in rows))
+
+    def atualizar_participantes(self, rows):
+        self._varios("UPDATE participantes SET nome=?, cargo=?, localidade=? WHERE id=?",
+                     ([r["nome"], r["cargo"], r["localidade"], r["id"]] for r in rows))
+
+    def apagar_participantes(self, ids):
+        self._varios("DELETE FROM participantes WHERE id=?", ((str(i),) for i in ids))
+
+    def presencas_reuniao(self, mid):
+        return self._sql("SELECT * FROM presencas WHERE meeting_id=? ORDER BY id", (str(mid),))
+
+    def presencas_desde(self, mid, cursor):
+        return self._sql("SELECT * FROM presencas WHERE meeting_id=? AND id>? ORDER BY id", (str(mid), cursor))
+
+    def inserir_presencas(self, rows):
+        sql = (f"INSERT OR IGNORE INTO presencas ({', '.join(CAMPOS_PRESENCA)}) "
+               f"VALUES ({', '.join('?'*len(CAMPOS_PRESENCA))})")
+        novas = []
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                for r in rows:
+                    if self._db.execute(sql, [r.get(c) for c in CAMPOS_PRESENCA]).rowcount: novas.append(r)
+                self._db.execute("COMMIT")
+            except BaseException: self._db.execute("ROLLBACK"); raise
+        return novas
+
+    def checkin(self, mid, codigos, horario=None, data_registro=None):
+        agora = datetime.now().astimezone()
+        horario, data_registro = horario or agora.strftime("%H:%M:%S"), data_registro or agora.isoformat()
+        saida = []
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                for cod in codigos:
+                    cod = str(cod)
+                    p = (self._db.execute("SELECT id, nome, cargo, localidade FROM participantes WHERE id=?",
+                                          (cod.strip(),)).fetchone()
+                         or self._db.execute("SELECT id, nome, cargo, localidade FROM participantes "
+                                             "WHERE upper(trim(id))=upper(trim(?)) LIMIT 1", (cod,)).fetchone())
+                    if p is None:
+                        saida.append({"codigo": cod, "status": "nao_encontrado"}); continue
+                    novo = self._db.execute(
+                        f"INSERT OR IGNORE INTO presencas ({', '.join(CAMPOS_PRESENCA)}) VALUES (?,?,?,?,?,?,?)",
+                        (str(mid), p["id"], p["nome"], p["cargo"], p["localidade"], horario, data_registro)).rowcount
+                    saida.append({"codigo": cod, "status": "ok" if novo else "duplicado", **dict(p)})
+                self._db.execute("COMMIT")
+            except BaseException: self._db.execute("ROLLBACK"); raise
+        return saida
+
+    def apagar_presencas_reuniao(self, mid):
+        self._sql("DELETE FROM presencas WHERE meeting_id=?", (str(mid),))
+
+    def reunioes(self):
+        return self._sql("SELECT * FROM reunioes ORDER BY data")
+
+    def salvar_reuniao(self, reuniao):
+        campos = [c for c in CAMPOS_REUNIAO if c in reuniao]
+        valores = [json.dumps(reuniao[c], ensure_ascii=False) if c == "filtro_valores" else reuniao[c] for c in campos]
+        atualiza = ", ".join(f"{c}=excluded.{c}" for c in campos if c != "id")
+        self._sql(f"INSERT INTO reunioes ({', '.join(campos)}) VALUES ({', '.join('?'*len(campos))}) "
+                  f"ON CONFLICT(id) DO UPDATE SET {atualiza}", valores)
+
+    def excluir_reuniao(self, rid):
+        self._sql("DELETE FROM reunioes WHERE id=?", (rid,))
+
+    def presencas_periodo(self, data_ini, data_fim, colunas=None, pagina=1000):
+        sel = ", ".join(["id"] + [c for c in colunas if c != "id"]) if colunas else "*"
+        ultimo = 0
+        while True:
+            # datetime() leva "…-04:00" para UTC; comparar o texto ISO misturaria fusos
+            dados = self._sql(f"SELECT {sel} FROM presencas WHERE datetime(data_registro) BETWEEN datetime(?) AND datetime(?) "
+                              f"AND id > ? ORDER BY id LIMIT ?",
+                              (f"{data_ini}T00:00:00", f"{data_fim}T23:59:59", ultimo, pagina))
+            if not dados: return
+            ultimo = dados[-1]["id"]
+            yield dados
+
+    def reunioes_periodo(self, data_ini, data_fim):
+        return self._sql("SELECT * FROM reunioes WHERE data BETWEEN ? AND ?", (str(data_ini), str(data_fim)))
+
+
+def criar_armazenamento(tipo, **opcoes):
+    """`tipo` é "supabase" (opções: url, key, timeout em segundos por requisição) ou "sqlite"
+    (opções: caminho, csv_participantes)."""
+    if tipo == "sqlite":
+        return ArmazenamentoSQLite(opcoes["caminho"], opcoes.get("csv_participantes"))
+    if tipo == "supabase":
+        from supabase import ClientOptions, create_client
+        return ArmazenamentoSupabase(create_client(opcoes["url"], opcoes["key"], options=ClientOptions(
+            postgrest_client_timeout=opcoes.get("timeout", 120))))
+    raise ValueError(f"Armazenamento desconhecido: {tipo}")
+
+
+def popular_sintetico(arm, participantes=10_000, reunioes=200, presencas=1_000_000, semente=42):
+    """Gera cadastro, reuniões e presenças fictícios para testes de carga."""
+    rnd = random.Random(semente)
+    cargos = [f"CARGO {i}" for i in range(12)]
+    locais = [f"LOCALIDADE {i}" for i in range(60)]
+    membros = [{"id": f"S{i:06d}", "nome": f"MEMBRO {i:06d}", "cargo": rnd.choice(cargos),
+                "localidade": rnd.choice(locais)} for i in range(participantes)]
+    arm.inserir_participantes(membros)
+    inicio = date.today() - timedelta(days=2*365)
+    for i in range(reunioes):
+        d = inicio + timedelta(days=i * 730 // max(reunioes, 1))
+        arm.salvar_reuniao({"id": f"S{i:05d}", "nome": f"Ensaio {i}", "data": d.isoformat(), "hora": "19:30",
+                            "filtro_tipo": "Todos", "filtro_valores": [], "criada_em": d.isoformat()})
+    por_reuniao = max(1, min(participantes, presencas // max(reunioes, 1)))
+    for i in range(reunioes):
+        d = inicio + timedelta(days=i * 730 // max(reunioes, 1))
+        reg = datetime.combine(d, datetime.min.time()).replace(hour=19, minute=30).isoformat()
+        arm.inserir_presencas({"meeting_id": f"S{i:05d}", "id_participante": m["id"], "nome": m["nome"],
+                               "cargo": m["cargo"], "localidade": m["localidade"],
+                               "horario": "19:30:00", "data_registro": reg}
+                              for m in rnd.sample(membros, por_reuniao))
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Utilitários do armazenamento local")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    s = sub.add_parser("sintetico", help="cria um banco SQLite com dados fictícios")
+    s.add_argument("caminho")
+    s.add_argument("--participantes", type=int, default=10_000)
+    s.add_argument("--reunioes", type=int, default=200)
+    s.add_argument("--presencas", type=int, default=1_000_000)
+    a = ap.parse_args()
+    popular_sintetico(ArmazenamentoSQLite(a.caminho), a.participantes, a.reunioes, a.presencas)
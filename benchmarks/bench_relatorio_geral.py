@@ -0,0 +1,79 @@
+"""Benchmark do relatório geral: implementação antiga (groupby em textos + apply)
+contra o motor vetorizado de relatorios.py.
+
+    python benchmarks/bench_relatorio_geral.py            # até 10k membros × 1M presenças
+    python benchmarks/bench_relatorio_geral.py --grande   # inclui 50k × 5M
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from relatorios import contar_presencas, montar_relatorio_geral  # noqa: E402
+
+
+def gerar(n_membros, n_presencas, semente=42):
+    rnd = np.random.default_rng(semente)
+    ids = np.array([f"S{i:06d}" for i in range(n_membros)], dtype=object)
+    part = pd.DataFrame({
+        "ID": ids,
+        "Nome": [f"MEMBRO {i:06d}" for i in rnd.permutation(n_membros)],
+        "Cargo": rnd.choice([f"CARGO {i}" for i in range(12)], n_membros).astype(object),
+        "Localidade": rnd.choice([f"LOCALIDADE {i}" for i in range(60)], n_membros).astype(object),
+    })
+    quem = rnd.integers(0, n_membros, n_presencas)
+    pres = pd.DataFrame({
+        "id_participante": ids[quem],
+        "nome": part["Nome"].to_numpy()[quem],
+        "cargo": part["Cargo"].to_numpy()[quem],
+        "localidade": part["Localidade"].to_numpy()[quem],
+    })
+    return part, pres
+
+
+def legado(df_pres, df_participantes, total_reunioes):
+    base = df_participantes[["ID", "Nome", "Cargo", "Localidade"]].copy()
+    freq = (
+        df_pres.groupby(["id_participante", "nome", "cargo", "localidade"])
+        .size()
+        .reset_index(name="Presencas")
+        .rename(columns={"id_participante": "ID", "nome": "Nome", "cargo": "Cargo", "localidade": "Localidade"})
+    )
+    rel = base.merge(freq[["ID", "Presencas"]], on="ID", how="left")
+    rel["Presencas"] = rel["Presencas"].fillna(0).astype(int)
+    rel["Frequencia_%"] = rel["Presencas"].apply(
+        lambda x: round((x / total_reunioes) * 100, 2) if total_reunioes > 0 else 0.0
+    )
+    return rel.sort_values(["Presencas", "Nome"], ascending=[False, True]).reset_index(drop=True)
+
+
+def cronometrar(fn, *args, repeticoes=3):
+    melhor, res = float("inf"), None
+    for _ in range(repeticoes):
+        t = time.perf_counter(); res = fn(*args); melhor = min(melhor, time.perf_counter() - t)
+    return melhor, res
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--grande", action="store_true", help="inclui 50k membros × 5M presenças")
+    a = ap.parse_args()
+    tamanhos = [(1_000, 100_000), (10_000, 1_000_000)] + ([(50_000, 5_000_000)] if a.grande else [])
+    total_reunioes = 200
+    print(f"{'membros':>8} {'presenças':>10} {'legado (s)':>11} {'contagem (s)':>13} {'relatório (s)':>14} {'ganho':>7}")
+    for n_m, n_p in tamanhos:
+        part, pres = gerar(n_m, n_p)
+        t_leg, ref = cronometrar(legado, pres, part, total_reunioes)
+        # o carregador do período já entrega id_participante como Categorical
+        t_cnt, cont = cronometrar(contar_presencas, pres["id_participante"].astype("category"))
+        t_rel, novo = cronometrar(montar_relatorio_geral, cont, part, total_reunioes)
+        pd.testing.assert_frame_equal(ref, novo, check_exact=True)
+        print(f"{n_m:>8} {n_p:>10} {t_leg:>11.3f} {t_cnt:>13.3f} {t_rel:>14.4f} {t_leg / (t_cnt + t_rel):>6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""Cache das leituras do banco compartilhado entre as sessões do app.
+
+As leituras são guardadas por (tabela, data_ini, data_fim, ...). Quem grava
+invalida só os períodos que contêm os dias alterados (dias locais, veja
+relatorios.datas_locais).
+"""
+import threading
+import time
+from collections import Counter
+from datetime import date
+
+
+class CacheConsultas:
+    """Leituras por (tabela, data_ini, data_fim) guardadas por `ttl` segundos. Quem grava chama
+    invalidar(tabela, datas): só caem os períodos que contêm alguma das datas. Cada invalidação
+    sobe a versão da tabela, e uma leitura que começou antes dela não é guardada."""
+    def __init__(self, ttl=300):
+        self.ttl, self._itens, self._versoes = ttl, {}, Counter()
+        self._lock = threading.Lock()
+
+    def obter(self, chave, consultar, ttl=None):
+        agora, ttl = time.monotonic(), self.ttl if ttl is None else ttl
+        with self._lock:
+            item = self._itens.get(chave)
+            if item and agora - item[0] < min(ttl, item[2]): return item[1]
+            versao = self._versoes[chave[0]]
+        valor = consultar()   # exceções não ficam em cache
+        with self._lock:
+            if self._versoes[chave[0]] == versao:
+                self._itens = {k: v for k, v in self._itens.items() if agora - v[0] < v[2]}
+                self._itens[chave] = (agora, valor, ttl)
+        return valor
+
+    def limpar(self):
+        """Esquece todas as leituras (ex.: depois de importar o cadastro)."""
+        with self._lock:
+            for tabela in {k[0] for k in self._itens} | set(self._versoes): self._versoes[tabela] += 1
+            self._itens.clear()
+
+    def invalidar(self, tabela, datas=None):
+        try: datas = None if datas is None else {date.fromisoformat(str(d)[:10]) for d in datas}
+        except ValueError: datas = None
+        with self._lock:
+            self._versoes[tabela] += 1
+            for k in [k for k in self._itens if k[0] == tabela and
+                      (datas is None or any(k[1] <= d <= k[2] for d in datas))]:
+                del self._itens[k]
@@ -0,0 +1,181 @@
+"""Cadastro de participantes em memória e as convocações das reuniões.
+
+Fica fora do app.py para poder ser testado sem o Streamlit: o app guarda um
+Cadastro por leitura do banco (cache_resource) e todas as sessões o consultam.
+"""
+import json
+import sys
+import threading
+from collections import Counter
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+
+def normalizar_codigo(codigo):
+    return str(codigo).strip().upper()
+
+
+def indexar_participantes(df, colisoes=None):
+    """Índice código normalizado → (ID, Nome, Cargo, Localidade) para busca O(1) no check-in.
+    IDs que só diferem em maiúsculas/minúsculas caem no mesmo código: vale o primeiro e
+    o par (ID que ficou, ID ignorado) vai para `colisoes`."""
+    indice = {}
+    if df.empty: return indice
+    ids = [sys.intern(str(v).strip()) for v in df["ID"]]
+    for reg in zip(ids, df["Nome"], df["Cargo"], df["Localidade"]):
+        atual = indice.setdefault(normalizar_codigo(reg[0]), reg)
+        if atual is not reg and colisoes is not None: colisoes.append((atual[0], reg[0]))
+    return indice
+
+
+class Cadastro:
+    """Cadastro compacto e somente leitura, compartilhado entre as sessões.
+    Cargo/Localidade são categóricos, IDs internados; facetas, contagens e
+    convocações ficam calculadas enquanto este cadastro estiver em uso.
+    Convocação "Manual" guarda IDs (reuniões antigas guardavam nomes: ainda valem e são
+    convertidas para IDs ao salvar a reunião ou por migrar_convocacoes_manuais)."""
+    FACETAS = ("Cargo", "Localidade")
+    COLUNA_FILTRO = {"Por Cargo": "Cargo", "Por Localidade": "Localidade", "Manual": "ID"}
+    MAX_CONVOCACOES = 64
+    MAX_CONJUNTOS = 256
+
+    def __init__(self, dados=()):
+        df = pd.DataFrame(dados) if dados else pd.DataFrame(columns=["id","nome","cargo","localidade"])
+        df.columns = df.columns.str.strip()
+        df = df.rename(columns={"id":"ID","nome":"Nome","cargo":"Cargo","localidade":"Localidade"})
+        df["ID"] = pd.Series([sys.intern(str(v).strip()) for v in df["ID"]], index=df.index, dtype=object)
+        df["Nome"] = df["Nome"].astype(object)
+        for c in ("Cargo", "Localidade"): df[c] = df[c].astype("category")
+        self.df = df
+        self.colisoes = []
+        self.indice = indexar_participantes(df, self.colisoes)
+        self.contagens = {c: df[c].value_counts(sort=False).loc[lambda s: s > 0].to_dict() for c in self.FACETAS}
+        self.facetas = {c: sorted(self.contagens[c]) for c in self.FACETAS}
+        self._convocacoes, self._conjuntos = {}, {}
+        self._lock = threading.Lock()   # o mesmo Cadastro atende todas as sessões (cache_resource)
+
+    def __len__(self): return len(self.df)
+
+    @cached_property
+    def codigos(self):
+        """Código normalizado de cada linha do df (mesma ordem)."""
+        return pd.Series([normalizar_codigo(i) for i in self.df["ID"]], index=self.df.index, dtype=object)
+
+    @cached_property
+    def todos(self): return frozenset(self.indice)
+
+    @cached_property
+    def _grupos(self):
+        """Cargo, Localidade e Nome → frozenset dos códigos normalizados."""
+        grupos = {}
+        for col in ("Cargo", "Localidade", "Nome"):
+            por = {}
+            for v, c in zip(self.df[col], self.codigos): por.setdefault(v, []).append(c)
+            grupos[col] = {v: frozenset(cs) for v, cs in por.items()}
+        return grupos
+
+    @cached_property
+    def opcoes_manual(self):
+        """IDs para o multiselect da convocação manual, em ordem de nome."""
+        return [i for _, i in sorted(zip(self.df["Nome"].astype(str), self.df["ID"]))]
+
+    def rotulo_id(self, id_p):
+        membro = self.indice.get(normalizar_codigo(id_p))
+        return f"{membro[1]} ({membro[0]})" if membro else str(id_p)
+
+    def convocacao(self, tipo, vals):
+        """frozenset dos códigos normalizados convocados: resolvido uma vez por filtro e
+        versão do cadastro; métricas e faltantes viram operações de conjunto."""
+        col = self.COLUNA_FILTRO.get(tipo)
+        if col is None: return self.todos
+        chave = (col, frozenset(vals))
+        with self._lock: conj = self._conjuntos.get(chave)
+        if conj is None:
+            if col == "ID":
+                nomes = self._grupos["Nome"]
+                conj = frozenset(c for v in vals for c in
+                                 ((normalizar_codigo(v),) if normalizar_codigo(v) in self.indice else nomes.get(v, ())))
+            else:
+                grupos = self._grupos[col]
+                conj = frozenset().union(*(grupos.get(v, ()) for v in vals))
+            with self._lock:
+                if len(self._conjuntos) >= self.MAX_CONJUNTOS: self._conjuntos.clear()
+                self._conjuntos[chave] = conj
+        return conj
+
+    def ids_manuais(self, vals):
+        """IDs de uma convocação manual (converte os nomes das reuniões antigas)."""
+        return [self.indice[c][0] for c in sorted(self.convocacao("Manual", vals))]
+
+    def migrar_manual(self, vals):
+        """IDs equivalentes a uma convocação manual antiga (com nomes), ou None se ela já
+        é só de IDs ou se algum valor não existe mais no cadastro."""
+        if self.empty or all(normalizar_codigo(v) in self.indice for v in vals): return None
+        nomes = self._grupos["Nome"]
+        if not all(normalizar_codigo(v) in self.indice or v in nomes for v in vals): return None
+        return self.ids_manuais(vals)
+
+    @property
+    def empty(self): return self.df.empty
+
+    def rotulo(self, faceta):
+        """format_func dos multiselects: valor seguido da quantidade de membros."""
+        cont = self.contagens[faceta]
+        return lambda v: f"{v} ({cont[v]})" if v in cont else str(v)
+
+    def convocados(self, tipo, vals):
+        col = self.COLUNA_FILTRO.get(tipo)
+        if col is None or self.df.empty: return self.df
+        chave = (col, frozenset(vals))
+        with self._lock: sel = self._convocacoes.get(chave)
+        if sel is None:
+            sel = self.df[self.codigos.isin(self.convocacao(tipo, vals))]
+            with self._lock:
+                if len(self._convocacoes) >= self.MAX_CONVOCACOES: self._convocacoes.clear()
+                self._convocacoes[chave] = sel
+        return sel
+
+
+def valores_filtro(r):
+    """filtro_valores da reunião como lista (no banco pode vir como texto JSON)."""
+    fv = r.get("filtro_valores")
+    if isinstance(fv,str):
+        try: return json.loads(fv)
+        except ValueError: return []
+    return fv or []
+
+
+def migrar_convocacoes_manuais(arm, cadastro):
+    """Grava, uma vez, os IDs equivalentes das reuniões "Manual" antigas que guardavam
+    nomes. Só migra quando todos os valores existem no cadastro (e ele não está vazio).
+    Retorna as reuniões migradas, já com os IDs."""
+    migradas = []
+    for r in arm.reunioes():
+        if r.get("filtro_tipo") != "Manual": continue
+        ids = cadastro.migrar_manual(valores_filtro(r))
+        if ids is None: continue
+        r = {**r, "filtro_valores": ids}
+        arm.salvar_reuniao(r); migradas.append(r)
+    return migradas
+
+
+def convocados_reuniao(cadastro, reuniao):
+    """Códigos normalizados convocados para a reunião (frozenset, do cache do cadastro)."""
+    return cadastro.convocacao((reuniao or {}).get("filtro_tipo","Todos"), valores_filtro(reuniao or {}))
+
+
+def convocacoes_periodo(cadastro, reunioes, presentes=None):
+    """Series ID → denominador da frequência: das `reunioes`, aquelas para as quais o membro
+    foi convocado mais aquelas em que esteve sem convocação.
+    `presentes`: meeting_id → códigos normalizados presentes (presentes_reunioes)."""
+    todas, cont, presentes = 0, Counter(), presentes or {}
+    for r in reunioes:
+        if cadastro.COLUNA_FILTRO.get(r.get("filtro_tipo") or "Todos") is None: todas += 1; continue
+        convocados = convocados_reuniao(cadastro, r)
+        cont.update(convocados)
+        cont.update(presentes.get(str(r.get("id")), frozenset()) - convocados)
+    n = np.full(len(cadastro), todas, dtype=np.int64)
+    if cont: n += np.fromiter((cont.get(c, 0) for c in cadastro.codigos), np.int64, len(cadastro))
+    return pd.Series(n, index=cadastro.df["ID"].astype(str).to_numpy())
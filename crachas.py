@@ -0,0 +1,43 @@
+"""Códigos de crachá assinados: `P1:<ID>:<versão>:<assinatura>`.
+
+A assinatura são os 40 primeiros bits do HMAC-SHA256 de `<ID>:<versão>`, em base32
+(8 caracteres, cabe no modo alfanumérico do QR). A versão é a da tiragem do cadastro:
+crachás de tiragens abaixo de CRACHA_VERSAO_MIN deixam de valer. Sem chave
+(CRACHA_CHAVE vazia) a assinatura funciona só como dígito verificador: pega leituras
+corrompidas, mas não impede que alguém monte um código.
+
+A conferência é feita só no servidor (app.py e servico_checkin.py), onde fica a
+chave: docs/leitor.html apenas repassa o código lido. Códigos inválidos são
+recusados sem consultar o cadastro; IDs simples (`CF001`) seguem para a consulta
+normal, a não ser que CRACHA_EXIGIR_ASSINADO esteja ligado (depois de todos os
+crachás terem sido reimpressos com assinatura).
+"""
+import base64
+import hashlib
+import hmac
+
+PREFIXO = "P1:"
+
+
+def assinatura(id_, versao, chave=""):
+    d = hmac.new(str(chave).encode(), f"{id_}:{versao}".encode(), hashlib.sha256).digest()
+    return base64.b32encode(d[:5]).decode()
+
+
+def gerar_codigo(id_, versao=1, chave=""):
+    id_, versao = str(id_).strip(), int(versao)
+    return f"{PREFIXO}{id_}:{versao}:{assinatura(id_, versao, chave)}"
+
+
+def validar(codigo, chave="", versao_min=0, exigir_assinado=False):
+    """ID do crachá, ou None se o código não vale: assinatura errada, tiragem revogada ou,
+    com `exigir_assinado`, ID simples. Sem exigir, IDs simples voltam como estão: só o
+    cadastro diz se existem."""
+    codigo = str(codigo).strip()
+    if not codigo.upper().startswith(PREFIXO): return None if exigir_assinado else codigo
+    partes = codigo[len(PREFIXO):].rsplit(":", 2)
+    if len(partes) != 3 or not (partes[1].isascii() and partes[1].isdigit()): return None   # '²' é isdigit
+    id_, versao, sig = partes[0], int(partes[1]), partes[2].upper()
+    if not id_ or versao < int(versao_min or 0): return None
+    # em bytes: compare_digest recusa str com caracteres fora do ASCII
+    return id_ if hmac.compare_digest(sig.encode(), assinatura(id_, versao, chave).encode()) else None
@@ -0,0 +1,127 @@
+"""Diário local (SQLite) dos check-ins feitos sem conexão.
+
+Uma presença que não pôde ir direto ao banco fica aqui como pendente e uma thread
+a envia em lotes idempotentes por (meeting_id, id_participante), com espera
+exponencial enquanto não houver conexão. Depois de gravada no banco a linha sai do
+diário: quem lê a reunião junta ao banco só o que ainda está pendente
+(mesclar_presencas), então uma reunião limpa em outro aparelho não volta daqui.
+O check-in é confirmado assim que entra no diário; quem o banco já tinha
+(registrado em outra estação) é acusado depois, em conflitos().
+"""
+import sqlite3
+import threading
+import time
+
+CAMPOS = ["meeting_id", "id_participante", "nome", "cargo", "localidade", "horario", "data_registro"]
+
+
+def mesclar_presencas(remotos, pendentes):
+    """Linhas do banco seguidas das pendentes do diário que ainda não aparecem nele."""
+    ids_remotos = {str(p.get("id_participante")) for p in remotos}
+    return list(remotos) + [p for p in pendentes if str(p["id_participante"]) not in ids_remotos]
+
+
+class DiarioPresencas:
+    """`gravar(rows)` envia um lote ao banco (deve ser idempotente) e devolve as linhas que
+    o banco ainda não tinha (ou None, se não souber dizer); levantar exceção conta como
+    falha e o lote volta a ser tentado."""
+    CONFLITOS_MAX = 1000
+
+    def __init__(self, caminho, gravar, lote_max=500, acumular=0.25, espera_max=30.0, ocioso=15.0):
+        self._gravar, self.lote_max, self.acumular = gravar, lote_max, acumular
+        self.espera_max, self.ocioso = espera_max, ocioso
+        self._db = sqlite3.connect(caminho, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL"); self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(f"""CREATE TABLE IF NOT EXISTS presencas_locais (
+            {", ".join(c + " TEXT" for c in CAMPOS)},
+            sincronizado INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (meeting_id, id_participante))""")
+        self._db.execute("CREATE INDEX IF NOT EXISTS ix_pendentes ON presencas_locais (sincronizado)")
+        self._db.execute("DELETE FROM presencas_locais WHERE sincronizado=1")   # versões antigas guardavam as enviadas
+        self._cond = threading.Condition()
+        self._avisado = False          # registrar() chamado desde a última espera da thread
+        self._em_voo = frozenset()     # meeting_ids do lote que está sendo gravado agora
+        self.sincronizados, self.falhas, self.ultimo_erro = 0, 0, None
+        self._conflitos, self._conflitos_ini = [], 0   # linhas que o banco já tinha; posição da primeira
+        self._reenvios = set()   # (meeting_id, id_participante) de lotes que falharam: a 1ª tentativa pode ter gravado
+        threading.Thread(target=self._loop, name="sync-presencas", daemon=True).start()
+
+    def _consultar(self, sql, args=()):
+        with self._cond: return self._db.execute(sql, args).fetchall()
+
+    @property
+    def pendentes(self): return self._consultar("SELECT COUNT(*) FROM presencas_locais WHERE sincronizado=0")[0][0]
+
+    def registrar(self, rows, sincronizado=False):
+        """Guarda as linhas como pendentes. `sincronizado=True` é para linhas que já foram
+        gravadas no banco (check-in atômico): só entram na contagem de enviadas."""
+        with self._cond:
+            if sincronizado: self.sincronizados += len(rows); return
+            self._db.executemany(
+                f"INSERT OR IGNORE INTO presencas_locais ({', '.join(CAMPOS)}) VALUES ({', '.join('?'*len(CAMPOS))})",
+                [[row[c] for c in CAMPOS] for row in rows])
+            self._avisado = True; self._cond.notify_all()
+
+    def conflitos(self, mid, desde=None):
+        """(posição, linhas) das presenças da reunião que o banco já tinha quando o diário as
+        enviou (registradas em outra estação) a partir da posição `desde`; sem ela, só a posição."""
+        with self._cond:
+            fim = self._conflitos_ini + len(self._conflitos)
+            if desde is None: return fim, []
+            return fim, [r for r in self._conflitos[max(0, desde - self._conflitos_ini):] if r["meeting_id"] == str(mid)]
+
+    def _anotar_conflitos(self, lote, novas):
+        chave = lambda r: (str(r["meeting_id"]), str(r["id_participante"]))
+        gravadas = {chave(r) for r in novas}
+        conflitos = [r for r in lote if chave(r) not in gravadas and chave(r) not in self._reenvios]
+        self._reenvios.difference_update(chave(r) for r in lote)
+        if not conflitos: return
+        self._conflitos.extend(conflitos)
+        if len(self._conflitos) > self.CONFLITOS_MAX:
+            corte = len(self._conflitos) - self.CONFLITOS_MAX // 2
+            del self._conflitos[:corte]; self._conflitos_ini += corte
+
+    def da_reuniao(self, mid):
+        """Linhas pendentes (ainda não confirmadas no banco) da reunião."""
+        return [dict(zip(CAMPOS, t)) for t in self._consultar(
+            f"SELECT {', '.join(CAMPOS)} FROM presencas_locais WHERE meeting_id=? AND sincronizado=0 "
+            "ORDER BY data_registro", (str(mid),))]
+
+    def descartar_reuniao(self, mid, espera=30.0):
+        """Apaga as pendentes da reunião e espera terminar um lote dela que já esteja sendo
+        gravado, para o banco poder ser limpo depois sem que esse lote reapareça.
+        Retorna False se o lote não terminou dentro de `espera` segundos."""
+        mid = str(mid)
+        with self._cond:
+            self._db.execute("DELETE FROM presencas_locais WHERE meeting_id=?", (mid,))
+            return self._cond.wait_for(lambda: mid not in self._em_voo, timeout=espera)
+
+    def _loop(self):
+        espera = 0.5
+        while True:
+            with self._cond:
+                lote = [dict(zip(CAMPOS, t)) for t in self._db.execute(
+                    f"SELECT {', '.join(CAMPOS)} FROM presencas_locais WHERE sincronizado=0 LIMIT ?",
+                    (self.lote_max,)).fetchall()]
+                self._em_voo = frozenset(row["meeting_id"] for row in lote)
+            if lote:
+                try:
+                    novas = self._gravar(lote)
+                except Exception as e:
+                    self.falhas += 1; self.ultimo_erro = str(e)
+                    espera = min(espera*2, self.espera_max)
+                    with self._cond: self._reenvios.update((row["meeting_id"], row["id_participante"]) for row in lote)
+                else:
+                    with self._cond:   # já estão no banco: saem do diário
+                        self._db.executemany("DELETE FROM presencas_locais WHERE meeting_id=? AND id_participante=?",
+                                             [(row["meeting_id"], row["id_participante"]) for row in lote])
+                        self.sincronizados += len(lote)
+                        if novas is not None: self._anotar_conflitos(lote, novas)
+                    self.ultimo_erro = None; espera = 0.5
+                finally:
+                    with self._cond: self._em_voo = frozenset(); self._cond.notify_all()
+                if not self.ultimo_erro and len(lote) == self.lote_max: continue   # ainda há pendentes
+            with self._cond:
+                if not self._avisado: self._cond.wait(timeout=espera if self.ultimo_erro else self.ocioso)
+                self._avisado = False
+            time.sleep(self.acumular)   # junta os check-ins que chegam em rajada
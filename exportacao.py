@@ -0,0 +1,359 @@
+"""Motor de exportação em streaming (Excel e PDF) para listas e relatórios grandes.
+
+As planilhas são escritas direto em SpreadsheetML: cada linha vira texto XML
+assim que chega e as células só apontam um dos estilos nomeados do styles.xml. As tabelas do PDF são
+desenhadas em lotes por página (texto + linhas da grade) com o cabeçalho
+repetido, em vez de um `cell()` com borda por célula. Os crachás saem em folhas
+A4 com os QR desenhados em paralelo (processos) e guardados por ID + código.
+"""
+import itertools
+import math
+import multiprocessing
+import numbers
+import re
+import shutil
+import tempfile
+import threading
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+from xml.sax.saxutils import escape, quoteattr
+
+import qrcode
+from fpdf import FPDF
+from openpyxl.utils import get_column_letter
+
+AZUL = "1F4E78"
+
+
+def texto_pdf(t):
+    """Fontes padrão do PDF só têm latin-1."""
+    return str(t).encode("latin-1", "replace").decode("latin-1")
+
+
+# ════════════════════ EXCEL ════════════════════
+# O perfil do openpyxl write-only (50k linhas × 7 colunas) mostrou ~70% do tempo na
+# serialização célula a célula (um objeto e um elemento XML por célula) e o resto em
+# reatribuir valor e estilo às células-modelo. Aqui as linhas viram texto XML direto
+# e cada célula só aponta o índice do estilo nomeado, definido uma vez no styles.xml.
+NS = 'xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"'
+NS_R = 'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"'
+ESTILOS = {None: 0, "cabecalho": 1, "celula": 2, "titulo": 3, "negrito": 4}   # índices em cellXfs
+INVALIDOS = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+
+
+def _styles_xml(tam_cabecalho):
+    fonte = '<font>{}<sz val="{}"/>{}<name val="Calibri"/><family val="2"/></font>'
+    fontes = [fonte.format("", 11, ""), fonte.format("<b/>", tam_cabecalho, '<color rgb="FFFFFFFF"/>'),
+              fonte.format("<b/>", 14, ""), fonte.format("<b/>", 11, "")]
+    fino = "".join(f'<{l} style="thin"><color auto="1"/></{l}>' for l in ("left", "right", "top", "bottom"))
+    alinh = '<alignment horizontal="center" vertical="center" wrapText="1"/>'
+    # (fonte, preenchimento, borda, alinhamento) de cada estilo, na ordem de ESTILOS
+    xfs = [(0, 0, 0, ""), (1, 2, 1, alinh), (0, 0, 1, ""), (2, 0, 0, ""), (3, 0, 0, "")]
+    def xf(f, p, b, a, xf_id=None):
+        attrs = f'numFmtId="0" fontId="{f}" fillId="{p}" borderId="{b}"' + (f' xfId="{xf_id}"' if xf_id is not None else "")
+        attrs += "".join(f' apply{k}="1"' for k, v in (("Font", f), ("Fill", p), ("Border", b), ("Alignment", a)) if v)
+        return f"<xf {attrs}>{a}</xf>" if a else f"<xf {attrs}/>"
+    nomes = ["Normal"] + [n for n in ESTILOS if n]
+    return (f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n<styleSheet {NS}>'
+            f'<fonts count="{len(fontes)}">{"".join(fontes)}</fonts>'
+            '<fills count="3"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill>'
+            f'<fill><patternFill patternType="solid"><fgColor rgb="FF{AZUL}"/><bgColor rgb="FF{AZUL}"/></patternFill></fill></fills>'
+            f'<borders count="2"><border><left/><right/><top/><bottom/><diagonal/></border><border>{fino}<diagonal/></border></borders>'
+            f'<cellStyleXfs count="{len(xfs)}">{"".join(xf(*x) for x in xfs)}</cellStyleXfs>'
+            f'<cellXfs count="{len(xfs)}">{"".join(xf(*x, xf_id=i) for i, x in enumerate(xfs))}</cellXfs>'
+            f'<cellStyles count="{len(nomes)}">' + "".join(
+                f'<cellStyle name="{n}" xfId="{i}"' + (' builtinId="0"/>' if i == 0 else "/>") for i, n in enumerate(nomes))
+            + '</cellStyles></styleSheet>')
+
+
+class AbaStream:
+    """Uma aba: as linhas vão para um arquivo temporário (em memória até 8 MB) e só
+    entram no .xlsx em PlanilhaStream.bytes()."""
+
+    def __init__(self, titulo, larguras=(), mesclar=()):
+        self.titulo, self.larguras, self.mesclar = titulo, list(larguras), list(mesclar)
+        self.linhas, self.max_col = 0, 0
+        self._dados = tempfile.SpooledTemporaryFile(8 * 1024 * 1024)
+        self._letras = []
+
+    def letra(self, i):
+        while len(self._letras) <= i: self._letras.append(get_column_letter(len(self._letras) + 1))
+        return self._letras[i]
+
+    def escrever(self, texto): self._dados.write(texto.encode("utf-8"))
+
+
+def _celula(ref, v, s):
+    estilo = f' s="{s}"' if s else ""
+    if v is None or v == "": return f'<c r="{ref}"{estilo}/>' if s else ""
+    if isinstance(v, bool): return f'<c r="{ref}"{estilo} t="b"><v>{int(v)}</v></c>'
+    if isinstance(v, numbers.Number) and not isinstance(v, complex):
+        v = float(v) if not isinstance(v, numbers.Integral) else int(v)
+        if isinstance(v, float) and not math.isfinite(v): return f'<c r="{ref}"{estilo}/>' if s else ""
+        return f'<c r="{ref}"{estilo}><v>{v!r}</v></c>'
+    t = escape(INVALIDOS.sub("", str(v)))
+    esp = ' xml:space="preserve"' if t != t.strip() else ""
+    return f'<c r="{ref}"{estilo} t="inlineStr"><is><t{esp}>{t}</t></is></c>'
+
+
+class PlanilhaStream:
+    """XLSX escrito em streaming com os estilos nomeados `cabecalho`, `celula`, `titulo` e `negrito`."""
+
+    def __init__(self, tam_cabecalho=11):
+        self.tam_cabecalho, self.abas = tam_cabecalho, []
+
+    def aba(self, titulo, larguras=(), mesclar=()):
+        titulo = re.sub(r"[\\/?*\[\]:]", " ", str(titulo))[:31] or f"Planilha{len(self.abas) + 1}"
+        ws = AbaStream(titulo, larguras, mesclar); self.abas.append(ws)
+        return ws
+
+    def linha(self, ws, valores, estilo=None):
+        self._linhas(ws, [valores], ESTILOS[estilo])
+
+    def tabela(self, ws, cabecalho, linhas):
+        """Cabeçalho + linhas com borda (estilo `celula`), gravadas em blocos."""
+        self.linha(ws, cabecalho, "cabecalho")
+        linhas = iter(linhas)
+        while bloco := list(itertools.islice(linhas, 1000)): self._linhas(ws, bloco, ESTILOS["celula"])
+
+    def _linhas(self, ws, linhas, s):
+        partes = []
+        for valores in linhas:
+            ws.linhas += 1; n = ws.linhas
+            cels = [_celula(f"{ws.letra(i)}{n}", v, s) for i, v in enumerate(valores)]
+            ws.max_col = max(ws.max_col, len(cels))
+            partes.append(f'<row r="{n}">{"".join(cels)}</row>')
+        ws.escrever("".join(partes))
+
+    def bytes(self):
+        eb = BytesIO()
+        with zipfile.ZipFile(eb, "w", zipfile.ZIP_DEFLATED) as z:
+            n = len(self.abas)
+            z.writestr("[Content_Types].xml",
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+                '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+                '<Default Extension="xml" ContentType="application/xml"/>'
+                '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+                '<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+                + "".join(f'<Override PartName="/xl/worksheets/sheet{i}.xml" '
+                          'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+                          for i in range(1, n + 1)) + "</Types>")
+            z.writestr("_rels/.rels",
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+                '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+                'Target="xl/workbook.xml"/></Relationships>')
+            z.writestr("xl/workbook.xml",
+                f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n<workbook {NS} {NS_R}><sheets>'
+                + "".join(f'<sheet name={quoteattr(ws.titulo)} sheetId="{i}" r:id="rId{i}"/>'
+                          for i, ws in enumerate(self.abas, 1)) + "</sheets></workbook>")
+            z.writestr("xl/_rels/workbook.xml.rels",
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+                + "".join(f'<Relationship Id="rId{i}" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+                          f'Target="worksheets/sheet{i}.xml"/>' for i in range(1, n + 1))
+                + f'<Relationship Id="rId{n + 1}" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+                'Target="styles.xml"/></Relationships>')
+            z.writestr("xl/styles.xml", _styles_xml(self.tam_cabecalho))
+            for i, ws in enumerate(self.abas, 1):
+                with z.open(f"xl/worksheets/sheet{i}.xml", "w") as f:
+                    dim = f"A1:{ws.letra(max(ws.max_col, 1) - 1)}{max(ws.linhas, 1)}"
+                    cols = "".join(f'<col min="{c}" max="{c}" width="{w}" customWidth="1"/>'
+                                   for c, w in enumerate(ws.larguras, 1))
+                    f.write(f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n<worksheet {NS} {NS_R}>'
+                            f'<dimension ref="{dim}"/>{f"<cols>{cols}</cols>" if cols else ""}<sheetData>'.encode())
+                    ws._dados.seek(0); shutil.copyfileobj(ws._dados, f)
+                    mescla = "".join(f'<mergeCell ref="{m}"/>' for m in ws.mesclar)
+                    f.write(("</sheetData>" + (f'<mergeCells count="{len(ws.mesclar)}">{mescla}</mergeCells>' if mescla else "")
+                             + "</worksheet>").encode())
+                ws._dados.close()
+        return eb.getvalue()
+
+
+# ════════════════════ PDF ════════════════════
+# Helvetica: o fpdf2 já trocava "Arial" pela Helvetica padrão (mesmo PDF, byte a byte);
+# o apelido está obsoleto desde a 2.7.8 e avisa a cada set_font.
+class TabelaPDF:
+    """Tabela desenhada página a página: as linhas que cabem formam um lote, a grade
+    do lote sai com poucas linhas retas e o cabeçalho se repete em cada página."""
+
+    def __init__(self, pdf, colunas, larguras, alinhamentos=None, altura=8,
+                 tam_fonte=7, limites=None, fundo_cabecalho=(200, 220, 255)):
+        self.pdf, self.colunas, self.larguras, self.altura = pdf, colunas, larguras, altura
+        self.alinh = alinhamentos or ["L"] * len(colunas)
+        self.limites = limites or [None] * len(colunas)
+        self.tam_fonte, self.fundo = tam_fonte, fundo_cabecalho
+
+    def _cabecalho(self):
+        pdf = self.pdf
+        pdf.set_fill_color(*self.fundo); pdf.set_font("Helvetica", "B", 8)
+        for h, w in zip(self.colunas, self.larguras): pdf.cell(w, self.altura, h, 1, 0, "C", True)
+        pdf.ln()
+
+    def escrever(self, linhas):
+        pdf, h = self.pdf, self.altura
+        larguras, alinh, limites = self.larguras, self.alinh, self.limites
+        x0, total = pdf.l_margin, sum(self.larguras)
+        bordas = [x0]
+        for w in larguras: bordas.append(bordas[-1] + w)
+        fundo_pagina = pdf.h - pdf.b_margin
+        linhas = iter(linhas)
+        pendente, primeira = next(linhas, None), True
+        while primeira or pendente is not None:
+            primeira = False
+            if pdf.get_y() + 2 * h > fundo_pagina: pdf.add_page()
+            self._cabecalho()
+            pdf.set_font("Helvetica", size=self.tam_fonte)
+            topo = y = pdf.get_y()
+            base = pdf.font_size * 0.35 + h / 2        # linha de base centralizada na célula
+            while pendente is not None and y + h <= fundo_pagina:
+                for x, w, a, lim, v in zip(bordas, larguras, alinh, limites, pendente):
+                    t = texto_pdf(v if lim is None else str(v)[:lim])
+                    if a == "L": pdf.text(x + 1, y + base, t)
+                    else:
+                        tw = pdf.get_string_width(t)
+                        pdf.text(x + (w - tw) / 2 if a == "C" else x + w - tw - 1, y + base, t)
+                y += h
+                pdf.line(x0, y, x0 + total, y)
+                pendente = next(linhas, None)
+            for x in bordas: pdf.line(x, topo, x, y)
+            pdf.set_y(y)
+
+
+# ════════════════════ CRACHÁS ════════════════════
+CRACHA_MM = (90, 55)          # 2 × 5 por folha A4
+CRACHA_QR_MM = 34            # com a margem branca de 4 módulos (quiet zone) já dentro da imagem
+QR_PARALELO_MIN = 256         # abaixo disso o custo de subir os processos não compensa
+
+
+def qr_png(payload):
+    """QR em 1 pixel por módulo, tons de cinza: o PDF amplia sem suavizar e o fpdf
+    embute sem converter (bem mais rápido que a imagem 1-bit ampliada). A borda de 4
+    módulos é a margem branca que os leitores precisam em volta do símbolo."""
+    qr = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_M, box_size=1, border=4)
+    qr.add_data(payload); qr.make(fit=True)
+    eb = BytesIO(); qr.make_image().get_image().convert("L").save(eb, format="PNG")
+    return eb.getvalue()
+
+
+def _qr_lote(payloads):
+    return [qr_png(p) for p in payloads]
+
+
+class CacheQR:
+    """PNG dos QR por (ID, código): numa nova tiragem só os membros novos ou com código
+    diferente são desenhados, e os que faltam são divididos entre processos (os mesmos
+    a cada tiragem, criados na primeira que precisar)."""
+
+    def __init__(self, maximo=50_000, workers=None):
+        self.maximo, self.workers = maximo, workers or multiprocessing.cpu_count()
+        self._itens, self._lock = OrderedDict(), threading.Lock()
+        self._processos = None
+        self.acertos = self.geracoes = 0
+
+    def _pool(self):
+        with self._lock:
+            if self._processos is None:
+                # spawn: o processo do Streamlit tem threads, fork não é seguro
+                self._processos = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"))
+            return self._processos
+
+    def _desenhar(self, payloads):
+        if len(payloads) < QR_PARALELO_MIN or self.workers < 2: return _qr_lote(payloads)
+        passo = -(-len(payloads) // (self.workers * 4))
+        blocos = [payloads[i:i + passo] for i in range(0, len(payloads), passo)]
+        pool = self._pool()
+        try:
+            return [png for bloco in pool.map(_qr_lote, blocos) for png in bloco]
+        except BrokenProcessPool:   # um processo morreu: o próximo lote cria outros
+            with self._lock:
+                if self._processos is pool: self._processos = None
+            pool.shutdown(wait=False)
+            return _qr_lote(payloads)
+
+    def obter(self, itens):
+        """`itens`: [(id, payload)] → PNGs na mesma ordem."""
+        with self._lock: faltam = [k for k in dict.fromkeys(itens) if k not in self._itens]
+        gerados = dict(zip(faltam, self._desenhar([p for _, p in faltam]))) if faltam else {}
+        with self._lock:
+            self._itens.update(gerados); self.geracoes += len(faltam)
+            saida = []
+            for k in itens:
+                if k in self._itens: self._itens.move_to_end(k)
+                saida.append(self._itens.get(k) or gerados.get(k))
+            self.acertos += len(itens) - len(faltam)
+            while len(self._itens) > self.maximo: self._itens.popitem(last=False)
+        # o que outra thread tirou do cache no meio do caminho é desenhado aqui, fora do lock
+        return [png or qr_png(k[1]) for k, png in zip(itens, saida)]
+
+    def limpar(self):
+        with self._lock: self._itens.clear()
+
+    def fechar(self):
+        with self._lock: pool, self._processos = self._processos, None
+        if pool is not None: pool.shutdown()
+
+
+def _ajustar(pdf, texto, largura, tam, minimo=7, estilo=""):
+    """(texto, tamanho) que cabe em `largura`: a largura é proporcional ao tamanho, então
+    uma medida basta; abaixo do mínimo, corta com reticências."""
+    texto = texto_pdf(texto)
+    pdf.set_font("Helvetica", estilo, tam)
+    w = pdf.get_string_width(texto)
+    if w <= largura: return texto, tam
+    tam = int(tam * largura / w * 2) / 2
+    if tam >= minimo: return texto, tam
+    pdf.set_font("Helvetica", estilo, minimo)
+    ini, fim = 0, len(texto)
+    while ini < fim:
+        meio = (ini + fim + 1) // 2
+        if pdf.get_string_width(texto[:meio] + "...") <= largura: ini = meio
+        else: fim = meio - 1
+    return texto[:ini] + "...", minimo
+
+
+def _linhas_nome(pdf, nome, largura):
+    """Nome em uma linha se couber com fonte 10 ou mais; senão, em duas, quebrando no
+    espaço mais perto do meio."""
+    t, tam = _ajustar(pdf, nome, largura, 13, 10, "B")
+    partes = str(nome).split()
+    if not t.endswith("...") or len(partes) < 2: return [_ajustar(pdf, nome, largura, 13, 7, "B")]
+    meio = min(range(1, len(partes)), key=lambda k: abs(len(" ".join(partes[:k])) - len(nome) / 2))
+    linhas = [_ajustar(pdf, " ".join(p), largura, 12, 7, "B") for p in (partes[:meio], partes[meio:])]
+    tam = min(t for _, t in linhas)
+    return [(l, tam) for l, _ in linhas]
+
+
+def pdf_crachas(membros, pngs, titulo=""):
+    """Folhas A4 prontas para imprimir e recortar. `membros`: (ID, Nome, Cargo, Localidade)
+    na ordem de `pngs`."""
+    pdf = FPDF(format="A4"); pdf.set_auto_page_break(False)
+    w, h = CRACHA_MM; q = CRACHA_QR_MM
+    x0, y0 = (210 - 2 * w) / 2, (297 - 5 * h) / 2
+    tx = q + 8                                   # coluna do texto, depois do QR
+    ajustes = {}                                 # cargos e localidades se repetem muito
+    pdf.set_draw_color(180, 180, 180); pdf.set_line_width(0.2)
+    for i, ((id_, nome, cargo, local), png) in enumerate(zip(membros, pngs)):
+        if i % 10 == 0: pdf.add_page()
+        x, y = x0 + (i % 2) * w, y0 + (i // 2 % 5) * h
+        pdf.rect(x, y, w, h)                         # linha de corte
+        pdf.image(BytesIO(png), x=x + 4, y=y + (h - q) / 2 - 2, w=q, h=q)
+        pdf.set_font("Helvetica", "", 7)
+        id_txt = texto_pdf(id_)                      # centrado sob o QR, fora da margem branca
+        pdf.text(x + 4 + max(0, (q - pdf.get_string_width(id_txt)) / 2), y + (h + q) / 2 + 2, id_txt)
+        linhas = _linhas_nome(pdf, nome, w - tx - 4)
+        for dy, (t, tam) in zip((19, 24) if len(linhas) == 2 else (22,), linhas):
+            pdf.set_font("Helvetica", "B", tam); pdf.text(x + tx, y + dy, t)
+        for dy, texto, tam, minimo, estilo in ((8, titulo.upper(), 8, 6, "B"), (31, cargo, 10, 7, ""),
+                                                (38, local, 9, 7, "")):
+            if not texto: continue
+            chave = (texto, tam, minimo, estilo)
+            if chave not in ajustes: ajustes[chave] = _ajustar(pdf, texto, w - tx - 4, tam, minimo, estilo)
+            t, tam = ajustes[chave]
+            pdf.set_font("Helvetica", estilo, tam); pdf.text(x + tx, y + dy, t)
+    if pdf.page == 0: pdf.add_page()
+    return bytes(pdf.output())
@@ -0,0 +1,136 @@
+"""Importação do cadastro de participantes a partir de CSV ou XLSX, em streaming.
+
+As linhas são lidas em blocos (csv / openpyxl read-only) e comparadas com o
+cadastro atual pelo ID normalizado (sem espaços, maiúsculas): só vão ao banco as
+inclusões, as alterações e, se pedido, as remoções, em lotes. O ID é gravado como
+está no arquivo, só sem os espaços das pontas. Com `simular=True` nada é gravado e sai só o
+resumo. A memória fica no tamanho do cadastro, não do arquivo.
+
+    python importacao.py membros.xlsx --armazenamento sqlite --sqlite presenca.db --simular
+"""
+import argparse
+import csv
+import io
+import itertools
+import os
+
+from openpyxl import load_workbook
+
+from armazenamento import criar_armazenamento
+
+COLUNAS = {"id": "id", "codigo": "id", "código": "id",
+           "nome": "nome", "cargo": "cargo", "localidade": "localidade"}
+BLOCO = 1000
+AMOSTRA = 20
+
+
+def id_arquivo(v):
+    if isinstance(v, float) and v.is_integer(): v = int(v)   # o Excel guarda 123 como 123.0
+    return "" if v is None else str(v).strip()
+
+
+def normalizar_id(v):
+    """Chave de comparação: a mesma normalização dos leitores (app.normalizar_codigo)."""
+    return id_arquivo(v).upper()
+
+
+def _texto(v):
+    return "" if v is None else " ".join(str(v).split())
+
+
+def _mapear(linhas):
+    cabecalho = next(linhas, None) or []
+    pos = {}
+    for i, h in enumerate(cabecalho):
+        campo = COLUNAS.get(_texto(h).lower())
+        if campo: pos.setdefault(campo, i)
+    if "id" not in pos or "nome" not in pos:
+        raise ValueError("O arquivo precisa das colunas ID e Nome (Cargo e Localidade são opcionais).")
+    for linha in linhas:
+        if not any(v not in (None, "") for v in linha): continue
+        yield {c: (linha[i] if i < len(linha) else None) for c, i in pos.items()}
+
+
+def ler_linhas(arquivo, nome=""):
+    """Dicts id/nome/cargo/localidade de um CSV (`,` ou `;`) ou XLSX, linha a linha.
+    `arquivo` é um caminho ou um arquivo binário (o upload do Streamlit)."""
+    nome = str(nome or arquivo)
+    if isinstance(arquivo, (str, os.PathLike)):
+        with open(arquivo, "rb") as f: yield from ler_linhas(f, nome); return
+    if nome.lower().endswith((".xlsx", ".xlsm")):
+        wb = load_workbook(arquivo, read_only=True, data_only=True)
+        try: yield from _mapear(wb.worksheets[0].iter_rows(values_only=True))
+        finally: wb.close()
+        return
+    texto = io.TextIOWrapper(arquivo, encoding="utf-8-sig", newline="")
+    try:
+        primeira = texto.readline()
+        sep = ";" if primeira.count(";") > primeira.count(",") else ","
+        yield from _mapear(csv.reader(itertools.chain([primeira], texto), delimiter=sep))
+    finally:
+        texto.detach()   # não fecha o arquivo de quem chamou
+
+
+class ResumoImportacao:
+    """Contagens da importação e uma amostra de cada tipo de mudança para conferência."""
+
+    def __init__(self):
+        self.lidas = self.iguais = self.invalidas = self.repetidas = 0
+        self.inseridos = self.alterados = self.ausentes = self.removidos = 0
+        self.amostra = {"inseridos": [], "alterados": [], "ausentes": []}
+
+    def _anotar(self, tipo, linha):
+        setattr(self, tipo, getattr(self, tipo) + 1)
+        if len(self.amostra[tipo]) < AMOSTRA: self.amostra[tipo].append(linha)
+
+    def __str__(self):
+        return (f"{self.lidas} linhas: {self.inseridos} novos, {self.alterados} alterados, {self.iguais} iguais, "
+                f"{self.ausentes} fora do arquivo ({self.removidos} removidos), "
+                f"{self.invalidas} sem ID/Nome, {self.repetidas} IDs repetidos")
+
+
+def importar_participantes(arm, linhas, atuais, simular=False, remover_ausentes=False, bloco=BLOCO):
+    """Compara `linhas` (ler_linhas) com `atuais` (arm.participantes()) e grava só a diferença:
+    novos com arm.inserir_participantes, alterados com arm.atualizar_participantes.
+    Um ID repetido no arquivo vale na primeira vez. Alterações mantêm o ID como está no banco."""
+    por_chave = {normalizar_id(p["id"]): p for p in atuais}
+    vistos, res = set(), ResumoImportacao()
+    linhas = iter(linhas)
+    while lote := list(itertools.islice(linhas, bloco)):
+        inserir, atualizar = [], []
+        for l in lote:
+            res.lidas += 1
+            id_, nome = id_arquivo(l.get("id")), _texto(l.get("nome"))
+            chave = normalizar_id(id_)
+            if not chave or not nome: res.invalidas += 1; continue
+            if chave in vistos: res.repetidas += 1; continue
+            vistos.add(chave)
+            novo = {"id": id_, "nome": nome, "cargo": _texto(l.get("cargo")), "localidade": _texto(l.get("localidade"))}
+            atual = por_chave.get(chave)
+            if atual is None: res._anotar("inseridos", novo); inserir.append(novo)
+            elif all(_texto(atual.get(c)) == novo[c] for c in ("nome", "cargo", "localidade")): res.iguais += 1
+            else: novo["id"] = atual["id"]; res._anotar("alterados", novo); atualizar.append(novo)
+        if simular: continue
+        if inserir: arm.inserir_participantes(inserir)
+        if atualizar: arm.atualizar_participantes(atualizar)
+    ausentes = [p for k, p in por_chave.items() if k not in vistos]
+    for p in ausentes: res._anotar("ausentes", {c: p.get(c) for c in ("id", "nome", "cargo", "localidade")})
+    if remover_ausentes and ausentes:
+        if not vistos: raise ValueError("Nenhuma linha válida no arquivo: nada foi removido.")
+        res.removidos = len(ausentes)
+        if not simular:
+            for i in range(0, len(ausentes), bloco): arm.apagar_participantes([p["id"] for p in ausentes[i:i + bloco]])
+    return res
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Importa o cadastro de participantes (CSV ou XLSX)")
+    ap.add_argument("arquivo")
+    ap.add_argument("--armazenamento", choices=["supabase", "sqlite"], default=os.environ.get("ARMAZENAMENTO", "supabase"))
+    ap.add_argument("--sqlite", default=os.environ.get("SQLITE_PATH", "presenca.db"))
+    ap.add_argument("--simular", action="store_true", help="só mostra o resumo, sem gravar")
+    ap.add_argument("--remover", action="store_true", help="remove do cadastro quem não está no arquivo")
+    a = ap.parse_args()
+    if a.armazenamento == "sqlite": arm = criar_armazenamento("sqlite", caminho=a.sqlite)
+    else: arm = criar_armazenamento("supabase", url=os.environ["SUPABASE_URL"], key=os.environ["SUPABASE_KEY"])
+    print(importar_participantes(arm, ler_linhas(a.arquivo), arm.participantes(), a.simular, a.remover))
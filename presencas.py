@@ -0,0 +1,142 @@
+"""Presenças das reuniões abertas no check-in.
+
+AcompanhamentoReunioes traz, numa thread, o que as outras estações (tablets,
+leitor.html, servico_checkin.py) gravaram no banco: o script do Streamlit só lê
+o que já chegou, então uma conexão lenta nunca trava a tela de check-in.
+PresencasReuniao guarda as presenças da reunião ativa de uma sessão e
+classificar_leituras decide o que fazer com cada crachá lido.
+"""
+import bisect
+import threading
+import time
+
+import pandas as pd
+
+from cadastro import normalizar_codigo
+
+
+class AcompanhamentoReunioes:
+    """`buscar(mid, cursor)` devolve as linhas da reunião com `id` maior que `cursor`, em
+    ordem de `id` (Armazenamento.presencas_desde). Uma reunião entra no acompanhamento na
+    primeira vez que uma sessão pede as novidades dela e sai depois de `esquecer` segundos
+    sem pedidos."""
+
+    def __init__(self, buscar, intervalo=5.0, espera_max=60.0, esquecer=600.0):
+        self._buscar, self.intervalo, self.espera_max, self.esquecer = buscar, intervalo, espera_max, esquecer
+        self._reunioes = {}   # mid -> {"desde", "cursor", "ids", "linhas", "visto", "geracao"}
+        self._cond = threading.Condition()
+        self.falhas, self.ultimo_erro = 0, None
+        threading.Thread(target=self._loop, name="acompanha-presencas", daemon=True).start()
+
+    def novas(self, mid, cursor):
+        """Linhas já trazidas da reunião com `id` > `cursor`. Não acessa o banco."""
+        mid = str(mid)
+        with self._cond:
+            r = self._reunioes.get(mid)
+            if r is None or cursor < r["desde"]:   # reunião nova, ou sessão que ficou para trás
+                geracao = r["geracao"] + 1 if r else 0
+                r = self._reunioes[mid] = {"desde": cursor, "cursor": cursor, "ids": [], "linhas": [],
+                                           "visto": 0.0, "geracao": geracao}
+                self._cond.notify_all()
+            r["visto"] = time.monotonic()
+            return r["linhas"][bisect.bisect_right(r["ids"], cursor):]
+
+    def esquecer_reuniao(self, mid):
+        """Depois de limpar a reunião: o que já foi trazido dela não vale mais."""
+        with self._cond: self._reunioes.pop(str(mid), None)
+
+    def _loop(self):
+        espera = self.intervalo
+        while True:
+            with self._cond:
+                agora = time.monotonic()
+                for mid in [m for m, r in self._reunioes.items() if agora - r["visto"] > self.esquecer]:
+                    del self._reunioes[mid]
+                pedidos = [(mid, r["cursor"], r["geracao"]) for mid, r in self._reunioes.items()]
+            erro = None
+            for mid, cursor, geracao in pedidos:
+                try:
+                    linhas = self._buscar(mid, cursor)
+                except Exception as e:
+                    erro = e; break
+                with self._cond:
+                    r = self._reunioes.get(mid)
+                    if r is None or r["geracao"] != geracao: continue   # esquecida ou reiniciada no meio
+                    for l in linhas:
+                        if l["id"] <= r["cursor"]: continue
+                        r["ids"].append(l["id"]); r["linhas"].append(l); r["cursor"] = l["id"]
+            if erro is None: self.ultimo_erro, espera = None, self.intervalo
+            else:
+                self.falhas += 1; self.ultimo_erro = str(erro)
+                espera = min(espera * 2, self.espera_max)
+            with self._cond: self._cond.wait(timeout=espera)
+
+
+COLUNAS_PRESENCA = ["ID","Nome","Cargo","Localidade","Horario"]
+
+
+class PresencasReuniao:
+    """Presenças da reunião ativa: conjunto de IDs para duplicidade + colunas só de inserção.
+    O DataFrame só é montado (e guardado) quando uma tabela ou exportação pede.
+    `cursor` é o maior `id` de linha do banco já visto (sincronização incremental)."""
+    __slots__ = ("meeting_id", "ids", "colunas", "_df", "cursor")
+
+    def __init__(self, meeting_id=None, df=None):
+        self.meeting_id = meeting_id
+        self.limpar()
+        if df is not None: self.carregar(df)
+
+    def limpar(self):
+        self.ids = set()
+        self.colunas = {c: [] for c in COLUNAS_PRESENCA}
+        self._df = None
+        self.cursor = 0
+
+    def carregar(self, df):
+        self.limpar()
+        self.cursor = df.attrs.get("cursor", 0)
+        if df.empty: return
+        for c in COLUNAS_PRESENCA: self.colunas[c] = df[c].tolist()
+        self.ids = {normalizar_codigo(i) for i in self.colunas["ID"]}
+
+    def adicionar(self, reg):
+        for c in COLUNAS_PRESENCA: self.colunas[c].append(reg[c])
+        self.ids.add(normalizar_codigo(reg["ID"]))
+        self._df = None
+
+    def __contains__(self, id_p): return normalizar_codigo(id_p) in self.ids
+    def __len__(self): return len(self.colunas["ID"])
+
+    @property
+    def empty(self): return not self.colunas["ID"]
+
+    def ultimo(self):
+        return {c: v[-1] for c, v in self.colunas.items()} if not self.empty else None
+
+    def como_df(self):
+        if self._df is None: self._df = pd.DataFrame(self.colunas, columns=COLUNAS_PRESENCA)
+        return self._df
+
+
+def classificar_leituras(codigos, indice, ja, horario, validar=str):
+    """Confere os crachás lidos contra o cadastro (`indice`) e as presenças já
+    registradas (`ja`). `validar` devolve o ID do crachá ou None se não confere.
+    Retorna ([[codigo, status, msg]], novos registros), na ordem de leitura."""
+    resultados, novos, vistos = [], [], set()
+    for codigo in codigos:
+        codigo = str(codigo).strip()
+        if not codigo: continue
+        id_lido = validar(codigo)   # crachá assinado: confere sem consultar
+        if id_lido is None:
+            resultados.append([codigo, "erro", "Crachá sem assinatura válida ou de tiragem antiga."]); continue
+        membro = indice.get(normalizar_codigo(id_lido))
+        if membro is None:
+            resultados.append([codigo, "erro", f"Código '{codigo}' não encontrado."]); continue
+        id_p, nome, cargo, localidade = membro
+        if id_p in ja or normalizar_codigo(id_p) in vistos:
+            resultados.append([codigo, "duplicado", f"{nome} já foi registrado."]); continue
+        vistos.add(normalizar_codigo(id_p))
+        novos.append({"ID":id_p, "Nome":nome, "Cargo":cargo,
+                      "Localidade":localidade, "Horario":horario})
+        resultados.append([codigo, "ok", nome])
+    return resultados, novos
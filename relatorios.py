@@ -0,0 +1,177 @@
+"""Motor vetorizado do relatório geral de frequência.
+
+Fica fora do app.py para poder ser importado por benchmarks, scripts e testes
+(veja benchmarks/bench_relatorio_geral.py). AgregadosPresenca guarda as
+contagens mensais que alimentam o relatório.
+"""
+import threading
+import time
+from collections import Counter, namedtuple
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+FUSO = "America/Cuiaba"
+COLUNAS_RELATORIO = ["ID", "Nome", "Cargo", "Localidade", "Presencas", "Frequencia_%"]
+
+
+def contar_presencas(ids):
+    """Series ID → presenças a partir da coluna id_participante, contando pelos códigos do Categorical."""
+    cat = ids if isinstance(ids.dtype, pd.CategoricalDtype) else ids.astype(str).astype("category")
+    codigos = cat.cat.codes.to_numpy()
+    n = np.bincount(codigos[codigos >= 0], minlength=len(cat.cat.categories))
+    return pd.Series(n, index=cat.cat.categories.astype(str)).loc[lambda s: s > 0]
+
+
+def _por_linha(serie, unicos, codigos):
+    """Valores de uma Series indexada por ID alinhados às linhas do cadastro (0 para ausentes)."""
+    por_id = np.zeros(len(unicos), dtype=np.int64)
+    if len(serie):
+        pos = pd.Categorical(serie.index.astype(str), categories=unicos).codes
+        por_id[pos[pos >= 0]] = serie.to_numpy()[pos >= 0]
+    return por_id[codigos]
+
+
+def _frequencias(presencas, denom):
+    """round((x / t) * 100, 2) como no relatório antigo, calculado uma vez por par (x, t) distinto:
+    o round do Python e o np.round podem divergir na última casa."""
+    base = int(denom.max(initial=0)) + 1
+    pares, inv = np.unique(presencas * base + denom, return_inverse=True)
+    valores = [round((int(x) / int(t)) * 100, 2) if t > 0 else 0.0 for x, t in zip(pares // base, pares % base)]
+    return np.asarray(valores, dtype=np.float64)[inv.reshape(-1)]
+
+
+def montar_relatorio_geral(contagens, df_participantes, total_reunioes, convocacoes=None):
+    """Uma linha por participante com Presencas e Frequencia_%, ordenado por presenças e nome.
+    `contagens`: Series ID → número de presenças no período. `convocacoes` (opcional):
+    Series ID → reuniões do período para as quais o membro foi convocado mais as que
+    frequentou sem convocação; sem ela, o denominador é `total_reunioes` para todos."""
+    if df_participantes.empty:
+        return pd.DataFrame()
+    base = df_participantes[["ID", "Nome", "Cargo", "Localidade"]]
+    ids = base["ID"].astype(str)
+    unicos = pd.unique(ids)
+    codigos = pd.Categorical(ids, categories=unicos).codes
+    presencas = _por_linha(contagens, unicos, codigos)
+    if convocacoes is None:
+        denom = np.full(len(presencas), total_reunioes, dtype=np.int64)
+    else:
+        # o máximo só pesa com presenças de reuniões que não estão mais no período (excluídas)
+        denom = np.maximum(_por_linha(convocacoes, unicos, codigos), presencas)
+    freq = _frequencias(presencas, denom)
+    nomes = pd.Categorical(base["Nome"])   # categorias já vêm ordenadas
+    ordem_nome = np.where(nomes.codes < 0, len(nomes.categories), nomes.codes)   # sem nome vai para o fim
+    ordem = np.lexsort((ordem_nome, -presencas))
+    rel = base.take(ordem).reset_index(drop=True)
+    rel["Presencas"] = presencas[ordem]
+    rel["Frequencia_%"] = freq[ordem]
+    return rel
+
+
+def datas_locais(valores):
+    """datetime64 na hora local (FUSO). Textos sem fuso (diário local, SQLite) já estão na hora local."""
+    v = next((x for x in valores if x), "")
+    if v.endswith("Z") or v[-6:-5] in ("+", "-"):
+        return (pd.to_datetime(valores, errors="coerce", utc=True, format="ISO8601")
+                .tz_convert(FUSO).tz_localize(None).values)
+    return pd.to_datetime(valores, errors="coerce", format="ISO8601").values
+
+
+ResumoPeriodo = namedtuple("ResumoPeriodo", "por_membro grupos mensal total")
+
+
+def _fatiar_periodo(data_ini, data_fim):
+    """Separa o período em meses inteiros ("AAAA-MM") e trechos parciais (ini, fim) nas pontas."""
+    inteiros, parciais, d = [], [], data_ini
+    while d <= data_fim:
+        prox = (d.replace(day=1) + timedelta(days=32)).replace(day=1)
+        fim = min(prox - timedelta(days=1), data_fim)
+        if d.day == 1 and fim == prox - timedelta(days=1): inteiros.append(d.strftime("%Y-%m"))
+        else: parciais.append((d, fim))
+        d = prox
+    return inteiros, parciais
+
+
+def _contar_linhas(df, ini=None, fim=None):
+    """Counters por membro e por (cargo, localidade), agrupados por mês, de um frame do período.
+    Com `ini`/`fim`, só as linhas desses dias na hora local: o banco recorta o período em
+    UTC, então quem chama lê um dia a mais em cada ponta."""
+    membros, grupos = {}, {}
+    if df.empty: return membros, grupos
+    df = df[df["data_registro"].notna()]
+    if ini is not None:
+        dia = df["data_registro"].dt.normalize()
+        df = df[(dia >= pd.Timestamp(ini)) & (dia <= pd.Timestamp(fim))]
+    d = df["data_registro"]
+    mes = (d.dt.year * 100 + d.dt.month).rename("mes")   # inteiro AAAAMM: agrupa bem mais rápido que texto
+    for (m, i), n in df.groupby([mes, "id_participante"], observed=True).size().items():
+        membros.setdefault(f"{m // 100:04d}-{m % 100:02d}", Counter())[i] = n
+    for (m, c, l), n in df.groupby([mes, "cargo", "localidade"], observed=True).size().items():
+        grupos.setdefault(f"{m // 100:04d}-{m % 100:02d}", Counter())[(c, l)] = n
+    return membros, grupos
+
+
+class AgregadosPresenca:
+    """Contagens de presença por (participante, mês) e (cargo, localidade, mês).
+    Cada mês é lido do banco uma única vez; depois salvar_presencas e
+    limpar_presencas_reuniao só somam ou subtraem as linhas que mudaram.
+    As pontas do período fora de mês inteiro passam pelo cache de consultas."""
+    def __init__(self, carregar, consultas=None, validade=600.0):
+        self._carregar, self._consultas, self.validade = carregar, consultas, validade
+        self.membros, self.grupos = {}, {}     # mês -> Counter
+        self._lock = threading.Lock()
+        self._desde = time.monotonic()
+
+    def _aplicar(self, rows, sinal):
+        rows = list(rows)
+        if not rows: return
+        datas = datas_locais([str(row["data_registro"] or "") for row in rows])   # o banco devolve em UTC
+        with self._lock:
+            for row, d in zip(rows, datas):
+                if np.isnat(d): continue
+                mes = str(d)[:7]
+                if mes not in self.membros: continue  # mês ainda não carregado: virá completo do banco
+                self.membros[mes][str(row["id_participante"])] += sinal
+                self.grupos[mes][(row["cargo"] or "", row["localidade"] or "")] += sinal
+
+    def registrar(self, rows): self._aplicar(rows, +1)
+    def remover(self, rows): self._aplicar(rows, -1)
+
+    def invalidar(self):
+        with self._lock: self.membros.clear(); self.grupos.clear(); self._desde = time.monotonic()
+
+    def _contar(self, ini, fim, progresso=None):
+        um_dia = timedelta(days=1)
+        return _contar_linhas(self._carregar(ini - um_dia, fim + um_dia, progresso), ini, fim)
+
+    def _garantir(self, meses, progresso=None):
+        faltam = sorted(set(meses) - set(self.membros))
+        if not faltam: return
+        ini = date.fromisoformat(faltam[0] + "-01")
+        fim = (date.fromisoformat(faltam[-1] + "-01") + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+        membros, grupos = self._contar(ini, fim, progresso)
+        with self._lock:
+            for m in faltam:
+                self.membros[m] = membros.get(m, Counter())
+                self.grupos[m] = grupos.get(m, Counter())
+
+    def periodo(self, data_ini, data_fim, progresso=None):
+        if time.monotonic() - self._desde > self.validade: self.invalidar()   # pega gravações de outros aparelhos
+        inteiros, parciais = _fatiar_periodo(data_ini, data_fim)
+        self._garantir(inteiros, progresso)
+        por_membro, grupos, mensal = Counter(), Counter(), Counter()
+        with self._lock:
+            for m in inteiros:
+                por_membro.update(self.membros[m]); grupos.update(self.grupos[m])
+                mensal[m] = sum(self.membros[m].values())
+        for ini, fim in parciais:   # pontas fora de mês inteiro: contadas na hora, guardadas só com TTL
+            contar = lambda ini=ini, fim=fim: self._contar(ini, fim, progresso)
+            membros_p, grupos_p = self._consultas.obter(("presencas", ini, fim), contar) if self._consultas else contar()
+            for m, cont in membros_p.items():
+                por_membro.update(cont); mensal[m] += sum(cont.values())
+            for cont in grupos_p.values(): grupos.update(cont)
+        df_grupos = pd.DataFrame([(c, l, n) for (c, l), n in grupos.items() if n > 0],
+                                 columns=["Cargo","Localidade","Presencas"])
+        mensal = pd.Series({m: n for m, n in sorted(mensal.items()) if n > 0}, name="Presencas", dtype=int)
+        return ResumoPeriodo(pd.Series(+por_membro, dtype=int), df_grupos, mensal, int(mensal.sum()))
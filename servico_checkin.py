@@ -0,0 +1,321 @@
+"""Serviço de check-in para os leitores do navegador (docs/leitor.html).
+
+Um processo por local do evento: guarda o cadastro e os presentes de cada reunião
+em memória, valida cada leitura sem ir ao banco e grava as presenças em lotes em
+segundo plano. Só usa a biblioteca padrão (asyncio) e o armazenamento.py do projeto,
+então a chave do Supabase fica no servidor e não no link do leitor.
+
+    python servico_checkin.py --armazenamento sqlite --sqlite presenca.db   # só nesta máquina (127.0.0.1)
+    python servico_checkin.py --host 0.0.0.0 --token SEGREDO --origem https://usuario.github.io
+
+Fora do 127.0.0.1 o --token é obrigatório. O navegador só aceita as respostas
+nas páginas das origens passadas em --origem (CORS); sem ela, só na mesma origem.
+
+Link do leitor: docs/leitor.html?s=http://IP:8765&t=SEGREDO&m=<id da reunião>&n=<nome>
+
+Rotas (JSON):
+    POST /checkin         {"meeting_id": "...", "codigo": "..."} ou {"meeting_id": "...", "codigos": [...]}
+                          → {"resultados": [{"codigo", "status", "id", "nome", "cargo", "localidade"}]}
+                          status: "ok", "duplicado", "nao_encontrado" (como Armazenamento.checkin)
+                          ou "invalido" (crachá assinado que não confere, veja crachas.py)
+                          400 se o corpo não for assim; 404 se a reunião não existir
+    GET  /reuniao?m=<id>  → {"presentes": n}
+    POST /recarregar      relê o cadastro agora (o app chama depois de uma importação)
+    POST /recarregar?m=<id>  esquece os presentes da reunião, relidos na próxima leitura
+                          (o app chama depois de limpar as presenças dela)
+    GET  /saude           → contadores do serviço
+"""
+import argparse
+import asyncio
+import hmac
+import ipaddress
+import json
+import logging
+import os
+import time
+from datetime import datetime
+from urllib.parse import parse_qs, urlsplit
+
+import pytz
+
+from armazenamento import criar_armazenamento
+from crachas import validar
+
+log = logging.getLogger(__name__)
+
+FUSO = "America/Cuiaba"
+CORPO_MAX = 64 * 1024
+LEITURAS_MAX = 500            # códigos por pedido
+RECONSULTA_REUNIOES = 5.0     # segundos mínimos entre releituras da lista de reuniões
+MOTIVOS = {200: "OK", 204: "No Content", 400: "Bad Request", 401: "Unauthorized",
+           404: "Not Found", 413: "Payload Too Large", 500: "Internal Server Error",
+           503: "Service Unavailable"}
+CORS = ("Access-Control-Allow-Origin: {}\r\nVary: Origin\r\n"
+        "Access-Control-Allow-Methods: GET, POST, OPTIONS\r\n"
+        "Access-Control-Allow-Headers: Authorization, Content-Type\r\n")
+
+
+def normalizar_codigo(codigo):
+    return str(codigo).strip().upper()
+
+
+def host_local(host):
+    if host == "localhost": return True
+    try: return ipaddress.ip_address(host).is_loopback
+    except ValueError: return False
+
+
+class ErroHTTP(Exception):
+    def __init__(self, codigo, msg):
+        super().__init__(msg); self.codigo = codigo
+
+
+class ServicoCheckin:
+    """Estado em memória + tarefas de gravação em lote e de atualização.
+    Tudo roda num único event loop; o banco só é chamado via asyncio.to_thread."""
+
+    def __init__(self, arm, token=None, lote_max=500, intervalo=0.5, atualizar=10.0, recadastrar=300.0,
+                 chave="", versao_min=0, exigir_assinado=False, origens=()):
+        self.arm, self.token = arm, token
+        self.origens = {o.rstrip("/") for o in origens if o}
+        self.chave, self.versao_min, self.exigir_assinado = chave, versao_min, exigir_assinado
+        self.lote_max, self.intervalo = lote_max, intervalo
+        self.atualizar, self.recadastrar = atualizar, recadastrar
+        self.cadastro = {}          # código normalizado -> participante
+        self.colisoes = []          # IDs ignorados por colidir com outro no código normalizado
+        self.presentes = {}         # meeting_id -> {código normalizado}
+        self.reunioes = set()       # meeting_ids que existem no banco
+        self._reunioes_em = float("-inf")
+        self.cursores = {}          # meeting_id -> maior id de linha já visto no banco
+        self.fila = []              # presenças aguardando gravação
+        self._carregando = {}       # meeting_id -> Future da primeira leitura
+        self.leituras = self.gravadas = self.falhas = 0
+        self.ultimo_erro = None
+
+    # ── estado ──
+    async def carregar_cadastro(self):
+        cadastro, colisoes = {}, []
+        for p in await asyncio.to_thread(self.arm.participantes):
+            reg = {"id": str(p["id"]).strip(), "nome": p["nome"], "cargo": p["cargo"], "localidade": p["localidade"]}
+            atual = cadastro.setdefault(normalizar_codigo(p["id"]), reg)
+            if atual is not reg: colisoes.append(reg["id"])   # só difere de outro ID em maiúsculas/minúsculas
+        if colisoes and colisoes != self.colisoes:
+            log.warning("%d ID(s) repetidos ignorando maiúsculas/minúsculas: %s", len(colisoes), ", ".join(colisoes[:10]))
+        self.cadastro, self.colisoes = cadastro, colisoes
+
+    async def _existe_reuniao(self, mid):
+        """Confere a reunião antes de guardar leituras dela; um ID novo relê a lista (no máximo
+        a cada RECONSULTA_REUNIOES s, para IDs inventados não martelarem o banco)."""
+        if mid in self.reunioes: return True
+        if time.monotonic() - self._reunioes_em < RECONSULTA_REUNIOES: return False
+        self._reunioes_em = time.monotonic()
+        try: self.reunioes = {str(r["id"]) for r in await asyncio.to_thread(self.arm.reunioes)}
+        except Exception as e: raise ErroHTTP(503, f"Sem conexão com o banco: {e}")
+        return mid in self.reunioes
+
+    async def _reuniao(self, mid):
+        """Presentes da reunião; lidos do banco uma vez, na primeira leitura (leituras simultâneas esperam a mesma)."""
+        if mid in self.presentes: return self.presentes[mid]
+        fut = self._carregando.get(mid)
+        if fut is None:
+            fut = self._carregando[mid] = asyncio.ensure_future(asyncio.to_thread(self.arm.presencas_reuniao, mid))
+        try:
+            linhas = await asyncio.shield(fut)
+        except Exception as e:
+            self._carregando.pop(mid, None)
+            raise ErroHTTP(503, f"Sem conexão com o banco: {e}")
+        if mid not in self.presentes:
+            if self._carregando.get(mid) is not fut: return await self._reuniao(mid)   # esquecida durante a leitura
+            self._carregando.pop(mid, None)
+            self.presentes[mid] = ({normalizar_codigo(l["id_participante"]) for l in linhas}
+                                   | {normalizar_codigo(l["id_participante"]) for l in self.fila if l["meeting_id"] == mid})
+            self.cursores[mid] = max((l["id"] for l in linhas if l.get("id") is not None), default=0)
+        return self.presentes[mid]
+
+    def esquecer_reuniao(self, mid):
+        """Depois que as presenças da reunião foram apagadas no banco: o que está em memória não vale mais."""
+        self.presentes.pop(mid, None); self.cursores.pop(mid, None); self._carregando.pop(mid, None)
+
+    async def checkin(self, mid, codigos):
+        presentes = await self._reuniao(mid)
+        agora = datetime.now(pytz.timezone(FUSO))
+        saida = []
+        for cod in codigos:
+            self.leituras += 1
+            id_lido = validar(cod, self.chave, self.versao_min, self.exigir_assinado)
+            if id_lido is None:
+                saida.append({"codigo": cod, "status": "invalido"}); continue
+            p = self.cadastro.get(normalizar_codigo(id_lido))
+            if p is None:
+                saida.append({"codigo": cod, "status": "nao_encontrado"}); continue
+            chave = normalizar_codigo(p["id"])
+            if chave in presentes:
+                saida.append({"codigo": cod, "status": "duplicado", **p}); continue
+            presentes.add(chave)
+            self.fila.append({"meeting_id": mid, "id_participante": p["id"], "nome": p["nome"],
+                              "cargo": p["cargo"], "localidade": p["localidade"],
+                              "horario": agora.strftime("%H:%M:%S"), "data_registro": agora.isoformat()})
+            saida.append({"codigo": cod, "status": "ok", **p})
+        return saida
+
+    # ── tarefas de fundo ──
+    async def _gravar(self):
+        """Junta as leituras de todos os leitores e grava em lotes idempotentes; sem conexão, tenta de novo."""
+        espera = self.intervalo
+        while True:
+            await asyncio.sleep(espera)
+            if not self.fila: continue
+            lote, self.fila = self.fila[:self.lote_max], self.fila[self.lote_max:]
+            try:
+                await asyncio.to_thread(self.arm.inserir_presencas, lote)
+            except Exception as e:
+                self.fila[:0] = lote; self.falhas += 1; self.ultimo_erro = str(e)
+                espera = min(espera * 2, 30.0)
+            else:
+                self.gravadas += len(lote); self.ultimo_erro = None
+                espera = 0 if self.fila else self.intervalo
+
+    async def _atualizar(self):
+        """Traz os check-ins feitos fora deste serviço (app, outros locais) e, de tempos em tempos, o cadastro."""
+        ultimo_cadastro = time.monotonic()
+        while True:
+            await asyncio.sleep(self.atualizar)
+            try:
+                if time.monotonic() - ultimo_cadastro >= self.recadastrar:
+                    await self.carregar_cadastro(); ultimo_cadastro = time.monotonic()
+                for mid in list(self.presentes):
+                    presentes = self.presentes[mid]
+                    linhas = await asyncio.to_thread(self.arm.presencas_desde, mid, self.cursores[mid])
+                    if self.presentes.get(mid) is not presentes: continue   # esquecida durante a leitura
+                    for l in linhas:
+                        presentes.add(normalizar_codigo(l["id_participante"]))
+                        self.cursores[mid] = max(self.cursores[mid], l["id"])
+            except Exception as e:
+                self.ultimo_erro = str(e)
+
+    # ── HTTP ──
+    def _autorizado(self, cab, consulta):
+        if not self.token: return True
+        enviado = cab.get("authorization", "").removeprefix("Bearer ").strip() or consulta.get("t", [""])[0]
+        return hmac.compare_digest(enviado.encode(), self.token.encode())
+
+    def _cors(self, cab):
+        """Cabeçalhos CORS só para as origens configuradas (o navegador barra as demais)."""
+        origem = cab.get("origin", "").rstrip("/")
+        if origem and (origem in self.origens or "*" in self.origens): return CORS.format(origem)
+        return ""
+
+    async def _rotear(self, metodo, alvo, cab, corpo):
+        url = urlsplit(alvo); consulta = parse_qs(url.query)
+        if metodo == "OPTIONS": return 204, None
+        if url.path == "/saude":
+            return 200, {"ok": True, "participantes": len(self.cadastro), "colisoes": len(self.colisoes), "reunioes": len(self.presentes),
+                         "leituras": self.leituras, "pendentes": len(self.fila), "gravadas": self.gravadas,
+                         "falhas": self.falhas, "ultimo_erro": self.ultimo_erro}
+        if not self._autorizado(cab, consulta): raise ErroHTTP(401, "Token inválido.")
+        if url.path == "/checkin" and metodo == "POST":
+            try: pedido = json.loads(corpo or b"{}")
+            except ValueError: raise ErroHTTP(400, "JSON inválido.")
+            if not isinstance(pedido, dict): raise ErroHTTP(400, "O corpo deve ser um objeto JSON.")
+            mid = pedido.get("meeting_id")
+            codigos = pedido["codigos"] if "codigos" in pedido else [pedido["codigo"]] if "codigo" in pedido else None
+            if isinstance(mid, bool) or not isinstance(mid, (str, int)) or not str(mid).strip():
+                raise ErroHTTP(400, "Informe meeting_id.")
+            if not isinstance(codigos, list) or not codigos or not all(isinstance(c, str) for c in codigos):
+                raise ErroHTTP(400, "Informe codigo (texto) ou codigos (lista de textos).")
+            if len(codigos) > LEITURAS_MAX: raise ErroHTTP(413, f"No máximo {LEITURAS_MAX} códigos por pedido.")
+            mid = str(mid).strip()
+            if not await self._existe_reuniao(mid): raise ErroHTTP(404, "Reunião não encontrada.")
+            return 200, {"resultados": await self.checkin(mid, codigos)}
+        if url.path == "/recarregar" and metodo == "POST":
+            mid = consulta.get("m", [""])[0].strip()
+            if mid:
+                self.esquecer_reuniao(mid)
+                return 200, {"reuniao": mid}
+            try: await self.carregar_cadastro()
+            except Exception as e: raise ErroHTTP(503, f"Sem conexão com o banco: {e}")
+            return 200, {"participantes": len(self.cadastro)}
+        if url.path == "/reuniao" and metodo == "GET":
+            mid = consulta.get("m", [""])[0].strip()
+            if not mid: raise ErroHTTP(400, "Informe m.")
+            if not await self._existe_reuniao(mid): raise ErroHTTP(404, "Reunião não encontrada.")
+            return 200, {"presentes": len(await self._reuniao(mid))}
+        raise ErroHTTP(404, "Rota desconhecida.")
+
+    async def _conexao(self, leitor, escritor):
+        try:
+            while True:   # keep-alive: o leitor reaproveita a conexão entre leituras
+                linha = await leitor.readline()
+                if not linha.strip(): break
+                metodo, alvo, _ = linha.decode("latin-1").split(" ", 2)
+                cab = {}
+                while (l := await leitor.readline()) not in (b"\r\n", b"\n", b""):
+                    k, _, v = l.decode("latin-1").partition(":"); cab[k.strip().lower()] = v.strip()
+                tamanho = int(cab.get("content-length") or 0)
+                try:
+                    if tamanho > CORPO_MAX: raise ErroHTTP(413, "Corpo grande demais.")
+                    corpo = await leitor.readexactly(tamanho)
+                    codigo, resposta = await self._rotear(metodo, alvo, cab, corpo)
+                except ErroHTTP as e:
+                    codigo, resposta = e.codigo, {"erro": str(e)}
+                except Exception:   # defeito aqui não derruba a conexão sem resposta
+                    log.exception("Erro em %s %s", metodo, alvo)
+                    codigo, resposta = 500, {"erro": "Erro interno."}
+                dados = b"" if resposta is None else json.dumps(resposta, ensure_ascii=False).encode()
+                escritor.write(f"HTTP/1.1 {codigo} {MOTIVOS[codigo]}\r\n{self._cors(cab)}"
+                               f"Content-Type: application/json; charset=utf-8\r\n"
+                               f"Content-Length: {len(dados)}\r\n\r\n".encode("latin-1") + dados)
+                await escritor.drain()
+                if codigo in (413, 500) or cab.get("connection", "").lower() == "close": break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            escritor.close()
+
+    async def rodar(self, host="127.0.0.1", porta=8765):
+        if not self.token and not host_local(host):
+            raise ValueError(f"Sem token o serviço só pode escutar em 127.0.0.1 (pedido: {host}).")
+        await self.carregar_cadastro()
+        tarefas = [asyncio.create_task(self._gravar()), asyncio.create_task(self._atualizar())]
+        servidor = await asyncio.start_server(self._conexao, host, porta)
+        log.info("Check-in em http://%s:%s — %d participantes", host, porta, len(self.cadastro))
+        try:
+            async with servidor: await servidor.serve_forever()
+        finally:
+            for t in tarefas: t.cancel()
+            if self.fila: self.arm.inserir_presencas(self.fila); self.fila = []   # não perde o que estava na fila
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Serviço de check-in para os leitores do navegador")
+    ap.add_argument("--host", default="127.0.0.1", help="0.0.0.0 para aceitar leitores da rede (exige --token)")
+    ap.add_argument("--porta", type=int, default=8765)
+    ap.add_argument("--token", default=os.environ.get("SERVICO_TOKEN"), help="exigido pelos leitores (parâmetro t do link)")
+    ap.add_argument("--origem", action="append", default=[o for o in os.environ.get("SERVICO_ORIGEM", "").split(",") if o],
+                    help="origem da página do leitor liberada no CORS (ex.: https://usuario.github.io); repita para várias")
+    ap.add_argument("--armazenamento", choices=["supabase", "sqlite"], default=os.environ.get("ARMAZENAMENTO", "supabase"))
+    ap.add_argument("--sqlite", default=os.environ.get("SQLITE_PATH", "presenca.db"))
+    ap.add_argument("--chave", default=os.environ.get("CRACHA_CHAVE", ""), help="chave dos crachás assinados")
+    ap.add_argument("--versao-min", type=int, default=int(os.environ.get("CRACHA_VERSAO_MIN", 0)),
+                    help="tiragem mínima aceita nos crachás assinados")
+    ap.add_argument("--exigir-assinado", action="store_true",
+                    default=os.environ.get("CRACHA_EXIGIR_ASSINADO", "").lower() in ("1", "true", "sim"),
+                    help="recusa IDs simples: só valem crachás assinados")
+    ap.add_argument("--lote", type=int, default=500, help="presenças por gravação")
+    ap.add_argument("--intervalo", type=float, default=0.5, help="segundos entre gravações")
+    a = ap.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    if not a.token and not host_local(a.host): ap.error("--token (ou SERVICO_TOKEN) é obrigatório fora do 127.0.0.1")
+    if a.armazenamento == "sqlite":
+        arm = criar_armazenamento("sqlite", caminho=a.sqlite, csv_participantes="participantes.csv")
+    else:
+        arm = criar_armazenamento("supabase", url=os.environ["SUPABASE_URL"], key=os.environ["SUPABASE_KEY"])
+    try:
+        asyncio.run(ServicoCheckin(arm, a.token, a.lote, a.intervalo, chave=a.chave, versao_min=a.versao_min,
+                                   exigir_assinado=a.exigir_assinado, origens=a.origem).rodar(a.host, a.porta))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
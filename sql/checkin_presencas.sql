@@ -0,0 +1,60 @@
+-- Check-in atômico em uma única chamada (POST /rest/v1/rpc/checkin_presencas).
+-- Resolve o participante no servidor e insere com on conflict no índice único
+-- de presencas_unico.sql, então duas estações nunca registram a mesma pessoa.
+-- Retorna um array jsonb, um item por código, na ordem recebida:
+--   {"codigo", "status": "ok" | "duplicado" | "nao_encontrado" | "invalido", "id", "nome", "cargo", "localidade"}
+-- Crachás assinados (P1:..., crachas.py) voltam "invalido": a chave não fica no
+-- banco, então leitores com esses crachás devem usar o servico_checkin.py.
+-- Usado por armazenamento.ArmazenamentoSupabase.checkin e por docs/leitor.html.
+
+create or replace function checkin_presencas(
+    p_meeting_id    text,
+    p_codigos       text[],
+    p_horario       text default null,
+    p_data_registro text default null)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_codigo  text;
+    p         record;
+    v_novo    presencas.id%type;
+    v_saida   jsonb := '[]'::jsonb;
+    v_horario text  := coalesce(p_horario, to_char(now() at time zone 'America/Cuiaba', 'HH24:MI:SS'));
+    v_data    text  := coalesce(p_data_registro, to_char(now(), 'YYYY-MM-DD"T"HH24:MI:SS.MSTZH:TZM'));
+begin
+    foreach v_codigo in array p_codigos loop
+        if upper(trim(v_codigo)) like 'P1:%' then
+            v_saida := v_saida || jsonb_build_array(jsonb_build_object('codigo', v_codigo, 'status', 'invalido'));
+            continue;
+        end if;
+        select id::text as id, nome, cargo, localidade into p
+          from participantes where id::text = trim(v_codigo) limit 1;
+        if not found then   -- mesma normalização do app (espaços e maiúsculas)
+            select id::text as id, nome, cargo, localidade into p
+              from participantes where upper(trim(id::text)) = upper(trim(v_codigo)) limit 1;
+        end if;
+        if not found then
+            v_saida := v_saida || jsonb_build_array(jsonb_build_object('codigo', v_codigo, 'status', 'nao_encontrado'));
+            continue;
+        end if;
+
+        v_novo := null;
+        -- jsonb_populate_record converte os textos para os tipos reais das colunas (como o PostgREST)
+        insert into presencas (meeting_id, id_participante, nome, cargo, localidade, horario, data_registro)
+        select meeting_id, id_participante, nome, cargo, localidade, horario, data_registro
+          from jsonb_populate_record(null::presencas, jsonb_build_object(
+                 'meeting_id', p_meeting_id, 'id_participante', p.id, 'nome', p.nome,
+                 'cargo', p.cargo, 'localidade', p.localidade,
+                 'horario', v_horario, 'data_registro', v_data))
+        on conflict (meeting_id, id_participante) do nothing
+        returning id into v_novo;
+
+        v_saida := v_saida || jsonb_build_array(jsonb_build_object(
+            'codigo', v_codigo,
+            'status', case when v_novo is null then 'duplicado' else 'ok' end,
+            'id', p.id, 'nome', p.nome, 'cargo', p.cargo, 'localidade', p.localidade));
+    end loop;
+    return v_saida;
+end;
+$$;
@@ -0,0 +1,5 @@
+-- Índice da sincronização incremental do check-in:
+-- cada estação busca "presenças da reunião com id > cursor" a cada poucos segundos.
+
+create index if not exists presencas_meeting_id_cursor
+    on presencas (meeting_id, id);
@@ -0,0 +1,12 @@
+-- Garante um único check-in por participante em cada reunião.
+-- Necessário para o envio idempotente do diário local (upsert on_conflict).
+
+-- remove duplicatas antigas, mantendo o primeiro registro
+delete from presencas a
+using presencas b
+where a.meeting_id = b.meeting_id
+  and a.id_participante = b.id_participante
+  and a.id > b.id;
+
+create unique index if not exists presencas_meeting_participante
+    on presencas (meeting_id, id_participante);
@@ -0,0 +1,79 @@
+import pytest
+
+from armazenamento import Armazenamento, ArmazenamentoSQLite
+
+
+@pytest.fixture
+def arm():
+    return ArmazenamentoSQLite(":memory:")
+
+
+def presenca(id_p, data_registro, mid="1"):
+    return {"meeting_id": mid, "id_participante": id_p, "nome": id_p, "cargo": "", "localidade": "",
+            "horario": "", "data_registro": data_registro}
+
+
+def test_interface_abstrata():
+    with pytest.raises(TypeError):
+        Armazenamento()
+
+
+def test_periodo_compara_instantes_em_utc(arm):
+    arm.inserir_presencas([
+        presenca("A", "2024-05-31T19:59:59-04:00"),    # 23:59:59 UTC: dentro
+        presenca("B", "2024-05-31T21:30:00-04:00"),    # 01:30 UTC de junho: fora
+        presenca("C", "2024-06-01T02:00:00+00:00"),    # fora
+        presenca("D", "2024-04-30T22:00:00-04:00"),    # 02:00 UTC de 1º de maio: dentro
+        presenca("E", "2024-05-15T12:00:00"),          # sem fuso: UTC
+    ])
+    ids = [p["id_participante"] for pg in arm.presencas_periodo("2024-05-01", "2024-05-31", ["id_participante"])
+           for p in pg]
+    assert sorted(ids) == ["A", "D", "E"]
+
+
+def test_periodo_pagina_por_keyset(arm):
+    arm.inserir_presencas(presenca(f"P{i}", "2024-05-10T10:00:00-04:00") for i in range(25))
+    paginas = list(arm.presencas_periodo("2024-05-01", "2024-05-31", ["id_participante"], pagina=10))
+    assert [len(p) for p in paginas] == [10, 10, 5]
+
+
+class ClienteRPC:
+    """Cliente Supabase mínimo: rpc() levanta `erro` ou devolve `dados`."""
+    def __init__(self, erro=None, dados=()):
+        self.erro, self.dados, self.chamadas = erro, list(dados), 0
+
+    def rpc(self, nome, args):
+        self.chamadas += 1
+        return self
+
+    def execute(self):
+        if self.erro: raise self.erro
+        return type("R", (), {"data": self.dados})()
+
+
+def test_checkin_sem_funcao_desliga_a_rpc():
+    APIError = pytest.importorskip("postgrest.exceptions").APIError
+    from armazenamento import ArmazenamentoSupabase, FuncaoAusente
+    cli = ClienteRPC(APIError({"code": "PGRST202", "message": "Could not find the function"}))
+    arm = ArmazenamentoSupabase(cli)
+    for _ in range(3):
+        with pytest.raises(FuncaoAusente): arm.checkin("1", ["A"])
+    assert cli.chamadas == 1 and not arm.checkin_ativo
+
+
+def test_checkin_sem_rede_e_outros_erros():
+    httpx = pytest.importorskip("httpx")
+    APIError = pytest.importorskip("postgrest.exceptions").APIError
+    from armazenamento import ArmazenamentoSupabase, SemConexao
+    with pytest.raises(SemConexao):
+        ArmazenamentoSupabase(ClienteRPC(httpx.ConnectError("recusada"))).checkin("1", ["A"])
+    arm = ArmazenamentoSupabase(ClienteRPC(APIError({"code": "42501", "message": "permission denied"})))
+    with pytest.raises(APIError): arm.checkin("1", ["A"])
+    assert arm.checkin_ativo
+    assert ArmazenamentoSupabase(ClienteRPC(dados=[{"codigo": "A", "status": "ok"}])).checkin("1", ["A"])[0]["status"] == "ok"
+
+
+def test_inserir_presencas_devolve_so_as_novas(arm):
+    assert len(arm.inserir_presencas([presenca("A", "2024-05-01T10:00:00"), presenca("B", "2024-05-01T10:00:00")])) == 2
+    novas = arm.inserir_presencas([presenca("A", "2024-05-02T10:00:00"), presenca("C", "2024-05-02T10:00:00")])
+    assert [p["id_participante"] for p in novas] == ["C"]
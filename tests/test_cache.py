@@ -0,0 +1,49 @@
+from datetime import date
+
+from cache import CacheConsultas
+
+MAIO, JUNHO = ("presencas", date(2024, 5, 1), date(2024, 5, 31)), ("presencas", date(2024, 6, 1), date(2024, 6, 30))
+
+
+class Contador:
+    def __init__(self): self.n = 0
+    def __call__(self): self.n += 1; return self.n
+
+
+def test_guarda_ate_invalidar_o_periodo():
+    cache, ler = CacheConsultas(), Contador()
+    assert cache.obter(MAIO, ler) == 1 and cache.obter(MAIO, ler) == 1
+    assert cache.obter(JUNHO, ler) == 2
+    cache.invalidar("presencas", ["2024-05-10T19:30:00-04:00"])
+    assert cache.obter(MAIO, ler) == 3 and cache.obter(JUNHO, ler) == 2
+    cache.invalidar("reunioes")
+    assert cache.obter(MAIO, ler) == 3
+
+
+def test_chave_por_reuniao_cai_pelo_dia():
+    cache, ler = CacheConsultas(), Contador()
+    dia = ("presencas", date(2024, 5, 10), date(2024, 5, 10), "r1")
+    cache.obter(dia, ler)
+    cache.invalidar("presencas", ["2024-05-11"])
+    assert cache.obter(dia, ler) == 1
+    cache.invalidar("presencas", ["2024-05-10"])
+    assert cache.obter(dia, ler) == 2
+
+
+def test_leitura_antes_da_invalidacao_nao_fica():
+    cache, ler = CacheConsultas(), Contador()
+    def ler_e_gravar():   # outra sessão grava no meio da leitura
+        cache.invalidar("presencas", ["2024-05-10"]); return ler()
+    assert cache.obter(MAIO, ler_e_gravar) == 1
+    assert cache.obter(MAIO, ler) == 2
+
+
+def test_ttl_e_limpar():
+    cache, ler = CacheConsultas(ttl=0), Contador()
+    assert cache.obter(MAIO, ler) == 1 and cache.obter(MAIO, ler) == 2
+    cache = CacheConsultas()
+    cache.obter(MAIO, ler); cache.obter(("reunioes", date.min, date.max), ler)
+    cache.limpar()
+    assert cache.obter(MAIO, ler) == 5
+    cache.invalidar("presencas", ["data inválida"])   # sem data legível cai a tabela toda
+    assert cache.obter(MAIO, ler) == 6
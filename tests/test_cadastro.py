@@ -0,0 +1,62 @@
+import pandas as pd
+
+from armazenamento import ArmazenamentoSQLite
+from cadastro import Cadastro, convocacoes_periodo, convocados_reuniao, migrar_convocacoes_manuais, valores_filtro
+
+DADOS = [{"id": " A1 ", "nome": "Ana", "cargo": "Músico", "localidade": "Centro"},
+         {"id": "B2", "nome": "Beto", "cargo": "Organista", "localidade": "Norte"},
+         {"id": "C3", "nome": "Ana", "cargo": "Organista", "localidade": "Centro"}]
+
+
+def test_indice_e_colisoes():
+    cad = Cadastro(DADOS + [{"id": "b2", "nome": "Outro", "cargo": "Músico", "localidade": "Sul"}])
+    assert cad.indice["A1"] == ("A1", "Ana", "Músico", "Centro")
+    assert cad.indice["B2"][0] == "B2" and cad.colisoes == [("B2", "b2")]
+    assert cad.contagens["Cargo"] == {"Músico": 2, "Organista": 2}
+    assert Cadastro().empty and Cadastro().indice == {}
+
+
+def test_convocacao_por_filtro():
+    cad = Cadastro(DADOS)
+    assert convocados_reuniao(cad, {"filtro_tipo": "Todos"}) == {"A1", "B2", "C3"}
+    assert convocados_reuniao(cad, {"filtro_tipo": "Por Cargo", "filtro_valores": ["Organista"]}) == {"B2", "C3"}
+    assert convocados_reuniao(cad, {"filtro_tipo": "Por Localidade", "filtro_valores": '["Centro"]'}) == {"A1", "C3"}
+    assert list(cad.convocados("Por Cargo", ["Músico"])["ID"]) == ["A1"]
+
+
+def test_convocacao_manual_por_id_e_por_nome_antigo():
+    cad = Cadastro(DADOS)
+    assert convocados_reuniao(cad, {"filtro_tipo": "Manual", "filtro_valores": [" b2 "]}) == {"B2"}
+    # reuniões antigas guardavam nomes: um nome convoca todos os homônimos
+    assert convocados_reuniao(cad, {"filtro_tipo": "Manual", "filtro_valores": ["Ana"]}) == {"A1", "C3"}
+    assert cad.ids_manuais(["Ana", "B2"]) == ["A1", "B2", "C3"]
+
+
+def test_valores_filtro():
+    assert valores_filtro({"filtro_valores": '["x"]'}) == ["x"]
+    assert valores_filtro({"filtro_valores": "não é json"}) == []
+    assert valores_filtro({}) == []
+
+
+def test_convocacoes_periodo():
+    cad = Cadastro(DADOS)
+    reunioes = [{"id": "r1", "filtro_tipo": "Todos"},
+                {"id": "r2", "filtro_tipo": "Por Cargo", "filtro_valores": ["Músico"]},
+                {"id": "r3", "filtro_tipo": "Manual", "filtro_valores": ["B2"]}]
+    conv = convocacoes_periodo(cad, reunioes)
+    assert isinstance(conv, pd.Series)
+    assert conv.to_dict() == {"A1": 2, "B2": 2, "C3": 1}
+
+
+def test_migrar_convocacoes_manuais():
+    arm = ArmazenamentoSQLite(":memory:")
+    for r in ({"id": "R1", "filtro_tipo": "Manual", "filtro_valores": ["Ana", "B2"]},
+              {"id": "R2", "filtro_tipo": "Manual", "filtro_valores": ["A1"]},
+              {"id": "R3", "filtro_tipo": "Manual", "filtro_valores": ["Ana", "Zé"]},
+              {"id": "R4", "filtro_tipo": "Por Cargo", "filtro_valores": ["Músico"]}):
+        arm.salvar_reuniao({"nome": "Ensaio", "data": "2024-05-10", **r})
+    assert migrar_convocacoes_manuais(arm, Cadastro()) == []   # cadastro vazio: não mexe
+    assert [r["id"] for r in migrar_convocacoes_manuais(arm, Cadastro(DADOS))] == ["R1"]
+    salvas = {r["id"]: valores_filtro(r) for r in arm.reunioes()}
+    assert salvas == {"R1": ["A1", "B2", "C3"], "R2": ["A1"], "R3": ["Ana", "Zé"], "R4": ["Músico"]}
+    assert migrar_convocacoes_manuais(arm, Cadastro(DADOS)) == []
@@ -0,0 +1,38 @@
+from crachas import PREFIXO, gerar_codigo, validar
+
+
+def test_codigo_assinado_volta_o_id():
+    codigo = gerar_codigo(" CF001 ", 2, "segredo")
+    assert codigo.startswith(PREFIXO)
+    assert validar(codigo, "segredo") == "CF001"
+    assert validar(codigo.lower(), "segredo") is None   # o ID faz parte da assinatura
+    assert validar(codigo.replace("P1:", "p1:"), "segredo") == "CF001"
+
+
+def test_id_com_dois_pontos():
+    assert validar(gerar_codigo("A:B", 1, "k"), "k") == "A:B"
+
+
+def test_assinatura_ou_chave_errada():
+    codigo = gerar_codigo("CF001", 1, "segredo")
+    assert validar(codigo, "outra") is None
+    assert validar(codigo[:-1] + ("A" if codigo[-1] != "A" else "B"), "segredo") is None
+    assert validar(gerar_codigo("CF002", 1, "segredo").replace("CF002", "CF001"), "segredo") is None
+
+
+def test_tiragem_revogada():
+    codigo = gerar_codigo("CF001", 1, "segredo")
+    assert validar(codigo, "segredo", versao_min=1) == "CF001"
+    assert validar(codigo, "segredo", versao_min=2) is None
+
+
+def test_codigo_mal_formado():
+    for codigo in ("P1:", "P1:CF001", "P1:CF001:x:AAAAAAAA", "P1::1:AAAAAAAA",
+                   "P1:CF001:²:AAAAAAAA", "P1:CF001:١:AAAAAAAA", "P1:CF001:1:ÁBCDEFGH"):
+        assert validar(codigo, "segredo") is None
+
+
+def test_id_simples_so_sem_exigir_assinado():
+    assert validar(" CF001 ", "segredo") == "CF001"
+    assert validar("CF001", "segredo", exigir_assinado=True) is None
+    assert validar(gerar_codigo("CF001", 1, "segredo"), "segredo", exigir_assinado=True) == "CF001"
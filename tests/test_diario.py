@@ -0,0 +1,129 @@
+import threading
+import time
+
+import pytest
+
+from diario import DiarioPresencas, mesclar_presencas
+
+
+def linha(mid, id_p):
+    return {"meeting_id": mid, "id_participante": id_p, "nome": id_p, "cargo": "", "localidade": "",
+            "horario": "19:00:00", "data_registro": "2024-05-01T19:00:00-04:00"}
+
+
+def esperar(cond, limite=3.0):
+    fim = time.monotonic() + limite
+    while not cond():
+        if time.monotonic() > fim: return False
+        time.sleep(0.01)
+    return True
+
+
+class Banco:
+    """gravar() de mentira: falha enquanto `falhar` > 0 e pode ser travado por um Event."""
+    def __init__(self, falhar=0):
+        self.linhas, self.falhar, self.chamadas = {}, falhar, 0
+        self.liberar, self.entrou = threading.Event(), threading.Event()
+        self.liberar.set()
+
+    def gravar(self, rows):
+        self.chamadas += 1; self.entrou.set()
+        self.liberar.wait()
+        if self.falhar: self.falhar -= 1; raise ConnectionError("offline")
+        novas = [r for r in rows if (r["meeting_id"], r["id_participante"]) not in self.linhas]
+        for r in novas: self.linhas[(r["meeting_id"], r["id_participante"])] = r
+        return novas
+
+
+@pytest.fixture
+def criar(tmp_path):
+    def criar(banco, **kw):
+        return DiarioPresencas(str(tmp_path / "diario.db"), banco.gravar, acumular=0, espera_max=0.05, **kw)
+    return criar
+
+
+def test_mesclar_so_acrescenta_pendentes_ausentes():
+    remotos = [linha("1", "A")]
+    assert mesclar_presencas(remotos, [linha("1", "A"), linha("1", "B")]) == [linha("1", "A"), linha("1", "B")]
+
+
+def test_reenvia_ate_gravar_e_tira_do_diario(criar):
+    banco = Banco(falhar=3)
+    d = criar(banco)
+    d.registrar([linha("1", "A"), linha("1", "B")])
+    assert esperar(lambda: d.pendentes == 0)
+    assert set(banco.linhas) == {("1", "A"), ("1", "B")}
+    assert banco.chamadas == 4 and d.falhas == 3 and d.ultimo_erro is None
+    assert d.sincronizados == 2 and d.da_reuniao("1") == []
+
+
+def test_enviadas_nao_voltam_depois_de_limpar_no_banco(criar):
+    banco = Banco()
+    d = criar(banco)
+    d.registrar([linha("1", "A")])
+    assert esperar(lambda: d.pendentes == 0)
+    banco.linhas.clear()   # outra estação limpou a reunião
+    assert mesclar_presencas([], d.da_reuniao("1")) == []
+
+
+def test_ja_gravadas_so_contam(criar):
+    d = criar(Banco())
+    d.registrar([linha("1", "A")], sincronizado=True)
+    assert d.pendentes == 0 and d.sincronizados == 1
+
+
+def test_descartar_espera_lote_em_andamento(criar):
+    banco = Banco(); banco.liberar.clear()
+    d = criar(banco)
+    d.registrar([linha("1", "A")])
+    assert banco.entrou.wait(3)
+    fim = []
+    t = threading.Thread(target=lambda: fim.append(d.descartar_reuniao("1")))
+    t.start(); time.sleep(0.1)
+    assert t.is_alive()            # não retorna com o lote ainda no ar
+    banco.liberar.set(); t.join(3)
+    assert fim == [True] and d.pendentes == 0
+
+
+def test_descartar_com_lote_preso_avisa(criar):
+    banco = Banco(); banco.liberar.clear()
+    d = criar(banco)
+    d.registrar([linha("1", "A")])
+    assert banco.entrou.wait(3)
+    assert d.descartar_reuniao("2", espera=0.05) is True    # outra reunião não espera
+    assert d.descartar_reuniao("1", espera=0.05) is False
+    banco.liberar.set()
+
+
+def test_registro_durante_gravacao_nao_se_perde(criar):
+    banco = Banco(); banco.liberar.clear()
+    d = criar(banco, ocioso=60.0)
+    d.registrar([linha("1", "A")])
+    assert banco.entrou.wait(3)
+    d.registrar([linha("1", "B")])   # chega enquanto o primeiro lote grava
+    banco.liberar.set()
+    assert esperar(lambda: ("1", "B") in banco.linhas)
+
+
+def test_conflitos_acusados_depois(criar):
+    banco = Banco(); banco.linhas[("r1", "A")] = linha("r1", "A")   # já registrado em outra estação
+    d = criar(banco)
+    inicio, _ = d.conflitos("r1")
+    d.registrar([linha("r1", "A"), linha("r1", "B"), linha("r2", "A")])
+    assert esperar(lambda: d.pendentes == 0)
+    pos, conflitos = d.conflitos("r1", inicio)
+    assert [c["id_participante"] for c in conflitos] == ["A"]
+    assert d.conflitos("r1", pos) == (pos, []) and d.conflitos("r2", inicio)[1] == []
+
+
+def test_reenvio_nao_e_conflito():
+    banco = Banco()
+    gravar = banco.gravar
+    def grava_e_perde_resposta(rows):   # o banco gravou, mas a resposta não chegou
+        banco.gravar = gravar
+        gravar(rows); raise TimeoutError("resposta perdida")
+    d = DiarioPresencas(":memory:", lambda rows: banco.gravar(rows), acumular=0, espera_max=0.05)
+    banco.gravar = grava_e_perde_resposta
+    d.registrar([linha("r1", "A")])
+    assert esperar(lambda: d.pendentes == 0 and d.falhas == 1)
+    assert d.conflitos("r1", 0)[1] == []
@@ -0,0 +1,69 @@
+import io
+import math
+
+import numpy as np
+import pytest
+from openpyxl import load_workbook
+from PIL import Image
+
+import exportacao
+from exportacao import CacheQR, PlanilhaStream, qr_png
+
+
+@pytest.fixture
+def planilha():
+    pl = PlanilhaStream(tam_cabecalho=12)
+    ws = pl.aba("Resumo", [40, 12], mesclar=["A1:D1"])
+    pl.linha(ws, ["Relatorio: <teste> & cia"], "titulo"); pl.linha(ws, [])
+    pl.linha(ws, ["Por Cargo"], "negrito")
+    pl.tabela(ws, ["Cargo", "Qtd"], [("A", 3), ("B", np.int64(2))])
+    wl = pl.aba("Lista/2024", [12, 35])
+    pl.tabela(wl, ["ID", "Nome", "Freq"], [(f"S{i:04d}", f" nome {i}\x01", i / 3) for i in range(2500)]
+              + [("X", None, math.nan), ("Y", True, np.float64(1.5))])
+    return load_workbook(io.BytesIO(pl.bytes()))
+
+
+def test_valores(planilha):
+    ws, wl = planilha["Resumo"], planilha["Lista 2024"]
+    assert ws["A1"].value == "Relatorio: <teste> & cia" and ws["A2"].value is None
+    assert [[c.value for c in r] for r in ws.iter_rows(min_row=4, max_row=6, max_col=2)] == [["Cargo", "Qtd"], ["A", 3], ["B", 2]]
+    assert wl.max_row == 2503
+    assert [c.value for c in wl[2]] == ["S0000", " nome 0", 0]
+    assert wl["C3"].value == pytest.approx(1 / 3, abs=0, rel=1e-15)
+    assert [c.value for c in wl[2502]] == ["X", None, None]
+    assert [c.value for c in wl[2503]] == ["Y", True, 1.5]
+
+
+def test_estilos_e_layout(planilha):
+    ws, wl = planilha["Resumo"], planilha["Lista 2024"]
+    assert ws["A1"].style == "titulo" and ws["A1"].font.b and ws["A1"].font.sz == 14
+    assert ws["A3"].style == "negrito" and ws["A3"].font.b
+    cab = ws["A4"]
+    assert cab.style == "cabecalho" and cab.font.b and cab.font.sz == 12 and cab.font.color.rgb == "FFFFFFFF"
+    assert cab.fill.fgColor.rgb == "FF1F4E78" and cab.alignment.horizontal == "center"
+    corpo = wl["B2502"]                       # vazia, mas com borda
+    assert corpo.style == "celula" and corpo.border.left.style == "thin" and corpo.border.bottom.style == "thin"
+    assert ws.column_dimensions["A"].width == 40 and wl.column_dimensions["B"].width == 35
+    assert [str(m) for m in ws.merged_cells.ranges] == ["A1:D1"]
+
+
+def test_qr_com_margem_branca():
+    img = Image.open(io.BytesIO(qr_png("CF001")))
+    px = np.asarray(img)
+    assert (px[:4] == 255).all() and (px[-4:] == 255).all() and (px[:, :4] == 255).all() and (px[:, -4:] == 255).all()
+    assert (px[4:-4, 4:-4] == 0).any()
+
+
+def test_cache_qr_reusa_processos(monkeypatch):
+    monkeypatch.setattr(exportacao, "QR_PARALELO_MIN", 2)
+    cache = CacheQR(maximo=3, workers=2)
+    try:
+        itens = [(f"S{i}", f"S{i}") for i in range(6)]
+        pngs = cache.obter(itens)
+        pool = cache._processos
+        assert pool is not None
+        assert cache.obter(itens[::-1]) == pngs[::-1]   # maior que o cache: os que saíram são redesenhados
+        assert cache._processos is pool
+        assert pngs == [qr_png(p) for _, p in itens]
+    finally:
+        cache.fechar()
@@ -0,0 +1,68 @@
+import io
+import sqlite3
+
+import pytest
+
+from armazenamento import ArmazenamentoSQLite
+from importacao import importar_participantes, ler_linhas
+
+
+@pytest.fixture
+def arm():
+    arm = ArmazenamentoSQLite(":memory:")
+    arm.inserir_participantes([{"id": "cf001", "nome": "Ana", "cargo": "Músico", "localidade": "Centro"},
+                               {"id": "CF002", "nome": "Beto", "cargo": "Músico", "localidade": "Norte"},
+                               {"id": "CF003", "nome": "Caio", "cargo": "", "localidade": ""}])
+    return arm
+
+
+def linhas(texto):
+    return ler_linhas(io.BytesIO(texto.encode()), "membros.csv")
+
+
+ARQUIVO = ("ID;Nome;Cargo;Localidade\n"
+           " CF001 ;Ana;Músico;Centro\n"      # igual (ID com outra caixa e espaços)
+           "CF002;Beto  Souza;Músico;Norte\n"  # alterado
+           "Cf004;Dora;Organista;Sul\n"        # novo: guardado como está no arquivo
+           "cf004;Outra;;\n"                   # repetido
+           ";Sem ID;;\n")
+
+
+def cadastro(arm):
+    return {p["id"]: (p["nome"], p["cargo"], p["localidade"]) for p in arm.participantes()}
+
+
+def test_grava_so_a_diferenca(arm):
+    res = importar_participantes(arm, linhas(ARQUIVO), arm.participantes())
+    assert (res.lidas, res.inseridos, res.alterados, res.iguais, res.repetidas, res.invalidas, res.ausentes) == \
+        (5, 1, 1, 1, 1, 1, 1)
+    assert cadastro(arm) == {"cf001": ("Ana", "Músico", "Centro"), "CF002": ("Beto Souza", "Músico", "Norte"),
+                             "CF003": ("Caio", "", ""), "Cf004": ("Dora", "Organista", "Sul")}
+
+
+def test_simular_nao_grava(arm):
+    antes = cadastro(arm)
+    res = importar_participantes(arm, linhas(ARQUIVO), arm.participantes(), simular=True, remover_ausentes=True)
+    assert (res.inseridos, res.alterados, res.removidos) == (1, 1, 1)
+    assert cadastro(arm) == antes
+
+
+def test_remover_ausentes(arm):
+    res = importar_participantes(arm, linhas(ARQUIVO), arm.participantes(), remover_ausentes=True, bloco=2)
+    assert res.removidos == 1 and "CF003" not in cadastro(arm)
+    with pytest.raises(ValueError):
+        importar_participantes(arm, linhas("ID,Nome\n,\n"), arm.participantes(), remover_ausentes=True)
+
+
+def test_novo_nao_sobrescreve_quem_ja_existe(arm):
+    # a lista de atuais está velha: o ID já foi gravado por outro caminho e a inclusão falha inteira
+    arm.inserir_participantes([{"id": "CF009", "nome": "Já existe", "cargo": "", "localidade": ""}])
+    with pytest.raises(sqlite3.IntegrityError):
+        importar_participantes(arm, linhas("ID,Nome\nCF009,Outro\n"), [])
+    assert cadastro(arm)["CF009"] == ("Já existe", "", "")
+
+
+def test_excel_numero_inteiro(arm):
+    assert [l["id"] for l in ler_linhas(io.BytesIO("ID,Nome\n7,Ana\n".encode()), "a.csv")] == ["7"]
+    res = importar_participantes(arm, [{"id": 7.0, "nome": "Sete"}], [])
+    assert res.inseridos == 1 and cadastro(arm)["7"] == ("Sete", "", "")
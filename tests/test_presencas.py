@@ -0,0 +1,100 @@
+import threading
+import time
+
+import pandas as pd
+
+from presencas import AcompanhamentoReunioes, PresencasReuniao, classificar_leituras
+
+
+class Banco:
+    def __init__(self):
+        self.linhas, self.falhar, self.chamadas = [], False, 0
+        self.lento = threading.Event(); self.lento.set()
+
+    def presencas_desde(self, mid, cursor):
+        self.chamadas += 1
+        self.lento.wait()
+        if self.falhar: raise ConnectionError("sem rede")
+        return [l for l in self.linhas if l["meeting_id"] == mid and l["id"] > cursor]
+
+    def gravar(self, mid, id_p):
+        self.linhas.append({"id": len(self.linhas) + 1, "meeting_id": mid, "id_participante": id_p})
+
+
+def esperar(cond, limite=3.0):
+    fim = time.monotonic() + limite
+    while not cond():
+        assert time.monotonic() < fim, "tempo esgotado"
+        time.sleep(0.01)
+
+
+def ids(linhas): return [l["id_participante"] for l in linhas]
+
+
+def test_novas_nao_espera_o_banco():
+    banco = Banco(); banco.lento.clear()   # banco travado
+    acomp = AcompanhamentoReunioes(banco.presencas_desde, intervalo=0.01)
+    t0 = time.monotonic()
+    assert acomp.novas("r1", 0) == []
+    assert time.monotonic() - t0 < 0.5
+    banco.lento.set()
+
+
+def test_traz_em_segundo_plano_depois_do_cursor():
+    banco = Banco(); banco.gravar("r1", "A"); banco.gravar("r2", "X"); banco.gravar("r1", "B")
+    acomp = AcompanhamentoReunioes(banco.presencas_desde, intervalo=0.01)
+    acomp.novas("r1", 0)
+    esperar(lambda: len(acomp.novas("r1", 0)) == 2)
+    assert ids(acomp.novas("r1", 1)) == ["B"] and acomp.novas("r1", 3) == []
+    banco.gravar("r1", "C")
+    esperar(lambda: ids(acomp.novas("r1", 3)) == ["C"])
+
+
+def test_sessao_atrasada_e_reuniao_esquecida():
+    banco = Banco(); banco.gravar("r1", "A"); banco.gravar("r1", "B")
+    acomp = AcompanhamentoReunioes(banco.presencas_desde, intervalo=0.01)
+    acomp.novas("r1", 1)
+    esperar(lambda: ids(acomp.novas("r1", 1)) == ["B"])
+    esperar(lambda: ids(acomp.novas("r1", 0)) == ["A", "B"])   # cursor menor: recomeça dele
+    banco.linhas.clear(); acomp.esquecer_reuniao("r1")
+    acomp.novas("r1", 0); n = banco.chamadas
+    esperar(lambda: banco.chamadas > n + 1)
+    assert acomp.novas("r1", 0) == []
+
+
+def test_sem_conexao_guarda_o_erro():
+    banco = Banco(); banco.falhar = True
+    acomp = AcompanhamentoReunioes(banco.presencas_desde, intervalo=0.01)
+    acomp.novas("r1", 0)
+    esperar(lambda: acomp.ultimo_erro == "sem rede")
+    banco.falhar = False; banco.gravar("r1", "A")
+    esperar(lambda: acomp.ultimo_erro is None and ids(acomp.novas("r1", 0)) == ["A"], limite=5.0)
+
+
+INDICE = {"CF001": ("CF001", "Ana", "Músico", "Centro"), "CF002": ("CF002", "Beto", "Organista", "Norte")}
+
+
+def test_presencas_reuniao_carrega_e_adiciona():
+    df = pd.DataFrame({"ID": ["cf001"], "Nome": ["Ana"], "Cargo": ["Músico"],
+                       "Localidade": ["Centro"], "Horario": ["19:00:00"]})
+    df.attrs["cursor"] = 7
+    lista = PresencasReuniao("R1", df)
+    assert lista.cursor == 7 and len(lista) == 1 and "CF001" in lista
+    antes = lista.como_df()
+    lista.adicionar({"ID": "CF002", "Nome": "Beto", "Cargo": "Organista", "Localidade": "Norte", "Horario": "19:01:00"})
+    assert lista.como_df() is not antes and lista.como_df()["Nome"].tolist() == ["Ana", "Beto"]
+    assert lista.ultimo()["ID"] == "CF002"
+    lista.limpar()
+    assert lista.empty and lista.cursor == 0 and lista.ultimo() is None
+
+
+def test_classificar_leituras():
+    ja = PresencasReuniao("R1")
+    ja.adicionar({"ID": "CF002", "Nome": "Beto", "Cargo": "Organista", "Localidade": "Norte", "Horario": "19:00:00"})
+    resultados, novos = classificar_leituras([" cf001 ", "CF001", "CF002", "", "XX9", "RUIM"], INDICE, ja, "19:05:00",
+                                             lambda c: None if c == "RUIM" else c)
+    assert [r[1] for r in resultados] == ["ok", "duplicado", "duplicado", "erro", "erro"]
+    assert resultados[0] == ["cf001", "ok", "Ana"]
+    assert "não encontrado" in resultados[3][2] and "assinatura" in resultados[4][2]
+    assert novos == [{"ID": "CF001", "Nome": "Ana", "Cargo": "Músico", "Localidade": "Centro", "Horario": "19:05:00"}]
+    assert len(ja) == 1   # quem grava e adiciona é o chamador
@@ -0,0 +1,133 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from relatorios import AgregadosPresenca, contar_presencas, datas_locais, montar_relatorio_geral
+
+
+def legado(df_pres, df_participantes, total_reunioes):
+    """montar_relatorio_geral do app.py original, para comparar exatamente."""
+    if df_participantes.empty:
+        return pd.DataFrame()
+    base = df_participantes[["ID","Nome","Cargo","Localidade"]].copy()
+    if df_pres.empty:
+        base["Presencas"] = 0
+        base["Frequencia_%"] = 0.0
+        return base.sort_values(["Presencas","Nome"], ascending=[False,True]).reset_index(drop=True)
+    freq = (
+        df_pres.groupby(["id_participante","nome","cargo","localidade"])
+        .size()
+        .reset_index(name="Presencas")
+        .rename(columns={"id_participante":"ID","nome":"Nome","cargo":"Cargo","localidade":"Localidade"})
+    )
+    rel = base.merge(freq[["ID","Presencas"]], on="ID", how="left")
+    rel["Presencas"] = rel["Presencas"].fillna(0).astype(int)
+    rel["Frequencia_%"] = rel["Presencas"].apply(
+        lambda x: round((x / total_reunioes) * 100, 2) if total_reunioes > 0 else 0.0
+    )
+    return rel.sort_values(["Presencas","Nome"], ascending=[False,True]).reset_index(drop=True)
+
+
+def cadastro_e_presencas(n_membros, n_presencas, semente):
+    rnd = np.random.default_rng(semente)
+    ids = np.array([f"S{i:05d}" for i in range(n_membros)], dtype=object)
+    nomes = np.array([f"MEMBRO {i % (n_membros // 3 + 1):05d}" for i in rnd.permutation(n_membros)], dtype=object)
+    nomes[rnd.random(n_membros) < 0.05] = np.nan            # cadastro com nome em branco
+    part = pd.DataFrame({"ID": ids, "Nome": nomes,
+                         "Cargo": rnd.choice(["A", "B", "C"], n_membros).astype(object),
+                         "Localidade": rnd.choice(["X", "Y"], n_membros).astype(object)})
+    quem = rnd.integers(0, n_membros, n_presencas)
+    pres = pd.DataFrame({"id_participante": ids[quem], "nome": part["Nome"].fillna("").to_numpy()[quem],
+                         "cargo": part["Cargo"].to_numpy()[quem], "localidade": part["Localidade"].to_numpy()[quem]})
+    return part, pres
+
+
+def presenca(id_p, data_registro, cargo="C", localidade="L"):
+    return {"id_participante": id_p, "cargo": cargo, "localidade": localidade, "data_registro": data_registro}
+
+
+class Banco:
+    """Presenças com data_registro em UTC, recortadas por dia UTC como o armazenamento."""
+    def __init__(self, linhas):
+        self.linhas, self.leituras = list(linhas), 0
+
+    def carregar(self, ini, fim, progresso=None):
+        self.leituras += 1
+        utc = pd.to_datetime([l["data_registro"] for l in self.linhas], utc=True, format="ISO8601").tz_localize(None)
+        dentro = [l for l, d in zip(self.linhas, utc) if ini <= d.date() <= fim]
+        if not dentro: return pd.DataFrame()
+        df = pd.DataFrame({c: pd.Categorical([l[c] for l in dentro]) for c in ("id_participante", "cargo", "localidade")})
+        df["data_registro"] = datas_locais([l["data_registro"] for l in dentro])
+        return df
+
+
+def test_datas_locais_converte_utc_para_cuiaba():
+    assert str(datas_locais(["2024-06-01T02:00:00+00:00"])[0])[:16] == "2024-05-31T22:00"
+    assert str(datas_locais(["2024-05-31T22:00:00"])[0])[:16] == "2024-05-31T22:00"
+
+
+def test_mes_pela_hora_local_nas_bordas():
+    banco = Banco([presenca("A", "2024-06-01T02:00:00+00:00"),    # 31/05 22:00 em Cuiabá
+                   presenca("B", "2024-05-01T03:00:00+00:00"),    # 30/04 23:00 em Cuiabá
+                   presenca("C", "2024-05-15T12:00:00+00:00")])
+    ag = AgregadosPresenca(banco.carregar)
+    r = ag.periodo(date(2024, 5, 1), date(2024, 5, 31))
+    assert r.por_membro.to_dict() == {"A": 1, "C": 1}
+    assert r.mensal.to_dict() == {"2024-05": 2}
+
+
+def test_registrar_e_remover_usam_o_mes_local():
+    ag = AgregadosPresenca(Banco([]).carregar)
+    ag.periodo(date(2024, 5, 1), date(2024, 6, 30))
+    ag.registrar([presenca("A", "2024-06-01T02:00:00+00:00"), presenca("B", "2024-06-10T12:00:00-04:00")])
+    assert dict(ag.membros["2024-05"]) == {"A": 1} and dict(ag.membros["2024-06"]) == {"B": 1}
+    ag.remover([presenca("A", "2024-05-31T22:00:00-04:00")])
+    assert ag.periodo(date(2024, 5, 1), date(2024, 6, 30)).total == 1
+
+
+def test_meses_inteiros_lidos_uma_vez_e_validade():
+    banco = Banco([presenca("A", "2024-05-15T12:00:00+00:00")])
+    ag = AgregadosPresenca(banco.carregar, validade=3600)
+    ag.periodo(date(2024, 5, 1), date(2024, 5, 31)); ag.periodo(date(2024, 5, 1), date(2024, 5, 31))
+    assert banco.leituras == 1
+    ag.validade = -1
+    ag.periodo(date(2024, 5, 1), date(2024, 5, 31))
+    assert banco.leituras == 2
+
+
+def test_pontas_parciais():
+    banco = Banco([presenca("A", "2024-05-10T12:00:00+00:00"), presenca("B", "2024-05-21T01:00:00+00:00")])
+    r = AgregadosPresenca(banco.carregar).periodo(date(2024, 5, 5), date(2024, 5, 20))
+    assert r.por_membro.to_dict() == {"A": 1, "B": 1}   # B é 20/05 21:00 na hora local
+
+
+@pytest.mark.parametrize("semente,total", [(1, 3), (2, 7), (3, 160), (4, 0), (5, 1)])
+def test_relatorio_igual_ao_antigo(semente, total):
+    part, pres = cadastro_e_presencas(600, 2000, semente)
+    novo = montar_relatorio_geral(contar_presencas(pres["id_participante"].astype("category")), part, total)
+    pd.testing.assert_frame_equal(legado(pres, part, total), novo, check_exact=True)
+
+
+def test_relatorio_sem_presencas_igual_ao_antigo():
+    part, pres = cadastro_e_presencas(50, 0, 9)
+    novo = montar_relatorio_geral(contar_presencas(pres["id_participante"].astype("category")), part, 4)
+    pd.testing.assert_frame_equal(legado(pres, part, 4), novo, check_exact=True)
+
+
+def test_frequencia_no_arredondamento_do_python():
+    part = pd.DataFrame({"ID": [f"P{i}" for i in range(160)], "Nome": [f"N{i:03d}" for i in range(160)],
+                         "Cargo": "", "Localidade": ""})
+    cont = pd.Series({f"P{i}": i for i in range(1, 160)})
+    rel = montar_relatorio_geral(cont, part, 160).set_index("ID")["Frequencia_%"]
+    assert all(rel[f"P{i}"] == round((i / 160) * 100, 2) for i in range(160))
+
+
+def test_frequencia_sobre_convocacoes():
+    part = pd.DataFrame({"ID": ["A", "B", "C"], "Nome": ["Ana", "Beto", "Caio"], "Cargo": "", "Localidade": ""})
+    cont = pd.Series({"A": 1, "B": 3})
+    conv = pd.Series({"A": 4, "B": 3, "C": 2})   # convocadas + presenças sem convocação
+    rel = montar_relatorio_geral(cont, part, 10, conv).set_index("ID")["Frequencia_%"]
+    assert rel.to_dict() == {"B": 100.0, "A": 25.0, "C": 0.0}
+    assert montar_relatorio_geral(cont, part, 10).set_index("ID")["Frequencia_%"].to_dict() == {"B": 30.0, "A": 10.0, "C": 0.0}
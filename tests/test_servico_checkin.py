@@ -0,0 +1,87 @@
+import asyncio
+import json
+
+import pytest
+
+from armazenamento import ArmazenamentoSQLite
+from crachas import gerar_codigo
+from servico_checkin import ServicoCheckin, host_local
+
+
+@pytest.fixture
+def servico():
+    arm = ArmazenamentoSQLite(":memory:")
+    arm.inserir_participantes([{"id": "CF001", "nome": "Ana", "cargo": "", "localidade": ""}])
+    arm.salvar_reuniao({"id": "R1", "nome": "Ensaio", "data": "2024-05-10"})
+    s = ServicoCheckin(arm, token="segredo", origens=["https://leitor.exemplo"])
+    asyncio.run(s.carregar_cadastro())
+    return s
+
+
+def post(s, corpo, token="segredo"):
+    cab = {"authorization": f"Bearer {token}"}
+    dados = corpo if isinstance(corpo, bytes) else json.dumps(corpo).encode()
+    async def pedir():
+        try: return await s._rotear("POST", "/checkin", cab, dados)
+        except Exception as e: return getattr(e, "codigo", e), None
+    return asyncio.run(pedir())
+
+
+@pytest.mark.parametrize("corpo", [[1], "x", 3, {"meeting_id": "R1", "codigos": "CF001"},
+                                   {"meeting_id": "R1", "codigos": [1]}, {"meeting_id": "R1"},
+                                   {"codigo": "CF001"}, {"meeting_id": ["R1"], "codigo": "CF001"}])
+def test_corpo_malformado_e_400(servico, corpo):
+    assert post(servico, corpo)[0] == 400
+    assert servico.fila == []
+
+
+def test_reuniao_inexistente_e_404(servico):
+    assert post(servico, {"meeting_id": "R9", "codigo": "CF001"})[0] == 404
+    assert servico.fila == []
+
+
+def test_checkin_valido(servico):
+    codigo, resposta = post(servico, {"meeting_id": "R1", "codigos": ["cf001", "X"]})
+    assert codigo == 200
+    assert [r["status"] for r in resposta["resultados"]] == ["ok", "nao_encontrado"]
+    assert post(servico, {"meeting_id": "R1", "codigo": "CF001"})[1]["resultados"][0]["status"] == "duplicado"
+
+
+def test_token_obrigatorio(servico):
+    assert post(servico, {"meeting_id": "R1", "codigo": "CF001"}, token="errado")[0] == 401
+
+
+def test_cors_so_para_origem_configurada(servico):
+    assert "https://leitor.exemplo" in servico._cors({"origin": "https://leitor.exemplo"})
+    assert servico._cors({"origin": "https://outro.exemplo"}) == ""
+    assert servico._cors({}) == ""
+
+
+def test_sem_token_so_escuta_local():
+    assert host_local("127.0.0.1") and host_local("localhost") and host_local("::1")
+    assert not host_local("0.0.0.0")
+    with pytest.raises(ValueError):
+        asyncio.run(ServicoCheckin(ArmazenamentoSQLite(":memory:")).rodar("0.0.0.0", 0))
+
+
+def test_cracha_conferido_no_servico(servico):
+    servico.chave, servico.exigir_assinado = "k", True
+    resultados = post(servico, {"meeting_id": "R1", "codigos": ["CF001", gerar_codigo("CF001", 1, "x"),
+                                                                gerar_codigo("CF001", 1, "k")]})[1]["resultados"]
+    assert [r["status"] for r in resultados] == ["invalido", "invalido", "ok"]
+
+
+def test_recarregar_cadastro(servico):
+    servico.arm.inserir_participantes([{"id": "CF002", "nome": "Beto", "cargo": "", "localidade": ""}])
+    codigo, resposta = asyncio.run(servico._rotear("POST", "/recarregar", {"authorization": "Bearer segredo"}, b""))
+    assert (codigo, resposta) == (200, {"participantes": 2})
+    assert post(servico, {"meeting_id": "R1", "codigo": "CF002"})[1]["resultados"][0]["status"] == "ok"
+
+
+def test_recarregar_reuniao_depois_de_limpar(servico):
+    assert post(servico, {"meeting_id": "R1", "codigo": "CF001"})[1]["resultados"][0]["status"] == "ok"
+    servico.arm.inserir_presencas(servico.fila); servico.fila = []
+    servico.arm.apagar_presencas_reuniao("R1")
+    codigo, resposta = asyncio.run(servico._rotear("POST", "/recarregar?m=R1", {"authorization": "Bearer segredo"}, b""))
+    assert (codigo, resposta) == (200, {"reuniao": "R1"})
+    assert post(servico, {"meeting_id": "R1", "codigo": "CF001"})[1]["resultados"][0]["status"] == "ok"